@@ -15,16 +15,139 @@ class Settings(BaseSettings):
 
     # OpenAI
     OPENAI_API_KEY: Optional[str] = None
-    OPENAI_MODEL: str = "gpt-4o-mini"
+    OPENAI_MODEL: str = "gpt-4o-mini"  # standard tier
+    OPENAI_FAST_MODEL: Optional[str] = "gpt-4.1-nano"  # None uses OPENAI_MODEL
+    OPENAI_LARGE_MODEL: Optional[str] = None  # None uses OPENAI_MODEL
     OPENAI_TTS_MODEL: str = "tts-1"
     OPENAI_TTS_VOICE: str = "alloy"
     OPENAI_WHISPER_MODEL: str = "whisper-1"
+    OPENAI_WHISPER_LANGUAGE: Optional[str] = None  # ISO-639-1 hint; None lets Whisper detect it
+    OPENAI_BASE_URL: Optional[str] = None  # None uses the official API
+
+    # Shared OpenAI HTTP connection pool
+    OPENAI_MAX_CONNECTIONS: int = 100
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    OPENAI_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    OPENAI_HTTP2: bool = True  # used when the h2 package is installed
+    OPENAI_TIMEOUT_SECONDS: float = 60.0
+    OPENAI_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    OPENAI_WARM_POOL: bool = True
+
+    # Share one upstream call between identical in-flight requests
+    SINGLEFLIGHT_ENABLED: bool = True
+
+    # Client-side rate limiting (buckets are re-synced from x-ratelimit-* headers)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_DEFAULT_RPM: int = 500
+    RATE_LIMIT_DEFAULT_TPM: int = 200000
+    RATE_LIMIT_MAX_CONCURRENCY: int = 64
+    RATE_LIMIT_MIN_CONCURRENCY: int = 1
+    RATE_LIMIT_COMPLETION_TOKENS_ESTIMATE: int = 256
+
+    # Hedged chat requests and retries (the SDK's own chat retries are disabled)
+    OPENAI_HEDGING_ENABLED: bool = True
+    OPENAI_HEDGE_QUANTILE: float = 0.95  # hedge once the primary is slower than this
+    OPENAI_HEDGE_MIN_SAMPLES: int = 20  # no hedging until this many latencies are seen
+    OPENAI_HEDGE_MIN_DELAY_SECONDS: float = 0.5
+    OPENAI_MAX_RETRIES: int = 2
+    OPENAI_RETRY_BASE_DELAY_SECONDS: float = 0.25
+    OPENAI_RETRY_MAX_DELAY_SECONDS: float = 4.0
+    OPENAI_REQUEST_DEADLINE_SECONDS: float = 60.0  # for streams: until the first token
+
+    # Per-request model routing (agents can pin a tier with model_policy)
+    MODEL_ROUTING_ENABLED: bool = True
+    ROUTING_TRIVIAL_MAX_TOKENS: int = 8  # small talk (greetings, thanks) up to this size uses the fast tier
+    ROUTING_FAST_MAX_HISTORY_TOKENS: int = 1000  # longer conversations skip the fast tier
+    ROUTING_LARGE_PROMPT_TOKENS: int = 8000  # whole prompt size for the large tier
+    ROUTING_LATENCY_BUDGET_SECONDS: float = 4.0  # p95 over this falls back a tier
+
+    # Circuit breakers (per endpoint: chat, embeddings, STT, TTS)
+    CIRCUIT_BREAKER_ENABLED: bool = True
+    CIRCUIT_BREAKER_WINDOW: int = 20  # most recent calls considered
+    CIRCUIT_BREAKER_MIN_CALLS: int = 10
+    CIRCUIT_BREAKER_FAILURE_RATE: float = 0.5
+    CIRCUIT_BREAKER_SLOW_CALL_RATE: float = 0.8
+    CIRCUIT_BREAKER_OPEN_SECONDS: float = 30.0  # before half-open trial calls
+    CIRCUIT_BREAKER_HALF_OPEN_CALLS: int = 3
+    CIRCUIT_BREAKER_CHAT_SLOW_SECONDS: float = 10.0  # time to first token
+    CIRCUIT_BREAKER_EMBEDDINGS_SLOW_SECONDS: float = 5.0
+    CIRCUIT_BREAKER_STT_SLOW_SECONDS: float = 30.0
+    CIRCUIT_BREAKER_TTS_SLOW_SECONDS: float = 15.0
+
+    # Per-call instrumentation (calls over either threshold are logged)
+    SLOW_CALL_SECONDS: float = 20.0
+    SLOW_TTFT_SECONDS: float = 5.0
+    # Agents get their own metric label up to this many; later ones share "other"
+    METRICS_MAX_AGENT_LABELS: int = 50
 
     # Audio settings
     MAX_AUDIO_DURATION: int = 120  # 2 minutes in seconds
     MAX_AUDIO_SIZE: int = 5 * 1024 * 1024  # 5MB
-    AUDIO_UPLOAD_DIR: str = "audio_files/uploads"
-    AUDIO_TTS_DIR: str = "audio_files/tts"
+
+    # Audio storage backend: "local" (sharded files under AUDIO_STORE_ROOT) or "s3"
+    AUDIO_STORE_BACKEND: str = "local"
+    AUDIO_STORE_ROOT: str = "audio_files"
+    AUDIO_S3_ENDPOINT_URL: str = "https://s3.amazonaws.com"  # or a MinIO URL
+    AUDIO_S3_BUCKET: str = ""
+    AUDIO_S3_REGION: str = "us-east-1"
+    AUDIO_S3_ACCESS_KEY_ID: str = ""
+    AUDIO_S3_SECRET_ACCESS_KEY: str = ""
+    AUDIO_S3_PREFIX: str = ""  # e.g. "audio/" to share a bucket
+
+    # Audio retention (0 disables a limit); swept files are unlinked from messages
+    AUDIO_RETENTION_ENABLED: bool = False
+    AUDIO_RETENTION_MAX_AGE_DAYS: int = 30
+    AUDIO_RETENTION_MAX_TOTAL_BYTES: int = 0
+    AUDIO_RETENTION_SWEEP_INTERVAL_SECONDS: int = 3600
+
+    # Voice answers: TTS per sentence while the model is still generating
+    VOICE_SENTENCE_MIN_CHARS: int = 20  # shorter sentences merge with the next
+    VOICE_SENTENCE_MAX_CHARS: int = 300  # longer ones are cut at a clause break
+    VOICE_TTS_MAX_CONCURRENCY: int = 3
+    # Send this request header (1/true) to get the per-stage timings back: a
+    # Server-Timing header, or "timings" in the SSE done event. "" disables it
+    VOICE_DEBUG_HEADER: str = "X-Voice-Debug"
+
+    # Full-duplex voice over WebSocket: 16-bit mono PCM in, cut by an energy
+    # VAD into segments that are transcribed while the user keeps talking
+    VOICE_WS_SAMPLE_RATE: int = 16000
+    VOICE_VAD_THRESHOLD_DB: float = -45.0  # frames louder than this (dBFS) count as speech
+    VOICE_SEGMENT_SILENCE_MS: int = 500  # a pause this long closes a segment
+    VOICE_SEGMENT_MAX_SECONDS: float = 20.0
+
+    # Long uploads are cut at pauses into overlapping segments transcribed in
+    # parallel. WAV is split as is; WebM/Opus and MP3 are decoded with PyAV
+    # (the av package), and go to Whisper whole if it isn't installed
+    VOICE_PARALLEL_STT_MIN_SECONDS: float = 30.0
+    VOICE_PARALLEL_STT_SEGMENT_SECONDS: float = 20.0  # target length, cut at the quietest frame
+    VOICE_PARALLEL_STT_OVERLAP_MS: int = 1000  # shared by neighbours; repeated words are merged
+
+    # Content-addressed TTS cache (files in the tts folder named by hash of text, voice, model)
+    TTS_CACHE_ENABLED: bool = True
+    TTS_CACHE_MAX_BYTES: int = 512 * 1024 * 1024  # LRU files are deleted past this
+    TTS_CACHE_PRERENDER_FALLBACKS: bool = True  # synthesize fallback replies at startup
+
+    # Transcripts of uploaded audio by content hash, model and language, so a
+    # retried upload skips Whisper (uploads are also stored once per content)
+    STT_CACHE_ENABLED: bool = True
+    STT_CACHE_MAX_ENTRIES: int = 1000
+    STT_CACHE_TTL_SECONDS: int = 3600
+
+    # Response cache (opt-in per agent)
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1000
+    RESPONSE_CACHE_TTL_SECONDS: int = 3600
+    RESPONSE_CACHE_SIMILARITY_THRESHOLD: float = 0.95
+    RESPONSE_CACHE_REPLAY_CHUNK_CHARS: int = 64
+    RESPONSE_CACHE_BYPASS_HEADER: str = "X-Cache-Bypass"
+
+    # SSE streaming
+    SSE_FLUSH_INTERVAL_MS: int = 20  # 0 sends every model delta as its own event
+    SSE_FLUSH_BYTES: int = 256
+
+    # Resumable generation streams
+    STREAM_BUFFER_MAX_EVENTS: int = 2000
+    STREAM_RETENTION_SECONDS: int = 120  # how long a finished stream can be replayed
+    STREAM_PARTIAL_PERSIST_INTERVAL_SECONDS: float = 0  # 0 disables partial saves
 
     # API settings
     API_PREFIX: str = "/api"
@@ -1,3 +1,3 @@
-from app.database.connection import get_db, init_db
+from app.database.connection import get_db, init_db, session_scope
 
-__all__ = ["get_db", "init_db"]
+__all__ = ["get_db", "init_db", "session_scope"]
@@ -1,10 +1,16 @@
+import logging
+from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
+from sqlalchemy import inspect, text
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.schema import CreateColumn
 
 from app.config import settings
 from app.models.base import Base
 
+logger = logging.getLogger(__name__)
+
 # Create async engine
 engine = create_async_engine(
     settings.DATABASE_URL,
@@ -22,10 +28,33 @@ async_session_maker = async_sessionmaker(
 )
 
 
+def add_missing_columns(sync_conn) -> None:
+    """
+    Add columns that models gained after their table was created.
+
+    ``create_all`` only creates missing tables, so existing databases are
+    brought up to date with ``ALTER TABLE ... ADD COLUMN``. New NOT NULL
+    columns need a ``server_default`` to fill the rows already there.
+    """
+    inspector = inspect(sync_conn)
+    preparer = sync_conn.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = CreateColumn(column).compile(dialect=sync_conn.dialect)
+            sync_conn.execute(text(f"ALTER TABLE {preparer.quote(table.name)} ADD COLUMN {ddl}"))
+            logger.info(f"Added column {table.name}.{column.name}")
+
+
 async def init_db() -> None:
-    """Initialize database and create all tables."""
+    """Initialize database, create all tables and add new columns."""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
@@ -39,3 +68,15 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             raise
         finally:
             await session.close()
+
+
+@asynccontextmanager
+async def session_scope() -> AsyncGenerator[AsyncSession, None]:
+    """Standalone database session for work that outlives a request."""
+    async with async_session_maker() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
@@ -1,3 +1,4 @@
+from app.integrations.clients import ClientRegistry, client_registry
 from app.integrations.openai_client import OpenAIClient, openai_client
 
-__all__ = ["OpenAIClient", "openai_client"]
+__all__ = ["ClientRegistry", "client_registry", "OpenAIClient", "openai_client"]
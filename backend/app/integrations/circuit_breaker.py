@@ -0,0 +1,230 @@
+"""Per-endpoint circuit breakers so callers fail fast while OpenAI is degraded."""
+
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import Enum
+from typing import AsyncIterator, Deque, Optional, Tuple
+
+from app.config import settings
+from app.integrations.hedging import is_retryable
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+circuit_state = metrics.gauge(
+    "openai_circuit_state",
+    "Circuit breaker state per endpoint (0=closed, 1=half-open, 2=open)",
+    ["endpoint"],
+)
+circuit_rejections = metrics.counter(
+    "openai_circuit_rejections_total",
+    "Calls rejected without contacting OpenAI because the circuit was open",
+    ["endpoint"],
+)
+circuit_transitions = metrics.counter(
+    "openai_circuit_transitions_total",
+    "Circuit breaker state changes",
+    ["endpoint", "state"],
+)
+
+
+class CircuitState(str, Enum):
+    """Circuit breaker states."""
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+
+_STATE_VALUES = {CircuitState.CLOSED: 0, CircuitState.HALF_OPEN: 1, CircuitState.OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose circuit is open."""
+
+    def __init__(self, endpoint: str, retry_after: float):
+        super().__init__(f"Circuit open for {endpoint}; retry in {retry_after:.0f}s")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class Call:
+    """One guarded call; streams mark their first byte so latency means TTFT."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.first_byte: Optional[float] = None
+
+    def mark_first_byte(self) -> None:
+        if self.first_byte is None:
+            self.first_byte = time.monotonic()
+
+    @property
+    def latency(self) -> float:
+        return (self.first_byte or time.monotonic()) - self.started
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open breaker over a rolling window of recent calls.
+
+    The circuit opens when the share of failed calls, or of calls slower
+    than ``slow_call_seconds``, crosses its threshold. After
+    ``open_seconds`` a few trial calls are let through (half-open); they
+    close the circuit if they all succeed and re-open it otherwise.
+    Only transient errors (timeouts, connection errors, 429, 5xx) count as
+    failures; a bad request says nothing about the endpoint's health.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        slow_call_seconds: float,
+        window: int = settings.CIRCUIT_BREAKER_WINDOW,
+        min_calls: int = settings.CIRCUIT_BREAKER_MIN_CALLS,
+        failure_rate: float = settings.CIRCUIT_BREAKER_FAILURE_RATE,
+        slow_call_rate: float = settings.CIRCUIT_BREAKER_SLOW_CALL_RATE,
+        open_seconds: float = settings.CIRCUIT_BREAKER_OPEN_SECONDS,
+        half_open_calls: int = settings.CIRCUIT_BREAKER_HALF_OPEN_CALLS,
+    ):
+        self.endpoint = endpoint
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self._outcomes: Deque[Tuple[bool, bool]] = deque(maxlen=window)  # (failed, slow)
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._trials = 0
+        self._trial_successes = 0
+        circuit_state.set(0, endpoint=endpoint)
+
+    @property
+    def state(self) -> CircuitState:
+        if (
+            self._state == CircuitState.OPEN
+            and time.monotonic() - self._opened_at >= self.open_seconds
+        ):
+            self._transition(CircuitState.HALF_OPEN)
+        return self._state
+
+    @property
+    def available(self) -> bool:
+        """Whether a call made now would be let through."""
+        if not settings.CIRCUIT_BREAKER_ENABLED:
+            return True
+        state = self.state
+        if state == CircuitState.OPEN:
+            return False
+        return state == CircuitState.CLOSED or self._trials < self.half_open_calls
+
+    def _transition(self, state: CircuitState) -> None:
+        self._state = state
+        self._trials = 0
+        self._trial_successes = 0
+        if state == CircuitState.OPEN:
+            self._opened_at = time.monotonic()
+        elif state == CircuitState.CLOSED:
+            self._outcomes.clear()
+        circuit_state.set(_STATE_VALUES[state], endpoint=self.endpoint)
+        circuit_transitions.inc(endpoint=self.endpoint, state=state.value)
+        log = logger.warning if state == CircuitState.OPEN else logger.info
+        log(f"Circuit for {self.endpoint} is now {state.value}")
+
+    def before_call(self) -> None:
+        """Admit a call or raise :class:`CircuitOpenError`."""
+        self.check()
+        if self._state == CircuitState.HALF_OPEN:
+            self._trials += 1
+
+    def check(self) -> None:
+        """Raise :class:`CircuitOpenError` if a call made now would be rejected (admits nothing)."""
+        if self.available:
+            return
+        circuit_rejections.inc(endpoint=self.endpoint)
+        if self._state == CircuitState.OPEN:
+            retry_after = self.open_seconds - (time.monotonic() - self._opened_at)
+        else:
+            retry_after = self.open_seconds
+        raise CircuitOpenError(self.endpoint, max(0.0, retry_after))
+
+    def record(self, failed: bool, latency: float = 0.0) -> None:
+        """Record the outcome of an admitted call."""
+        slow = not failed and latency >= self.slow_call_seconds
+
+        if self._state == CircuitState.HALF_OPEN:
+            if failed or slow:
+                self._transition(CircuitState.OPEN)
+                return
+            self._trial_successes += 1
+            if self._trial_successes >= self.half_open_calls:
+                self._transition(CircuitState.CLOSED)
+            return
+
+        if self._state == CircuitState.OPEN:
+            return
+
+        self._outcomes.append((failed, slow))
+        if len(self._outcomes) < self.min_calls:
+            return
+        failures = sum(1 for failed, _ in self._outcomes if failed)
+        slow_calls = sum(1 for _, slow in self._outcomes if slow)
+        if (
+            failures / len(self._outcomes) >= self.failure_rate
+            or slow_calls / len(self._outcomes) >= self.slow_call_rate
+        ):
+            self._transition(CircuitState.OPEN)
+
+    def _release_trial(self) -> None:
+        # A half-open trial that ended without an outcome (e.g. cancelled)
+        if self._state == CircuitState.HALF_OPEN and self._trials > 0:
+            self._trials -= 1
+
+    @asynccontextmanager
+    async def guard(self, timed: bool = True) -> AsyncIterator[Call]:
+        """
+        Fail fast while open; otherwise run the block and record its outcome.
+
+        Wrap a single upstream request, not queueing or retries around it.
+        With ``timed=False`` only failures count, for calls whose duration
+        says nothing about the endpoint's health.
+        """
+        if not settings.CIRCUIT_BREAKER_ENABLED:
+            yield Call()
+            return
+
+        self.before_call()
+        call = Call()
+        recorded = False
+        try:
+            yield call
+        except Exception as e:
+            self.record(failed=is_retryable(e), latency=call.latency if timed else 0.0)
+            recorded = True
+            raise
+        else:
+            self.record(failed=False, latency=call.latency if timed else 0.0)
+            recorded = True
+        finally:
+            if not recorded:
+                self._release_trial()
+
+
+class CircuitBreakers:
+    """One breaker per upstream endpoint."""
+
+    def __init__(self):
+        self.chat = CircuitBreaker("chat", settings.CIRCUIT_BREAKER_CHAT_SLOW_SECONDS)
+        self.embeddings = CircuitBreaker(
+            "embeddings", settings.CIRCUIT_BREAKER_EMBEDDINGS_SLOW_SECONDS
+        )
+        self.stt = CircuitBreaker("stt", settings.CIRCUIT_BREAKER_STT_SLOW_SECONDS)
+        self.tts = CircuitBreaker("tts", settings.CIRCUIT_BREAKER_TTS_SLOW_SECONDS)
+
+
+# Singleton instance
+circuit_breakers = CircuitBreakers()
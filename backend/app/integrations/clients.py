@@ -0,0 +1,182 @@
+"""Process-wide OpenAI client backed by one tuned, shared httpx connection pool."""
+
+import importlib.util
+import logging
+import time
+from typing import Dict, Optional, Tuple
+
+import httpx
+from openai import AsyncOpenAI
+
+from app.config import settings
+from app.integrations.instrumentation import current_call
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+http_requests = metrics.counter(
+    "openai_http_requests_total",
+    "HTTP requests sent to the OpenAI API",
+)
+http_connections_opened = metrics.counter(
+    "openai_http_connections_opened_total",
+    "New TCP connections opened to the OpenAI API",
+)
+pool_connections = metrics.gauge(
+    "openai_http_pool_connections",
+    "Connections in the shared OpenAI pool by state",
+    ["state"],
+)
+pool_utilization = metrics.gauge(
+    "openai_http_pool_utilization",
+    "Active connections as a fraction of OPENAI_MAX_CONNECTIONS",
+)
+connect_duration = metrics.histogram(
+    "openai_http_connect_seconds",
+    "Time to open a new connection (TCP and TLS) to the OpenAI API",
+)
+connection_reuse_ratio = metrics.gauge(
+    "openai_http_connection_reuse_ratio",
+    "Fraction of requests served on an already open connection",
+)
+
+
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+# The connection is usable (TLS included) once any of these happen
+_CONNECTED_EVENTS = (
+    "connection.start_tls.complete",
+    "http11.send_request_headers.started",
+    "http2.send_connection_init.started",
+)
+
+
+def _tracer():
+    """httpcore trace callback timing connection setup for one request."""
+    connect_started = None
+
+    async def trace(event_name: str, info: dict) -> None:
+        nonlocal connect_started
+        if event_name == "connection.connect_tcp.started":
+            connect_started = time.monotonic()
+        elif event_name == "connection.connect_tcp.complete":
+            http_connections_opened.inc()
+        elif event_name in _CONNECTED_EVENTS and connect_started is not None:
+            seconds = time.monotonic() - connect_started
+            connect_started = None
+            connect_duration.observe(seconds)
+            call = current_call.get()
+            if call is not None:
+                call.add_connect(seconds)
+
+    return trace
+
+
+async def _on_request(request: httpx.Request) -> None:
+    http_requests.inc()
+    request.extensions["trace"] = _tracer()
+
+
+class ClientRegistry:
+    """
+    Owns the single AsyncOpenAI client used for chat, embeddings, STT and TTS.
+
+    Creating an AsyncOpenAI per request means a fresh TCP+TLS handshake per
+    call; sharing one client keeps connections alive between requests.
+    """
+
+    def __init__(self):
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._openai: Optional[AsyncOpenAI] = None
+        self._openai_chat: Optional[AsyncOpenAI] = None
+
+    def _build_http_client(self) -> httpx.AsyncClient:
+        http2 = settings.OPENAI_HTTP2 and _http2_available()
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+            timeout=httpx.Timeout(
+                settings.OPENAI_TIMEOUT_SECONDS,
+                connect=settings.OPENAI_CONNECT_TIMEOUT_SECONDS,
+            ),
+            event_hooks={"request": [_on_request]},
+        )
+
+    @property
+    def openai(self) -> AsyncOpenAI:
+        """The shared AsyncOpenAI client, created on first use."""
+        if self._openai is None:
+            self._http_client = self._build_http_client()
+            self._openai = AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_BASE_URL,
+                http_client=self._http_client,
+            )
+        return self._openai
+
+    @property
+    def openai_chat(self) -> AsyncOpenAI:
+        """The shared client without SDK retries (chat retries and hedges in app.integrations.hedging)."""
+        if self._openai_chat is None:
+            self._openai_chat = self.openai.with_options(max_retries=0)
+        return self._openai_chat
+
+    async def warm(self) -> None:
+        """Open a connection ahead of the first user request."""
+        client = self.openai
+        try:
+            await self._http_client.head(str(client.base_url))
+            logger.info("OpenAI connection pool warmed")
+        except httpx.HTTPError as e:
+            logger.warning(f"Could not warm OpenAI connection pool: {e}")
+
+    async def close(self) -> None:
+        """Close pooled connections (on shutdown)."""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+        self._http_client = None
+        self._openai = None
+        self._openai_chat = None
+
+    def pool_stats(self) -> Dict[str, int]:
+        """Active and idle connection counts of the shared pool (zeros if unknown)."""
+        # httpx has no public pool API, so httpcore's pool is read defensively
+        pool = getattr(getattr(self._http_client, "_transport", None), "_pool", None)
+        try:
+            connections = list(pool.connections)
+            idle = sum(1 for conn in connections if conn.is_idle())
+        except (AttributeError, TypeError):
+            return {"active": 0, "idle": 0}
+        return {"active": len(connections) - idle, "idle": idle}
+
+
+# Singleton instance
+client_registry = ClientRegistry()
+
+
+def _pool_connections() -> Dict[Tuple[str, ...], float]:
+    stats = client_registry.pool_stats()
+    return {(state,): count for state, count in stats.items()}
+
+
+def _pool_utilization() -> Dict[Tuple[str, ...], float]:
+    active = client_registry.pool_stats()["active"]
+    return {(): active / max(1, settings.OPENAI_MAX_CONNECTIONS)}
+
+
+def _connection_reuse_ratio() -> Dict[Tuple[str, ...], float]:
+    requests = http_requests.get()
+    if not requests:
+        return {}
+    return {(): max(0.0, 1 - http_connections_opened.get() / requests)}
+
+
+pool_connections.set_function(_pool_connections)
+pool_utilization.set_function(_pool_utilization)
+connection_reuse_ratio.set_function(_connection_reuse_ratio)
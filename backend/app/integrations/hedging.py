@@ -0,0 +1,242 @@
+"""Hedged requests and deadline-bounded, jittered retries for upstream model calls."""
+
+import asyncio
+import logging
+import random
+from collections import deque
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Deque, Optional, Tuple, TypeVar
+
+import httpx
+import openai
+
+from app.config import settings
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+first_byte_latency = metrics.histogram(
+    "openai_first_byte_seconds",
+    "Time to first token (streams) or to the response (non-streaming), including hedging",
+    ["operation", "hedged"],
+)
+hedges_fired = metrics.counter(
+    "openai_hedges_total",
+    "Hedge requests fired after the primary exceeded the latency quantile",
+    ["operation"],
+)
+hedge_wins = metrics.counter(
+    "openai_hedge_wins_total",
+    "Hedge requests that answered before the primary",
+    ["operation"],
+)
+retries = metrics.counter(
+    "openai_retries_total",
+    "Retried upstream calls",
+    ["operation"],
+)
+hedge_delay = metrics.gauge(
+    "openai_hedge_delay_seconds",
+    "Current hedge delay (observed latency quantile)",
+    ["operation"],
+)
+
+
+class LatencyTracker:
+    """Rolling window of first-byte latencies for one operation."""
+
+    def __init__(
+        self,
+        operation: str,
+        window: int = 200,
+        min_samples: int = settings.OPENAI_HEDGE_MIN_SAMPLES,
+    ):
+        self.operation = operation
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def hedge_after(self) -> Optional[float]:
+        """Delay before firing a hedge, or None while there is too little data."""
+        if not settings.OPENAI_HEDGING_ENABLED:
+            return None
+        value = self.quantile(settings.OPENAI_HEDGE_QUANTILE)
+        if value is None:
+            return None
+        value = max(value, settings.OPENAI_HEDGE_MIN_DELAY_SECONDS)
+        hedge_delay.set(value, operation=self.operation)
+        return value
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Timeouts, connection errors, 429 and 5xx are worth retrying."""
+    if isinstance(error, (asyncio.TimeoutError, httpx.TransportError, openai.APIConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return status == 429 or (status is not None and status >= 500)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter."""
+    ceiling = min(
+        settings.OPENAI_RETRY_MAX_DELAY_SECONDS,
+        settings.OPENAI_RETRY_BASE_DELAY_SECONDS * 2 ** attempt,
+    )
+    return random.uniform(0, ceiling)
+
+
+async def _sleep_before_retry(
+    error: Exception,
+    attempt: int,
+    deadline: float,
+    operation: str,
+) -> None:
+    """Back off before the next attempt, or re-raise if we should give up."""
+    loop = asyncio.get_running_loop()
+    delay = backoff_delay(attempt)
+    if (
+        not is_retryable(error)
+        or attempt > settings.OPENAI_MAX_RETRIES
+        or loop.time() + delay >= deadline
+    ):
+        raise error
+    retries.inc(operation=operation)
+    logger.warning(
+        f"{operation} failed ({type(error).__name__}), retry {attempt} in {delay:.2f}s"
+    )
+    await asyncio.sleep(delay)
+
+
+async def _cancel_all(tasks) -> None:
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _race(
+    start: Callable[[], Awaitable[T]],
+    hedge_after: Optional[float],
+    operation: str,
+) -> Tuple[T, bool]:
+    """Run ``start()``; if it is slower than ``hedge_after``, race a second copy."""
+    primary = asyncio.ensure_future(start())
+    if hedge_after is None:
+        return await primary, False
+
+    tasks = [primary]
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        if done:
+            return primary.result(), False
+
+        hedges_fired.inc(operation=operation)
+        tasks.append(asyncio.ensure_future(start()))
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not primary:
+                        hedge_wins.inc(operation=operation)
+                    return task.result(), True
+                error = task.exception()
+        raise error
+    finally:
+        await _cancel_all([t for t in tasks if not t.done()])
+
+
+async def hedged_call(
+    fn: Callable[[], Awaitable[T]],
+    tracker: LatencyTracker,
+    can_hedge: Callable[[], bool] = lambda: True,
+) -> T:
+    """Call ``fn`` with hedging and jittered retries under a per-request deadline."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.OPENAI_REQUEST_DEADLINE_SECONDS
+    attempt = 0
+    while True:
+        started = loop.time()
+        hedge_after = tracker.hedge_after() if can_hedge() else None
+        try:
+            result, hedged = await asyncio.wait_for(
+                _race(fn, hedge_after, tracker.operation),
+                timeout=max(0.0, deadline - started),
+            )
+        except Exception as e:
+            attempt += 1
+            await _sleep_before_retry(e, attempt, deadline, tracker.operation)
+            continue
+
+        elapsed = loop.time() - started
+        tracker.observe(elapsed)
+        first_byte_latency.observe(elapsed, operation=tracker.operation, hedged=str(hedged).lower())
+        return result
+
+
+async def _first_item(iterator: AsyncIterator[T]) -> Tuple[AsyncIterator[T], bool, Any]:
+    try:
+        return iterator, True, await iterator.__anext__()
+    except StopAsyncIteration:
+        return iterator, False, None
+
+
+async def hedged_stream(
+    factory: Callable[[], AsyncIterator[T]],
+    tracker: LatencyTracker,
+    can_hedge: Callable[[], bool] = lambda: True,
+) -> AsyncGenerator[T, None]:
+    """
+    Stream from ``factory()`` with a hedge on time-to-first-item.
+
+    Retries only happen before the first item arrives; once a stream is
+    chosen its remaining items are passed through unchanged.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.OPENAI_REQUEST_DEADLINE_SECONDS
+    attempt = 0
+    while True:
+        started = loop.time()
+        hedge_after = tracker.hedge_after() if can_hedge() else None
+        streams = []
+
+        def start():
+            stream = factory()
+            streams.append(stream)
+            return _first_item(stream)
+
+        try:
+            (winner, has_item, first), hedged = await asyncio.wait_for(
+                _race(start, hedge_after, tracker.operation),
+                timeout=max(0.0, deadline - started),
+            )
+        except Exception as e:
+            for stream in streams:
+                await stream.aclose()
+            attempt += 1
+            await _sleep_before_retry(e, attempt, deadline, tracker.operation)
+            continue
+        break
+
+    elapsed = loop.time() - started
+    tracker.observe(elapsed)
+    first_byte_latency.observe(elapsed, operation=tracker.operation, hedged=str(hedged).lower())
+
+    for stream in streams:
+        if stream is not winner:
+            await stream.aclose()
+
+    if not has_item:
+        return
+    yield first
+    async for item in winner:
+        yield item
@@ -0,0 +1,229 @@
+"""Per-call timing and usage instrumentation for upstream OpenAI calls."""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Optional, Set
+
+from app.config import settings
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Seconds; calls are usually 0.1s-60s, TTS/STT of long audio can exceed that
+CALL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+calls_total = metrics.counter(
+    "openai_calls_total",
+    "Upstream calls by operation, model, agent and outcome",
+    ["operation", "model", "agent", "outcome"],
+)
+call_duration = metrics.histogram(
+    "openai_call_duration_seconds",
+    "Total duration of upstream calls, including queueing and retries",
+    ["operation", "model", "outcome"],
+    buckets=CALL_BUCKETS,
+)
+call_ttft = metrics.histogram(
+    "openai_call_ttft_seconds",
+    "Time to first token of streamed calls",
+    ["operation", "model"],
+    buckets=CALL_BUCKETS,
+)
+call_queue = metrics.histogram(
+    "openai_call_queue_seconds",
+    "Time calls spent waiting in the client-side scheduler",
+    ["operation", "model"],
+)
+tokens_per_second = metrics.histogram(
+    "openai_call_tokens_per_second",
+    "Completion tokens per second after the first token",
+    ["operation", "model"],
+    buckets=(5, 10, 20, 40, 60, 80, 100, 150, 200, 400),
+)
+prompt_tokens_used = metrics.counter(
+    "openai_prompt_tokens_total",
+    "Prompt (input) tokens billed per model and agent",
+    ["model", "agent"],
+)
+cached_prompt_tokens = metrics.counter(
+    "openai_cached_prompt_tokens_total",
+    "Prompt tokens served from the provider's prompt cache",
+    ["model", "agent"],
+)
+completion_tokens_used = metrics.counter(
+    "openai_completion_tokens_total",
+    "Completion tokens generated per model and agent",
+    ["model", "agent"],
+)
+
+current_agent_id: ContextVar[Optional[str]] = ContextVar("current_agent_id", default=None)
+current_call: ContextVar[Optional["CallRecord"]] = ContextVar("current_call", default=None)
+
+
+def set_current_agent(agent_id: Optional[str]) -> None:
+    """Attribute upstream calls made for the rest of this request to ``agent_id``."""
+    current_agent_id.set(agent_id)
+
+
+# Agent ids seen so far that have their own metric label
+_labelled_agents: Set[str] = set()
+
+
+def agent_label(agent_id: Optional[str]) -> str:
+    """
+    Metric label for ``agent_id``.
+
+    Agents are created by users, so only the first
+    ``METRICS_MAX_AGENT_LABELS`` of them get their own label; the rest are
+    counted as "other" to keep the registry bounded.
+    """
+    if not agent_id:
+        return ""
+    if agent_id in _labelled_agents:
+        return agent_id
+    if len(_labelled_agents) < settings.METRICS_MAX_AGENT_LABELS:
+        _labelled_agents.add(agent_id)
+        return agent_id
+    return "other"
+
+
+def _outcome(error: BaseException) -> str:
+    from app.integrations.circuit_breaker import CircuitOpenError
+
+    if isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+        return "cancelled"
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(error, asyncio.TimeoutError) or "timeout" in type(error).__name__.lower():
+        return "timeout"
+    if getattr(error, "status_code", None) == 429:
+        return "rate_limited"
+    return "error"
+
+
+class CallRecord:
+    """Timings and usage of one logical upstream call."""
+
+    def __init__(self, operation: str, model: str):
+        self.operation = operation
+        self.model = model
+        self.agent_id = current_agent_id.get()
+        self.started = time.monotonic()
+        self.first_token: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.queue_seconds = 0.0
+        self.connect_seconds = 0.0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+        self.outcome = "ok"
+
+    @property
+    def ttft(self) -> Optional[float]:
+        return self.first_token - self.started if self.first_token is not None else None
+
+    @property
+    def duration(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        if self.first_token is None or not self.completion_tokens or self.finished is None:
+            return None
+        generating = self.finished - self.first_token
+        return self.completion_tokens / generating if generating > 0 else None
+
+    def mark_first_token(self) -> None:
+        if self.first_token is None:
+            self.first_token = time.monotonic()
+
+    def add_queue_wait(self, seconds: float) -> None:
+        self.queue_seconds += seconds
+
+    def add_connect(self, seconds: float) -> None:
+        self.connect_seconds += seconds
+
+    def record_usage(self, usage: Any) -> None:
+        """Take token counts from an OpenAI usage block (chat or embeddings)."""
+        if usage is None:
+            return
+        self.prompt_tokens = int(getattr(usage, "prompt_tokens", 0) or 0)
+        self.completion_tokens = int(getattr(usage, "completion_tokens", 0) or 0)
+        details = getattr(usage, "prompt_tokens_details", None)
+        self.cached_tokens = int(getattr(details, "cached_tokens", 0) or 0) if details else 0
+
+    def finish(self, outcome: str = "ok") -> None:
+        self.finished = time.monotonic()
+        self.outcome = outcome
+        agent = agent_label(self.agent_id)
+
+        calls_total.inc(operation=self.operation, model=self.model, agent=agent, outcome=outcome)
+        call_duration.observe(
+            self.duration, operation=self.operation, model=self.model, outcome=outcome
+        )
+        call_queue.observe(self.queue_seconds, operation=self.operation, model=self.model)
+        if self.ttft is not None:
+            call_ttft.observe(self.ttft, operation=self.operation, model=self.model)
+        if self.tokens_per_second is not None:
+            tokens_per_second.observe(
+                self.tokens_per_second, operation=self.operation, model=self.model
+            )
+        if self.prompt_tokens:
+            prompt_tokens_used.inc(self.prompt_tokens, model=self.model, agent=agent)
+        if self.cached_tokens:
+            cached_prompt_tokens.inc(self.cached_tokens, model=self.model, agent=agent)
+        if self.completion_tokens:
+            completion_tokens_used.inc(self.completion_tokens, model=self.model, agent=agent)
+
+        if self._is_slow():
+            logger.warning(f"Slow OpenAI call: {self.describe()}")
+
+    def _is_slow(self) -> bool:
+        if self.duration >= settings.SLOW_CALL_SECONDS:
+            return True
+        return self.ttft is not None and self.ttft >= settings.SLOW_TTFT_SECONDS
+
+    def describe(self) -> str:
+        parts = [
+            f"operation={self.operation}",
+            f"model={self.model}",
+            f"agent={self.agent_id or '-'}",
+            f"outcome={self.outcome}",
+            f"queue={self.queue_seconds:.2f}s",
+        ]
+        if self.connect_seconds:
+            parts.append(f"connect={self.connect_seconds:.2f}s")
+        if self.ttft is not None:
+            parts.append(f"ttft={self.ttft:.2f}s")
+        parts.append(f"duration={self.duration:.2f}s")
+        if self.prompt_tokens or self.completion_tokens:
+            parts.append(
+                f"tokens={self.prompt_tokens}+{self.completion_tokens}"
+                f" (cached {self.cached_tokens})"
+            )
+        if self.tokens_per_second is not None:
+            parts.append(f"rate={self.tokens_per_second:.0f} tok/s")
+        return " ".join(parts)
+
+
+@asynccontextmanager
+async def track_call(operation: str, model: str) -> AsyncIterator[CallRecord]:
+    """Record one upstream call; nested scheduler waits and usage attach to it."""
+    record = CallRecord(operation, model)
+    token = current_call.set(record)
+    try:
+        yield record
+    except BaseException as e:
+        record.finish(_outcome(e))
+        raise
+    else:
+        record.finish()
+    finally:
+        try:
+            current_call.reset(token)
+        except ValueError:
+            # A stream closed from another context (e.g. abandoned by its consumer)
+            pass
@@ -0,0 +1,196 @@
+"""Per-request chat model selection from prompt size, RAG context, agent policy and live latency."""
+
+import logging
+import re
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.integrations.hedging import LatencyTracker
+from app.integrations.rate_limiter import estimate_tokens
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+route_decisions = metrics.counter(
+    "openai_route_decisions_total",
+    "Chat requests routed to each model tier, by deciding rule",
+    ["tier", "reason"],
+)
+tier_first_byte = metrics.histogram(
+    "openai_route_first_byte_seconds",
+    "Time to first token (or full response) per model tier",
+    ["tier", "operation"],
+)
+model_latency = metrics.gauge(
+    "openai_model_latency_p95_seconds",
+    "Observed p95 first-byte latency per chat model, as used for routing",
+    ["model", "operation"],
+)
+
+
+class ModelTier(str, Enum):
+    """Chat model tiers, cheapest first."""
+
+    FAST = "fast"
+    STANDARD = "standard"
+    LARGE = "large"
+
+
+TIER_ORDER = [ModelTier.FAST, ModelTier.STANDARD, ModelTier.LARGE]
+
+# The only turns the fast tier answers: greetings, thanks and goodbyes. Short
+# questions ("What is your refund policy?") and replies like "yes" that only
+# make sense against the history still go to the standard tier.
+SMALL_TALK_WORDS = frozenset(
+    "hi hello hey hiya howdy good morning afternoon evening day night "
+    "thanks thank you thx ty cheers much so very a lot "
+    "bye goodbye see later soon take care".split()
+)
+
+
+def is_small_talk(text: str) -> bool:
+    """Whether a message is only a greeting, thanks or goodbye."""
+    if "?" in text:
+        return False
+    words = re.findall(r"[a-z']+", text.lower())
+    return bool(words) and all(word in SMALL_TALK_WORDS for word in words)
+
+
+@dataclass(frozen=True)
+class Route:
+    """The model picked for one request and why."""
+
+    tier: ModelTier
+    model: str
+    reason: str
+
+
+class ModelRouter:
+    """
+    Picks a model tier per chat request.
+
+    Agents can pin a tier; otherwise very large prompts go to the large
+    tier, requests with RAG context to at least the standard tier, and
+    short small talk without context (greetings, "thanks") to the fast tier.
+    If the chosen model's observed p95 latency is over budget, the next
+    cheaper tier is used when it is currently faster.
+    """
+
+    def __init__(self):
+        self._trackers: Dict[Tuple[str, str], LatencyTracker] = {}
+
+    def model_for(self, tier: ModelTier) -> str:
+        if tier == ModelTier.FAST:
+            return settings.OPENAI_FAST_MODEL or settings.OPENAI_MODEL
+        if tier == ModelTier.LARGE:
+            return settings.OPENAI_LARGE_MODEL or settings.OPENAI_MODEL
+        return settings.OPENAI_MODEL
+
+    def tracker(self, operation: str, model: str) -> LatencyTracker:
+        """Latency window for one operation on one model (shared with hedging)."""
+        key = (operation, model)
+        tracker = self._trackers.get(key)
+        if tracker is None:
+            tracker = LatencyTracker(operation)
+            self._trackers[key] = tracker
+        return tracker
+
+    def observe(self, operation: str, route: Route, seconds: float) -> None:
+        tier_first_byte.observe(seconds, tier=route.tier.value, operation=operation)
+
+    def _p95(self, operation: str, model: str) -> Optional[float]:
+        return self.tracker(operation, model).quantile(0.95)
+
+    def _choose_tier(
+        self,
+        prompt_tokens: int,
+        message_tokens: int,
+        history_tokens: int,
+        has_context: bool,
+        message: str,
+    ) -> Tuple[ModelTier, str]:
+        if prompt_tokens >= settings.ROUTING_LARGE_PROMPT_TOKENS:
+            return ModelTier.LARGE, "large_prompt"
+        if has_context:
+            return ModelTier.STANDARD, "rag_context"
+        if (
+            message_tokens <= settings.ROUTING_TRIVIAL_MAX_TOKENS
+            and history_tokens <= settings.ROUTING_FAST_MAX_HISTORY_TOKENS
+            and is_small_talk(message)
+        ):
+            return ModelTier.FAST, "trivial"
+        return ModelTier.STANDARD, "default"
+
+    def route(
+        self,
+        operation: str,
+        prompt_tokens: int,
+        message_tokens: int,
+        history_tokens: int = 0,
+        has_context: bool = False,
+        policy: str = "auto",
+        message: str = "",
+    ) -> Route:
+        """
+        Pick the model for a request.
+
+        ``prompt_tokens`` covers the whole prompt including the system
+        prompt, ``message_tokens`` the latest user message (``message``)
+        and ``history_tokens`` the earlier turns.
+        """
+        if not settings.MODEL_ROUTING_ENABLED:
+            route = Route(ModelTier.STANDARD, settings.OPENAI_MODEL, "disabled")
+        elif policy and policy != "auto":
+            tier = ModelTier(policy)
+            route = Route(tier, self.model_for(tier), "agent_policy")
+        else:
+            tier, reason = self._choose_tier(
+                prompt_tokens, message_tokens, history_tokens, has_context, message
+            )
+            route = self._avoid_slow_model(operation, Route(tier, self.model_for(tier), reason))
+
+        route_decisions.inc(tier=route.tier.value, reason=route.reason)
+        return route
+
+    def _avoid_slow_model(self, operation: str, route: Route) -> Route:
+        latency = self._p95(operation, route.model)
+        if latency is None or latency <= settings.ROUTING_LATENCY_BUDGET_SECONDS:
+            return route
+
+        index = TIER_ORDER.index(route.tier)
+        if index == 0:
+            return route
+        cheaper = TIER_ORDER[index - 1]
+        model = self.model_for(cheaper)
+        cheaper_latency = self._p95(operation, model)
+        if model == route.model or (cheaper_latency is not None and cheaper_latency >= latency):
+            return route
+        logger.info(
+            f"{route.model} p95 {latency:.2f}s is over budget; routing to {cheaper.value} tier"
+        )
+        return Route(cheaper, model, "latency")
+
+    def latency_snapshot(self) -> Dict[Tuple[str, ...], float]:
+        values = {}
+        for (operation, model), tracker in list(self._trackers.items()):
+            p95 = tracker.quantile(0.95)
+            if p95 is not None:
+                values[(model, operation)] = p95
+        return values
+
+
+def prompt_tokens(
+    system_prompt: str,
+    messages: List[Dict[str, str]],
+) -> Tuple[int, int, int]:
+    """Estimated tokens of the whole prompt, the latest message and the earlier turns."""
+    message = estimate_tokens(messages[-1]["content"]) if messages else 0
+    history = estimate_tokens(*(m["content"] for m in messages[:-1])) if len(messages) > 1 else 0
+    return estimate_tokens(system_prompt) + message + history, message, history
+
+
+# Singleton instance
+model_router = ModelRouter()
+model_latency.set_function(model_router.latency_snapshot)
@@ -1,75 +1,247 @@
-from typing import AsyncGenerator, List, Dict, Optional
+import asyncio
+import time
+from typing import Any, AsyncGenerator, List, Dict, Optional, Union
 from pathlib import Path
 
 from openai import AsyncOpenAI
 
 from app.config import settings
+from app.integrations.circuit_breaker import circuit_breakers
+from app.integrations.clients import client_registry
+from app.integrations.hedging import hedged_call, hedged_stream
+from app.integrations.instrumentation import current_call, track_call
+from app.integrations.model_router import Route, model_router, prompt_tokens
+from app.integrations.rate_limiter import Priority, estimate_tokens, rate_limiter
+from app.integrations.singleflight import SingleFlight, make_key
 
 
 class OpenAIClient:
     """Client for OpenAI API interactions."""
 
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
         self.model = settings.OPENAI_MODEL
         self.tts_model = settings.OPENAI_TTS_MODEL
         self.tts_voice = settings.OPENAI_TTS_VOICE
         self.whisper_model = settings.OPENAI_WHISPER_MODEL
+        self.whisper_language = settings.OPENAI_WHISPER_LANGUAGE
+        self.flights = SingleFlight()
+        self.router = model_router
 
-    async def chat_stream(
+    # Looked up on every use: the registry replaces its client after close()
+    @property
+    def client(self) -> AsyncOpenAI:
+        return client_registry.openai
+
+    @property
+    def chat_client(self) -> AsyncOpenAI:
+        """Client for chat calls, which retry (and hedge) in app.integrations.hedging instead."""
+        return client_registry.openai_chat
+
+    def _route(
         self,
+        operation: str,
         system_prompt: str,
         messages: List[Dict[str, str]],
-    ) -> AsyncGenerator[str, None]:
-        """Stream chat completion tokens."""
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=[
+        has_context: bool,
+        model_policy: str,
+    ) -> Route:
+        total, message, history = prompt_tokens(system_prompt, messages)
+        text = messages[-1]["content"] if messages else ""
+        return self.router.route(operation, total, message, history, has_context, model_policy, text)
+
+    def _chat_request(
+        self,
+        system_prompt: str,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        prompt_cache_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Build chat completion request parameters."""
+        request = {
+            "model": model or self.model,
+            "messages": [
                 {"role": "system", "content": system_prompt},
                 *messages,
             ],
-            stream=True,
-        )
+        }
+        if prompt_cache_key:
+            # Requests sharing a prefix are routed to the same prompt cache
+            request["prompt_cache_key"] = prompt_cache_key
+        return request
+
+    def _record_usage(self, usage: Any) -> None:
+        """Attach billed, cached and generated tokens to the call being tracked."""
+        call = current_call.get()
+        if call is not None:
+            call.record_usage(usage)
+
+    async def chat_stream(
+        self,
+        system_prompt: str,
+        messages: List[Dict[str, str]],
+        priority: Priority = Priority.INTERACTIVE,
+        has_context: bool = False,
+        model_policy: str = "auto",
+        prompt_cache_key: Optional[str] = None,
+    ) -> AsyncGenerator[str, None]:
+        """Stream chat completion tokens from the model routed for this request."""
+        route = self._route("chat_stream", system_prompt, messages, has_context, model_policy)
+        request = self._chat_request(system_prompt, messages, route.model, prompt_cache_key)
+
+        async def upstream() -> AsyncGenerator[str, None]:
+            started = time.monotonic()
+            async with track_call("chat_stream", route.model) as record:
+                # Fail fast before queueing; each attempt is guarded on its own
+                circuit_breakers.chat.check()
+                first = True
+                async for token in hedged_stream(
+                    lambda: self._chat_stream_upstream(request, priority),
+                    self.router.tracker("chat_stream", route.model),
+                    lambda: self._can_hedge(request, priority),
+                ):
+                    if first:
+                        first = False
+                        record.mark_first_token()
+                        self.router.observe("chat_stream", route, time.monotonic() - started)
+                    yield token
+
+        if not settings.SINGLEFLIGHT_ENABLED:
+            async for token in upstream():
+                yield token
+            return
+
+        # Identical concurrent requests share one upstream stream
+        key = make_key("chat_stream", request)
+        async for token in self.flights.stream(key, upstream):
+            yield token
 
-        async for chunk in response:
-            if chunk.choices[0].delta.content:
-                yield chunk.choices[0].delta.content
+    def _can_hedge(self, request: Dict[str, Any], priority: Priority) -> bool:
+        """Only hedge interactive calls, and never while the model's queue is backed up."""
+        if priority != Priority.INTERACTIVE:
+            return False
+        return rate_limiter.limiter(request["model"]).queued == 0
+
+    def _estimate_chat_tokens(self, request: Dict[str, Any]) -> int:
+        prompt = estimate_tokens(*(m["content"] for m in request["messages"]))
+        return prompt + settings.RATE_LIMIT_COMPLETION_TOKENS_ESTIMATE
+
+    async def _chat_stream_upstream(
+        self,
+        request: Dict[str, Any],
+        priority: Priority,
+    ) -> AsyncGenerator[str, None]:
+        tokens = self._estimate_chat_tokens(request)
+        async with rate_limiter.slot(request["model"], tokens, priority) as slot:
+            # Only the request itself counts towards the breaker, not the slot wait
+            async with circuit_breakers.chat.guard() as call:
+                raw = await self.chat_client.chat.completions.with_raw_response.create(
+                    **request, stream=True, stream_options={"include_usage": True}
+                )
+                slot.update_from_headers(raw.headers)
+                response = raw.parse()
+
+                async for chunk in response:
+                    call.mark_first_byte()
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+                    elif not chunk.choices:
+                        # Final chunk carries usage only
+                        self._record_usage(chunk.usage)
 
     async def chat_completion(
         self,
         system_prompt: str,
         messages: List[Dict[str, str]],
+        priority: Priority = Priority.INTERACTIVE,
+        has_context: bool = False,
+        model_policy: str = "auto",
+        prompt_cache_key: Optional[str] = None,
     ) -> str:
-        """Get non-streaming chat completion."""
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                *messages,
-            ],
-            stream=False,
-        )
+        """Get non-streaming chat completion from the model routed for this request."""
+        route = self._route("chat_completion", system_prompt, messages, has_context, model_policy)
+        request = self._chat_request(system_prompt, messages, route.model, prompt_cache_key)
 
+        async def upstream() -> str:
+            started = time.monotonic()
+            async with track_call("chat_completion", route.model):
+                circuit_breakers.chat.check()
+                response = await hedged_call(
+                    lambda: self._chat_completion_upstream(request, priority),
+                    self.router.tracker("chat_completion", route.model),
+                    lambda: self._can_hedge(request, priority),
+                )
+            self.router.observe("chat_completion", route, time.monotonic() - started)
+            return response
+
+        if not settings.SINGLEFLIGHT_ENABLED:
+            return await upstream()
+
+        key = make_key("chat_completion", request)
+        return await self.flights.do(key, upstream)
+
+    async def _chat_completion_upstream(self, request: Dict[str, Any], priority: Priority) -> str:
+        tokens = self._estimate_chat_tokens(request)
+        async with rate_limiter.slot(request["model"], tokens, priority) as slot:
+            # The whole generation comes back at once, so its length says
+            # nothing about the endpoint: only failures count
+            async with circuit_breakers.chat.guard(timed=False):
+                raw = await self.chat_client.chat.completions.with_raw_response.create(
+                    **request, stream=False
+                )
+            slot.update_from_headers(raw.headers)
+            response = raw.parse()
+
+        self._record_usage(response.usage)
         return response.choices[0].message.content or ""
 
-    async def speech_to_text(self, audio_path: Path) -> str:
-        """Transcribe audio to text using Whisper."""
-        with open(audio_path, "rb") as audio_file:
-            response = await self.client.audio.transcriptions.create(
-                model=self.whisper_model,
-                file=audio_file,
-            )
+    async def speech_to_text(self, audio: Union[bytes, Path], filename: Optional[str] = None) -> str:
+        """
+        Transcribe audio to text using Whisper.
+
+        ``audio`` is the raw upload (``filename`` tells Whisper its format)
+        or a path to an audio file.
+        """
+        if isinstance(audio, Path):
+            audio, filename = await asyncio.to_thread(audio.read_bytes), filename or audio.name
+
+        async with track_call("speech_to_text", self.whisper_model):
+            circuit_breakers.stt.check()
+            async with rate_limiter.slot(self.whisper_model), circuit_breakers.stt.guard():
+                language = {"language": self.whisper_language} if self.whisper_language else {}
+                response = await self.client.audio.transcriptions.create(
+                    model=self.whisper_model,
+                    file=(filename or "audio.webm", audio),
+                    **language,
+                )
 
         return response.text
 
-    async def text_to_speech(self, text: str) -> bytes:
-        """Convert text to speech."""
-        response = await self.client.audio.speech.create(
-            model=self.tts_model,
-            voice=self.tts_voice,
-            input=text,
+    async def text_to_speech(
+        self,
+        text: str,
+        priority: Priority = Priority.INTERACTIVE,
+        response_format: str = "mp3",
+    ) -> bytes:
+        """Convert text to speech (``response_format``: mp3, opus, aac, ...)."""
+        if not settings.SINGLEFLIGHT_ENABLED:
+            return await self._text_to_speech_upstream(text, priority, response_format)
+
+        key = make_key("text_to_speech", self.tts_model, self.tts_voice, response_format, text)
+        return await self.flights.do(
+            key, lambda: self._text_to_speech_upstream(text, priority, response_format)
         )
 
+    async def _text_to_speech_upstream(self, text: str, priority: Priority, response_format: str) -> bytes:
+        async with track_call("text_to_speech", self.tts_model):
+            circuit_breakers.tts.check()
+            async with rate_limiter.slot(self.tts_model, priority=priority), circuit_breakers.tts.guard():
+                response = await self.client.audio.speech.create(
+                    model=self.tts_model,
+                    voice=self.tts_voice,
+                    input=text,
+                    response_format=response_format,
+                )
+
         return response.content
 
 
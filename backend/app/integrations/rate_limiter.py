@@ -0,0 +1,274 @@
+"""Client-side rate limiting and priority scheduling of OpenAI calls."""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import re
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import AsyncIterator, Dict, List, Mapping, Optional, Tuple
+
+from app.config import settings
+from app.integrations.instrumentation import current_call
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+queue_wait = metrics.histogram(
+    "openai_scheduler_wait_seconds",
+    "Time calls waited in the client-side scheduler",
+    ["model", "priority"],
+)
+concurrency_limit = metrics.gauge(
+    "openai_scheduler_concurrency_limit",
+    "Current AIMD concurrency limit per model",
+    ["model"],
+)
+rate_limited = metrics.counter(
+    "openai_rate_limited_total",
+    "Upstream 429 responses per model",
+    ["model"],
+)
+
+
+class Priority(IntEnum):
+    """Scheduling priority; lower values are served first."""
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+    BULK = 2
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Rough token estimate (~4 characters per token)."""
+    return sum(len(text) for text in texts) // 4 + 1
+
+
+def _parse_reset(value: Optional[str]) -> Optional[float]:
+    """Parse reset durations such as ``1s``, ``6m0s`` or ``250ms`` into seconds."""
+    if not value:
+        return None
+    total = 0.0
+    for amount, unit in re.findall(r"([\d.]+)(ms|s|m|h)", value):
+        total += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total
+
+
+class TokenBucket:
+    """Token bucket refilled continuously up to its capacity."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self._updated = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / 60
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def time_until(self, amount: float) -> float:
+        """Seconds until ``amount`` can be consumed."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate if self.rate else float("inf")
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def update(self, limit: Optional[float], remaining: Optional[float]) -> None:
+        """Adopt the quota and remaining budget reported by the provider."""
+        self._refill()
+        if limit:
+            self.capacity = limit
+        if remaining is not None:
+            self.level = min(self.capacity, remaining)
+
+
+class ModelLimiter:
+    """
+    Requests/min and tokens/min buckets plus an AIMD concurrency limit for
+    one model. Waiters are served strictly by priority, then arrival order.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        rpm: int = settings.RATE_LIMIT_DEFAULT_RPM,
+        tpm: int = settings.RATE_LIMIT_DEFAULT_TPM,
+        max_concurrency: int = settings.RATE_LIMIT_MAX_CONCURRENCY,
+        min_concurrency: int = settings.RATE_LIMIT_MIN_CONCURRENCY,
+    ):
+        self.model = model
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency = float(max_concurrency)
+        self.in_flight = 0
+        self._waiters: List[Tuple[int, int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        concurrency_limit.set(self.concurrency, model=model)
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _dispatch(self) -> None:
+        self._timer = None
+        while self._waiters:
+            _, _, tokens, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if self.in_flight >= int(self.concurrency):
+                return
+
+            wait = max(self.requests.time_until(1), self.tokens.time_until(tokens))
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+
+            heapq.heappop(self._waiters)
+            self.requests.consume(1)
+            self.tokens.consume(tokens)
+            self.in_flight += 1
+            future.set_result(None)
+
+    async def acquire(self, tokens: int, priority: Priority) -> None:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._counter), tokens, future))
+        if self._timer is None:
+            self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as we were cancelled: hand the slot back
+                self.release()
+            raise
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        if self._timer is None:
+            self._dispatch()
+
+    def on_success(self) -> None:
+        """Additive increase: about +1 per window of ``concurrency`` successes."""
+        self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+        concurrency_limit.set(self.concurrency, model=self.model)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None) -> None:
+        """Multiplicative decrease and pause new requests until the quota resets."""
+        self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+        self.requests.update(None, 0)
+        if retry_after:
+            # Keep the bucket empty for retry_after seconds
+            self.requests.level = -retry_after * self.requests.rate
+        concurrency_limit.set(self.concurrency, model=self.model)
+        rate_limited.inc(model=self.model)
+        logger.warning(
+            f"Rate limited on {self.model}; concurrency limit now {self.concurrency:.1f}"
+        )
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """Sync buckets with the ``x-ratelimit-*`` response headers."""
+
+        def number(name: str) -> Optional[float]:
+            value = headers.get(name)
+            try:
+                return float(value) if value is not None else None
+            except ValueError:
+                return None
+
+        self.requests.update(
+            number("x-ratelimit-limit-requests"), number("x-ratelimit-remaining-requests")
+        )
+        self.tokens.update(
+            number("x-ratelimit-limit-tokens"), number("x-ratelimit-remaining-tokens")
+        )
+
+
+class Slot:
+    """A granted scheduler slot; report response headers through it."""
+
+    def __init__(self, limiter: ModelLimiter):
+        self.limiter = limiter
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        self.limiter.update_from_headers(headers)
+
+
+class RateLimiter:
+    """Per-model limiters shared by every OpenAI call in the process."""
+
+    def __init__(self):
+        self._limiters: Dict[str, ModelLimiter] = {}
+
+    def limiter(self, model: str) -> ModelLimiter:
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            limiter = ModelLimiter(model)
+            self._limiters[model] = limiter
+        return limiter
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        model: str,
+        tokens: int = 1,
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> AsyncIterator[Slot]:
+        """Wait for capacity on ``model`` and hold a concurrency slot for the block."""
+        if not settings.RATE_LIMIT_ENABLED:
+            yield Slot(self.limiter(model))
+            return
+
+        limiter = self.limiter(model)
+        started = time.monotonic()
+        await limiter.acquire(tokens, priority)
+        waited = time.monotonic() - started
+        queue_wait.observe(waited, model=model, priority=priority.name.lower())
+        call = current_call.get()
+        if call is not None:
+            call.add_queue_wait(waited)
+        try:
+            yield Slot(limiter)
+        except Exception as e:
+            if _is_rate_limit_error(e):
+                limiter.on_rate_limited(_retry_after(e))
+            raise
+        else:
+            limiter.on_success()
+        finally:
+            limiter.release()
+
+
+def _is_rate_limit_error(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return _parse_reset(headers.get("x-ratelimit-reset-requests"))
+
+
+# Singleton instance
+rate_limiter = RateLimiter()
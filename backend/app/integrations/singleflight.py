@@ -0,0 +1,107 @@
+"""Single-flight coalescing of identical in-flight upstream calls."""
+
+import asyncio
+import hashlib
+import json
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, Generic, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def make_key(*parts: Any) -> str:
+    """Build a stable key from JSON-serializable request parts."""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _Broadcast(Generic[T]):
+    """Items of one upstream stream, replayable by any number of subscribers."""
+
+    def __init__(self):
+        self.items: List[T] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def pump(self, source: AsyncIterator[T]) -> None:
+        try:
+            async for item in source:
+                self.items.append(item)
+                self._notify()
+        except asyncio.CancelledError:
+            self.error = ConnectionError("Upstream stream was cancelled")
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+
+    async def subscribe(self) -> AsyncGenerator[T, None]:
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self.items):
+                yield self.items[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+
+class SingleFlight:
+    """
+    Share one upstream call between identical concurrent requests.
+
+    The upstream call runs in its own task, so a caller that gives up (for
+    example a disconnected client) does not cancel it for the others. The
+    key is forgotten as soon as the call finishes: this deduplicates
+    in-flight work only, it is not a cache.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+        self._streams: Dict[str, _Broadcast] = {}
+        self.shared_calls = 0
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls) + len(self._streams)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await ``fn()``, or the identical call already in flight."""
+        future = self._calls.get(key)
+        # A finished call may linger until its done-callback runs; never reuse it
+        if future is not None and not future.done():
+            self.shared_calls += 1
+        else:
+            future = asyncio.ensure_future(fn())
+            self._calls[key] = future
+            future.add_done_callback(lambda f: self._forget(self._calls, key, f))
+        return await asyncio.shield(future)
+
+    async def stream(self, key: str, factory: Callable[[], AsyncIterator[T]]) -> AsyncGenerator[T, None]:
+        """Iterate ``factory()``, multicasting one upstream stream to all identical callers."""
+        broadcast = self._streams.get(key)
+        if broadcast is not None and not broadcast.done:
+            self.shared_calls += 1
+        else:
+            broadcast = _Broadcast()
+            self._streams[key] = broadcast
+            broadcast.task = asyncio.create_task(broadcast.pump(factory()))
+            broadcast.task.add_done_callback(lambda _: self._forget(self._streams, key, broadcast))
+
+        async for item in broadcast.subscribe():
+            yield item
+
+    @staticmethod
+    def _forget(registry: Dict[str, Any], key: str, value: Any) -> None:
+        if registry.get(key) is value:
+            del registry[key]
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
@@ -6,7 +7,11 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import settings
 from app.database.connection import init_db
-from app.routes import agents, sessions, messages, voice, health, documents
+from app.integrations.clients import client_registry
+from app.routes import agents, sessions, messages, voice, health, documents, metrics
+from app.services.audio_retention import audio_retention
+from app.services.audio_store import audio_store
+from app.services.tts_cache import tts_cache
 
 # Configure logging
 logging.basicConfig(
@@ -35,10 +40,30 @@ async def lifespan(app: FastAPI):
 
     await init_db()
     logger.info("Database initialized")
+
+    if settings.OPENAI_API_KEY and settings.OPENAI_WARM_POOL:
+        await client_registry.warm()
+
+    await tts_cache.load()
+    prerender = None
+    if settings.OPENAI_API_KEY and settings.TTS_CACHE_PRERENDER_FALLBACKS:
+        from app.services.voice_service import prerender_fallback_speech
+
+        # In the background: startup should not wait on TTS
+        prerender = asyncio.create_task(prerender_fallback_speech())
+
+    retention = None
+    if settings.AUDIO_RETENTION_ENABLED:
+        retention = asyncio.create_task(audio_retention.run())
+
     yield
     # Shutdown
     logger.info("Shutting down AI Agent Platform...")
-    pass
+    for task in (prerender, retention):
+        if task is not None:
+            task.cancel()
+    await client_registry.close()
+    await audio_store.close()
 
 
 app = FastAPI(
@@ -54,6 +79,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Cross-origin clients need the id to resume a generation
+    expose_headers=["X-Stream-Id"],
 )
 
 # Include routers
@@ -63,4 +90,5 @@ app.include_router(sessions.router, prefix=settings.API_PREFIX, tags=["Sessions"
 app.include_router(messages.router, prefix=settings.API_PREFIX, tags=["Messages"])
 app.include_router(voice.router, prefix=settings.API_PREFIX, tags=["Voice"])
 app.include_router(documents.router, prefix=settings.API_PREFIX, tags=["Documents"])
+app.include_router(metrics.router, prefix=settings.API_PREFIX, tags=["Metrics"])
 
@@ -1,8 +1,8 @@
 from app.models.base import Base
-from app.models.agent import Agent
+from app.models.agent import Agent, ModelPolicy
 from app.models.session import Session
 from app.models.message import Message, MessageType, MessageRole
 from app.models.document import Document, DocumentChunk
 
-__all__ = ["Base", "Agent", "Session", "Message", "MessageType", "MessageRole", "Document", "DocumentChunk"]
+__all__ = ["Base", "Agent", "ModelPolicy", "Session", "Message", "MessageType", "MessageRole", "Document", "DocumentChunk"]
 
@@ -1,12 +1,28 @@
 from datetime import datetime
+from enum import Enum
 from uuid import uuid4
 
-from sqlalchemy import Column, DateTime, String, Text
+from sqlalchemy import Boolean, Column, DateTime, String, Text, false
 from sqlalchemy.orm import relationship
 
 from app.models.base import Base
 
 
+class ModelPolicy(str, Enum):
+    """Which chat model tier an agent uses."""
+    AUTO = "auto"
+    FAST = "fast"
+    STANDARD = "standard"
+    LARGE = "large"
+
+
+class TTSFormat(str, Enum):
+    """Audio format of an agent's synthesized speech."""
+    MP3 = "mp3"
+    OPUS = "opus"
+    AAC = "aac"
+
+
 class Agent(Base):
     """AI Agent model."""
 
@@ -15,6 +31,14 @@ class Agent(Base):
     id = Column(String(36), primary_key=True, default=lambda: str(uuid4()))
     name = Column(String(100), nullable=False)
     system_prompt = Column(Text, nullable=False)
+    # Server defaults fill these in for agents created before the column existed
+    response_cache_enabled = Column(Boolean, default=False, server_default=false(), nullable=False)
+    model_policy = Column(
+        String(20), default=ModelPolicy.AUTO.value, server_default=ModelPolicy.AUTO.value, nullable=False
+    )
+    tts_format = Column(
+        String(10), default=TTSFormat.MP3.value, server_default=TTSFormat.MP3.value, nullable=False
+    )
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
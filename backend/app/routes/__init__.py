@@ -1,4 +1,3 @@
-from app.routes import agents, sessions, messages, voice, health, documents
-
-__all__ = ["agents", "sessions", "messages", "voice", "health", "documents"]
+from app.routes import agents, sessions, messages, voice, health, documents, metrics
 
+__all__ = ["agents", "sessions", "messages", "voice", "health", "documents", "metrics"]
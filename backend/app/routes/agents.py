@@ -26,6 +26,9 @@ def agent_to_response(agent: Agent, session_count: int = 0) -> AgentResponse:
         id=agent.id,
         name=agent.name,
         system_prompt=agent.system_prompt,
+        response_cache_enabled=bool(agent.response_cache_enabled),
+        model_policy=agent.model_policy or "auto",
+        tts_format=agent.tts_format or "mp3",
         created_at=agent.created_at,
         updated_at=agent.updated_at,
         session_count=session_count,
@@ -58,6 +61,9 @@ async def create_agent(
     agent = Agent(
         name=agent_data.name,
         system_prompt=agent_data.system_prompt,
+        response_cache_enabled=agent_data.response_cache_enabled,
+        model_policy=agent_data.model_policy.value,
+        tts_format=agent_data.tts_format.value,
     )
     db.add(agent)
     await db.flush()
@@ -111,6 +117,12 @@ async def update_agent(
         agent.name = agent_data.name
     if agent_data.system_prompt is not None:
         agent.system_prompt = agent_data.system_prompt
+    if agent_data.response_cache_enabled is not None:
+        agent.response_cache_enabled = agent_data.response_cache_enabled
+    if agent_data.model_policy is not None:
+        agent.model_policy = agent_data.model_policy.value
+    if agent_data.tts_format is not None:
+        agent.tts_format = agent_data.tts_format.value
 
     await db.flush()
     await db.refresh(agent)
@@ -172,6 +184,7 @@ async def refine_prompt(
         refined_prompt = await openai_client.chat_completion(
             system_prompt=PROMPT_ENGINEER_SYSTEM,
             messages=[{"role": "user", "content": f"Create a system prompt for an AI assistant with this purpose:\n\n{request.description}"}],
+            model_policy="standard",
         )
         
         return PromptRefineResponse(system_prompt=refined_prompt.strip())
@@ -8,6 +8,8 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database.connection import get_db
+from app.integrations.instrumentation import set_current_agent
+from app.integrations.rate_limiter import Priority
 from app.models.agent import Agent
 from app.models.document import Document
 from app.schemas.document import (
@@ -74,6 +76,7 @@ async def upload_document(
 
     try:
         rag_service = RAGService(db)
+        set_current_agent(agent_id)
 
         # Parse document into chunks
         chunks = await rag_service.parse_document(content, file.filename or "document")
@@ -86,8 +89,8 @@ async def upload_document(
 
         logger.info(f"Parsed document into {len(chunks)} chunks")
 
-        # Generate embeddings
-        embeddings = await rag_service.generate_embeddings(chunks)
+        # Generate embeddings (bulk ingestion yields to interactive chat)
+        embeddings = await rag_service.generate_embeddings(chunks, priority=Priority.BULK)
         
         logger.info(f"Generated {len(embeddings)} embeddings")
 
@@ -1,15 +1,18 @@
 import json
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
 from fastapi.responses import StreamingResponse
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database.connection import get_db
+from app.config import settings
+from app.database.connection import get_db, session_scope
 from app.models.session import Session
 from app.models.message import Message, MessageRole, MessageType
 from app.schemas.message import MessageCreate, MessageResponse, MessageListResponse
+from app.services.stream_registry import stream_registry
+from app.utils.sse import SSE_HEADERS
 
 router = APIRouter()
 
@@ -83,9 +86,19 @@ async def list_messages(
 async def send_message(
     session_id: str,
     message_data: MessageCreate,
+    request: Request,
     db: AsyncSession = Depends(get_db),
 ) -> StreamingResponse:
-    """Send a text message and get streaming response via SSE."""
+    """
+    Send a text message and get streaming response via SSE.
+
+    Agents with the response cache enabled may answer from cache; send the
+    bypass header (``X-Cache-Bypass: 1`` by default) to force a fresh answer.
+
+    The generation runs independently of this connection. Its id is returned
+    in the ``X-Stream-Id`` header and every event carries a sequence ``id``,
+    so a dropped client can resume via ``GET .../messages/stream/{stream_id}``.
+    """
     from app.services.chat_service import ChatService
 
     # Verify session exists and get agent
@@ -99,14 +112,51 @@ async def send_message(
             detail="Session not found",
         )
 
-    chat_service = ChatService(db)
+    # End the read transaction so this request holds no connection while streaming
+    await db.commit()
+
+    bypass_cache = request.headers.get(settings.RESPONSE_CACHE_BYPASS_HEADER, "").lower()
+    use_cache = bypass_cache not in ("1", "true", "yes")
+    content = message_data.content
+
+    async def generate():
+        # Own session: the generation may outlive this request
+        async with session_scope() as stream_db:
+            chat_service = ChatService(stream_db)
+            async for event in chat_service.send_message_stream(session_id, content, use_cache):
+                yield event
+
+    stream = stream_registry.start(session_id, generate())
+
+    return StreamingResponse(
+        stream.subscribe(),
+        media_type="text/event-stream",
+        headers={**SSE_HEADERS, "X-Stream-Id": stream.id},
+    )
+
+
+@router.get("/sessions/{session_id}/messages/stream/{stream_id}")
+async def resume_message_stream(
+    session_id: str,
+    stream_id: str,
+    last_event_id: Optional[int] = Header(default=None, alias="Last-Event-ID"),
+    after: Optional[int] = Query(default=None, ge=0),
+) -> StreamingResponse:
+    """
+    Resume a generation: replay events after ``Last-Event-ID`` (or ``?after=``),
+    then follow live events until it completes.
+    """
+    stream = stream_registry.get(stream_id)
+    if not stream or stream.session_id != session_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Stream not found",
+        )
+
+    cursor = last_event_id if last_event_id is not None else (after or 0)
 
     return StreamingResponse(
-        chat_service.send_message_stream(session_id, message_data.content),
+        stream.subscribe(cursor),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        },
+        headers={**SSE_HEADERS, "X-Stream-Id": stream.id},
     )
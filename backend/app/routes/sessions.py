@@ -154,6 +154,9 @@ async def get_session(
             id=agent.id,
             name=agent.name,
             system_prompt=agent.system_prompt,
+            response_cache_enabled=bool(agent.response_cache_enabled),
+            model_policy=agent.model_policy or "auto",
+            tts_format=agent.tts_format or "mp3",
             created_at=agent.created_at,
             updated_at=agent.updated_at,
             session_count=0,  # Not needed here
@@ -1,29 +1,37 @@
-import os
-from pathlib import Path
+import re
+from typing import Optional, Tuple
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, WebSocket, status
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
-from app.database.connection import get_db
+from app.database.connection import get_db, session_scope
 from app.models.session import Session
 from app.schemas.voice import VoiceMessageResponse
+from app.services.audio_formats import content_type_for
+from app.services.audio_store import AUDIO_FOLDERS, audio_store, valid_name
+from app.services.audio_upload import AUDIO_UPLOAD_OPENAPI, AudioUpload, receive_audio_upload
+from app.utils.sse import SSE_HEADERS
 
 router = APIRouter()
 
+# Audio files never change once written, so clients may cache them for good
+AUDIO_CACHE_HEADERS = {
+    "Cache-Control": "public, max-age=31536000, immutable",
+    "Content-Disposition": "inline",
+}
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d+)-(\d*)$")
 
-@router.post("/sessions/{session_id}/voice", response_model=VoiceMessageResponse)
-async def send_voice_message(
-    session_id: str,
-    audio: UploadFile = File(...),
-    db: AsyncSession = Depends(get_db),
-) -> VoiceMessageResponse:
-    """Send a voice message and get AI response with TTS."""
-    from app.services.voice_service import VoiceService
 
-    # Verify session exists
+async def _read_upload(session_id: str, request: Request, db: AsyncSession) -> AudioUpload:
+    """
+    Check the session exists, then stream in the upload, refusing it as
+    soon as it breaks the size or duration limits.
+    """
+    # Verify session exists before receiving any audio
     session_stmt = select(Session).where(Session.id == session_id)
     session_result = await db.execute(session_stmt)
     session = session_result.scalar_one_or_none()
@@ -34,43 +42,185 @@ async def send_voice_message(
             detail="Session not found",
         )
 
-    # Validate file size
-    content = await audio.read()
-    if len(content) > settings.MAX_AUDIO_SIZE:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Audio file too large (max {settings.MAX_AUDIO_SIZE // (1024 * 1024)}MB)",
-        )
+    return await receive_audio_upload(request)
+
+
+def _wants_timings(request: Request) -> bool:
+    """Whether the client asked for the per-stage timings (``VOICE_DEBUG_HEADER``)."""
+    if not settings.VOICE_DEBUG_HEADER:
+        return False
+    return request.headers.get(settings.VOICE_DEBUG_HEADER, "").lower() in ("1", "true", "yes")
+
 
-    # Reset file position
-    await audio.seek(0)
+@router.post(
+    "/sessions/{session_id}/voice",
+    response_model=VoiceMessageResponse,
+    openapi_extra=AUDIO_UPLOAD_OPENAPI,
+)
+async def send_voice_message(
+    session_id: str,
+    request: Request,
+    response: Response,
+    accept: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_db),
+) -> VoiceMessageResponse:
+    """
+    Send a voice message and get AI response with TTS.
+
+    With the ``VOICE_DEBUG_HEADER`` request header the response carries a
+    ``Server-Timing`` header with the duration of each pipeline stage.
+    """
+    from app.services.voice_service import VoiceService
 
-    voice_service = VoiceService(db)
-    return await voice_service.process_voice_message(session_id, audio, content)
+    upload = await _read_upload(session_id, request, db)
+
+    voice_service = VoiceService(db, accept)
+    with voice_service.trace:
+        result = await voice_service.process_voice_message(session_id, upload, upload.content)
+    if _wants_timings(request):
+        response.headers["Server-Timing"] = voice_service.trace.server_timing()
+    return result
+
+
+@router.post("/sessions/{session_id}/voice/stream", openapi_extra=AUDIO_UPLOAD_OPENAPI)
+async def stream_voice_message(
+    session_id: str,
+    request: Request,
+    inline_audio: bool = Query(default=False),
+    accept: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_db),
+) -> StreamingResponse:
+    """
+    Send a voice message and stream the reply via SSE.
+
+    Emits ``transcript``, then ``token`` frames, an ``audio`` event per
+    sentence as soon as its speech is ready (a URL, or base64 ``data``
+    with ``?inline_audio=true``), and finally ``done`` with the message ids
+    (plus the stage ``timings`` when ``VOICE_DEBUG_HEADER`` is sent).
+    """
+    from app.services.voice_service import VoiceService
+
+    upload = await _read_upload(session_id, request, db)
+
+    # End the read transaction so this request holds no connection while streaming
+    await db.commit()
+
+    timings = _wants_timings(request)
+
+    async def generate():
+        async with session_scope() as stream_db:
+            voice_service = VoiceService(stream_db, accept)
+            with voice_service.trace:
+                async for event in voice_service.process_voice_message_stream(
+                    session_id, upload, upload.content, inline_audio, timings
+                ):
+                    yield event
+
+    return StreamingResponse(generate(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@router.websocket("/sessions/{session_id}/voice/ws")
+async def voice_websocket(websocket: WebSocket, session_id: str) -> None:
+    """
+    Full-duplex voice: stream microphone PCM in, get transcripts, tokens
+    and per-sentence speech back on the same socket (see ``VoiceSocket``).
+    """
+    from app.services.voice_socket import VoiceSocket
+
+    async with session_scope() as db:
+        session = await db.get(Session, session_id)
+
+    await websocket.accept()
+    if session is None:
+        await websocket.close(code=4404, reason="Session not found")
+        return
+
+    await VoiceSocket(websocket, session_id).run()
+
+
+def _etag(filename: str) -> str:
+    # Names are uuids or content hashes and files are never rewritten,
+    # so the name itself is a strong validator
+    return f'"{filename.split(".", 1)[0]}"'
+
+
+def _not_modified(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def _parse_range(value: Optional[str]) -> Optional[Tuple[int, Optional[int]]]:
+    """(start, end) of a single ``bytes=start-[end]`` range; None to send the whole file."""
+    match = _RANGE_PATTERN.match(value or "")
+    if not match:
+        # Suffix and multi-part ranges are rare for audio players; ignoring
+        # a Range header is always allowed
+        return None
+    start = int(match.group(1))
+    end = int(match.group(2)) if match.group(2) else None
+    if end is not None and end < start:
+        return None
+    return start, end
 
 
 @router.get("/audio/{folder}/{filename}")
-async def serve_audio(folder: str, filename: str) -> FileResponse:
-    """Serve audio files."""
-    if folder not in ["uploads", "tts"]:
+async def serve_audio(
+    folder: str,
+    filename: str,
+    range_header: Optional[str] = Header(default=None, alias="range"),
+    if_none_match: Optional[str] = Header(default=None),
+) -> Response:
+    """
+    Serve audio files from the audio store.
+
+    Files are immutable, so responses carry a year-long ``Cache-Control``
+    and an ``ETag``; a matching ``If-None-Match`` gets a 304 without
+    touching storage. Single byte ranges are supported for seeking.
+    """
+    if folder not in AUDIO_FOLDERS or not valid_name(filename):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Audio file not found",
         )
 
-    file_path = Path(f"audio_files/{folder}/{filename}")
-
-    if not file_path.exists():
+    etag = _etag(filename)
+    headers = {**AUDIO_CACHE_HEADERS, "ETag": etag}
+    if _not_modified(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    content_type = content_type_for(filename)
+
+    # Local files are streamed from disk by FileResponse, which handles
+    # Range itself and hands the path to the server (zero-copy) when the
+    # server supports the ASGI pathsend extension
+    file_path = audio_store.local_path(folder, filename)
+    if file_path is not None:
+        return FileResponse(path=file_path, media_type=content_type, headers=headers)
+
+    # Remote stores: fetch only the requested range
+    byte_range = _parse_range(range_header)
+    start, end = byte_range or (0, None)
+    result = await audio_store.get_range(folder, filename, start, end)
+    if result is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Audio file not found",
         )
-
-    # Determine content type
-    content_type = "audio/webm" if filename.endswith(".webm") else "audio/mpeg"
-
-    return FileResponse(
-        path=file_path,
+    content, size = result
+    headers["Accept-Ranges"] = "bytes"
+    if byte_range is None:
+        return Response(content=content, media_type=content_type, headers=headers)
+    if start >= size:
+        return Response(
+            status_code=416,
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    headers["Content-Range"] = f"bytes {start}-{start + len(content) - 1}/{size}"
+    return Response(
+        content=content,
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
         media_type=content_type,
-        headers={"Content-Disposition": "inline"},
+        headers=headers,
     )
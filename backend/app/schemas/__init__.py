@@ -1,4 +1,4 @@
-from app.schemas.agent import AgentCreate, AgentUpdate, AgentResponse, AgentListResponse
+from app.schemas.agent import AgentCreate, AgentUpdate, AgentResponse, AgentListResponse, ModelPolicyEnum
 from app.schemas.session import SessionCreate, SessionResponse, SessionListResponse, SessionDetailResponse
 from app.schemas.message import (
     MessageCreate,
@@ -16,6 +16,7 @@ __all__ = [
     "AgentUpdate",
     "AgentResponse",
     "AgentListResponse",
+    "ModelPolicyEnum",
     "SessionCreate",
     "SessionResponse",
     "SessionListResponse",
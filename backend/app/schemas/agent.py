@@ -1,9 +1,25 @@
 from datetime import datetime
+from enum import Enum
 from typing import Optional
 
 from pydantic import BaseModel, Field
 
 
+class ModelPolicyEnum(str, Enum):
+    """Chat model tier: routed per request (auto) or pinned."""
+    AUTO = "auto"
+    FAST = "fast"
+    STANDARD = "standard"
+    LARGE = "large"
+
+
+class TTSFormatEnum(str, Enum):
+    """Audio format of synthesized speech (opus/aac are smaller; mp3 plays everywhere)."""
+    MP3 = "mp3"
+    OPUS = "opus"
+    AAC = "aac"
+
+
 class AgentCreate(BaseModel):
     """Request schema for creating an agent."""
 
@@ -13,6 +29,9 @@ class AgentCreate(BaseModel):
         min_length=1,
         examples=["You are a helpful customer support agent. Be polite and concise."],
     )
+    response_cache_enabled: bool = False
+    model_policy: ModelPolicyEnum = ModelPolicyEnum.AUTO
+    tts_format: TTSFormatEnum = TTSFormatEnum.MP3
 
 
 class AgentUpdate(BaseModel):
@@ -20,6 +39,9 @@ class AgentUpdate(BaseModel):
 
     name: Optional[str] = Field(None, min_length=1, max_length=100)
     system_prompt: Optional[str] = Field(None, min_length=1)
+    response_cache_enabled: Optional[bool] = None
+    model_policy: Optional[ModelPolicyEnum] = None
+    tts_format: Optional[TTSFormatEnum] = None
 
 
 class AgentResponse(BaseModel):
@@ -28,6 +50,9 @@ class AgentResponse(BaseModel):
     id: str
     name: str
     system_prompt: str
+    response_cache_enabled: bool = False
+    model_policy: ModelPolicyEnum = ModelPolicyEnum.AUTO
+    tts_format: TTSFormatEnum = TTSFormatEnum.MP3
     created_at: datetime
     updated_at: datetime
     session_count: int = 0
@@ -0,0 +1,62 @@
+"""Audio formats for synthesized speech and stored files."""
+
+from typing import Optional
+
+# TTS output formats agents can choose: format -> (file extension, content type).
+# Opus (in Ogg) and AAC are several times smaller than MP3 for speech.
+TTS_FORMATS = {
+    "mp3": ("mp3", "audio/mpeg"),
+    "opus": ("opus", "audio/ogg"),
+    "aac": ("aac", "audio/aac"),
+}
+
+# Playable by every browser, so the fallback when a client can't take the agent's format
+DEFAULT_TTS_FORMAT = "mp3"
+
+_CONTENT_TYPES = {
+    "webm": "audio/webm",
+    "wav": "audio/wav",
+    **{extension: content_type for extension, content_type in TTS_FORMATS.values()},
+}
+
+
+def content_type_for(filename: str) -> str:
+    """Content type of a stored audio file, from its extension."""
+    extension = filename.rsplit(".", 1)[-1].lower()
+    return _CONTENT_TYPES.get(extension, "audio/mpeg")
+
+
+def _accepted_types(accept: str) -> set:
+    """Media types in an Accept header, minus any refused with ``q=0``."""
+    types = set()
+    for part in accept.split(","):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    pass
+        if quality > 0:
+            types.add(media_type.lower())
+    return types
+
+
+def negotiate_tts_format(preferred: Optional[str], accept: Optional[str]) -> str:
+    """
+    The agent's ``preferred`` TTS format, unless the client's ``Accept``
+    header lists audio types and the preferred one is not among them
+    (nor ``audio/*`` / ``*/*``); then MP3.
+
+    Headers that name no audio type (``application/json``,
+    ``text/event-stream``) express no preference.
+    """
+    if preferred not in TTS_FORMATS:
+        return DEFAULT_TTS_FORMAT
+    accepted = _accepted_types(accept or "")
+    audio_types = {media_type for media_type in accepted if media_type.startswith("audio/")}
+    if not audio_types or {"*/*", "audio/*", TTS_FORMATS[preferred][1]} & accepted:
+        return preferred
+    return DEFAULT_TTS_FORMAT
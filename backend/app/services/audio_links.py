@@ -0,0 +1,29 @@
+"""Clearing message links to audio files that no longer exist."""
+
+from typing import List
+
+from sqlalchemy import update
+
+from app.database.connection import session_scope
+from app.models.message import Message
+
+# Messages updated per UPDATE statement (keeps the IN list bounded)
+_UPDATE_CHUNK = 500
+
+
+async def unlink_messages(urls: List[str]) -> int:
+    """
+    Clear ``audio_url`` / ``tts_audio_url`` on messages pointing at any of
+    ``urls``, so the UI never offers playback of a deleted file. Returns
+    the number of links cleared.
+    """
+    updated = 0
+    async with session_scope() as db:
+        for start in range(0, len(urls), _UPDATE_CHUNK):
+            chunk = urls[start:start + _UPDATE_CHUNK]
+            for column in (Message.audio_url, Message.tts_audio_url):
+                result = await db.execute(
+                    update(Message).where(column.in_(chunk)).values({column.key: None})
+                )
+                updated += result.rowcount or 0
+    return updated
@@ -0,0 +1,183 @@
+"""
+Audio container sniffing and duration probing without decoding.
+
+Reads just the container metadata of the formats clients upload:
+
+- WAV: the ``fmt `` byte rate and the ``data`` chunk size
+- MP3: the first frame header, plus its Xing/Info or VBRI frame count
+  (constant bitrate files are estimated from their size)
+- WebM/Matroska: ``Info/Duration``, or, for MediaRecorder output that
+  leaves it out, the timestamp of the last block
+
+``probe_duration`` returns None when it can't tell, so unknown formats
+are left for the STT provider to judge.
+"""
+
+import struct
+from typing import Optional, Tuple
+
+# WebM element ids (with their length marker, as they appear on the wire)
+_SEGMENT = 0x18538067
+_INFO = 0x1549A966
+_TIMECODE_SCALE = 0x2AD7B1
+_DURATION = 0x4489
+_CLUSTER = 0x1F43B675
+_CLUSTER_TIMECODE = 0xE7
+_BLOCK_GROUP = 0xA0
+_BLOCK = 0xA1
+_SIMPLE_BLOCK = 0xA3
+# Master elements walked into rather than skipped; MediaRecorder writes
+# Segment and Cluster with unknown sizes, which a flat walk handles
+_DESCEND = {_SEGMENT, _INFO, _CLUSTER, _BLOCK_GROUP}
+
+# MPEG audio layer III: kbps by bitrate index, for MPEG-1 and MPEG-2/2.5
+_MP3_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SAMPLE_RATES = {
+    1: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    25: (11025, 12000, 8000),
+}
+
+
+def sniff_format(data: bytes) -> Optional[str]:
+    """Container of an audio file from its first bytes: wav, webm, mp3 or None."""
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        return "wav"
+    if data[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"
+    if data[:3] == b"ID3" or _mp3_frame(data, 0) is not None:
+        return "mp3"
+    return None
+
+
+def probe_duration(data: bytes, complete: bool = True) -> Optional[float]:
+    """
+    Duration of an audio file in seconds, from its container metadata.
+
+    With ``complete=False`` ``data`` is only the start of the file, and
+    only durations declared in the headers are reported.
+    """
+    probes = {"wav": _wav_duration, "webm": _webm_duration, "mp3": _mp3_duration}
+    probe = probes.get(sniff_format(data))
+    if probe is None:
+        return None
+    try:
+        return probe(data, complete)
+    except (IndexError, struct.error):
+        return None
+
+
+def _wav_duration(data: bytes, complete: bool) -> Optional[float]:
+    offset, byte_rate = 12, None
+    while offset + 8 <= len(data):
+        chunk_id = data[offset:offset + 4]
+        size = struct.unpack_from("<I", data, offset + 4)[0]
+        if chunk_id == b"fmt ":
+            byte_rate = struct.unpack_from("<I", data, offset + 16)[0]
+        elif chunk_id == b"data":
+            if not byte_rate:
+                return None
+            if size in (0, 0xFFFFFFFF):
+                # Streamed WAV writers leave the size unset
+                if not complete:
+                    return None
+                size = len(data) - offset - 8
+            return size / byte_rate
+        offset += 8 + size + (size & 1)
+    return None
+
+
+def _mp3_frame(data: bytes, offset: int) -> Optional[Tuple[int, int, int, int]]:
+    """(MPEG version, kbps, sample rate, channel mode) of a layer III frame header."""
+    if offset + 4 > len(data) or data[offset] != 0xFF or data[offset + 1] & 0xE0 != 0xE0:
+        return None
+    version = {3: 1, 2: 2, 0: 25}.get((data[offset + 1] >> 3) & 0x03)
+    layer = (data[offset + 1] >> 1) & 0x03
+    bitrate_index = data[offset + 2] >> 4
+    rate_index = (data[offset + 2] >> 2) & 0x03
+    if version is None or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    kbps = _MP3_BITRATES[1 if version == 1 else 2][bitrate_index]
+    return version, kbps, _MP3_SAMPLE_RATES[version][rate_index], data[offset + 3] >> 6
+
+
+def _mp3_duration(data: bytes, complete: bool) -> Optional[float]:
+    start = 0
+    if data[:3] == b"ID3":
+        # Syncsafe tag size, plus the footer if the flags say there is one
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        start = 10 + size + (10 if data[5] & 0x10 else 0)
+    frame = _mp3_frame(data, start)
+    if frame is None:
+        return None
+    version, kbps, sample_rate, channel_mode = frame
+    samples_per_frame = 1152 if version == 1 else 576
+
+    # VBR encoders put the frame count in the first frame
+    mono = channel_mode == 3
+    side_info = (17 if mono else 32) if version == 1 else (9 if mono else 17)
+    xing = start + 4 + side_info
+    if data[xing:xing + 4] in (b"Xing", b"Info") and data[xing + 7] & 0x01:
+        frames = struct.unpack_from(">I", data, xing + 8)[0]
+        return frames * samples_per_frame / sample_rate
+    vbri = start + 36
+    if data[vbri:vbri + 4] == b"VBRI":
+        frames = struct.unpack_from(">I", data, vbri + 14)[0]
+        return frames * samples_per_frame / sample_rate
+
+    # Constant bitrate: the size gives the duration
+    if not complete:
+        return None
+    return (len(data) - start) * 8 / (kbps * 1000)
+
+
+def _vint(data: bytes, offset: int, keep_marker: bool) -> Tuple[Optional[int], int]:
+    """An EBML variable-length integer at ``offset``: (value, next offset); None if unknown."""
+    first = data[offset]
+    length = 1
+    while length <= 8 and not first & (0x80 >> (length - 1)):
+        length += 1
+    if length > 8 or offset + length > len(data):
+        raise IndexError("truncated EBML integer")
+    value = first if keep_marker else first & (0xFF >> length)
+    for byte in data[offset + 1:offset + length]:
+        value = (value << 8) | byte
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        return None, offset + length
+    return value, offset + length
+
+
+def _webm_duration(data: bytes, complete: bool) -> Optional[float]:
+    offset, scale = 0, 1_000_000  # TimecodeScale defaults to 1 ms (in ns)
+    cluster_timecode, last_timecode = 0, None
+    while offset < len(data):
+        try:
+            element, offset = _vint(data, offset, keep_marker=True)
+            size, offset = _vint(data, offset, keep_marker=False)
+        except IndexError:
+            break  # cut off mid-element
+        if element in _DESCEND:
+            continue
+        if size is None or offset + size > len(data):
+            break
+        body = data[offset:offset + size]
+        if element == _TIMECODE_SCALE:
+            scale = int.from_bytes(body, "big")
+        elif element == _DURATION:
+            ticks = struct.unpack(">f" if size == 4 else ">d", body)[0]
+            return ticks * scale / 1e9
+        elif element == _CLUSTER_TIMECODE:
+            cluster_timecode = int.from_bytes(body, "big")
+        elif element in (_SIMPLE_BLOCK, _BLOCK):
+            # Track number, then the timestamp relative to the cluster
+            _, start = _vint(body, 0, keep_marker=False)
+            relative = struct.unpack_from(">h", body, start)[0]
+            last_timecode = max(last_timecode or 0, cluster_timecode + relative)
+        offset += size
+
+    if not complete or last_timecode is None:
+        return None
+    return last_timecode * scale / 1e9
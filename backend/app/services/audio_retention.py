@@ -0,0 +1,132 @@
+"""
+Retention for stored audio.
+
+A periodic sweep deletes audio older than the age limit, then the oldest
+remaining audio until the total fits the byte quota. Age is the time since
+a file was last written or reused (reuse renews its modified time), and
+pinned fallback speech is never deleted. Messages that pointed
+at a deleted file have their ``audio_url`` / ``tts_audio_url`` cleared, so
+the UI never offers playback of a missing file.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+from app.config import settings
+from app.services.audio_links import unlink_messages
+from app.services.audio_store import AUDIO_FOLDERS, AudioStore, StoredAudio, audio_store
+from app.services.tts_cache import tts_cache
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+retention_deleted = metrics.counter(
+    "audio_retention_deleted_total",
+    "Audio files deleted by the retention sweeper",
+    ["folder", "reason"],
+)
+retention_deleted_bytes = metrics.counter(
+    "audio_retention_deleted_bytes_total",
+    "Bytes of audio deleted by the retention sweeper",
+)
+retention_sweep_duration = metrics.histogram(
+    "audio_retention_sweep_seconds",
+    "Duration of one retention sweep",
+)
+
+
+@dataclass
+class SweepResult:
+    """What one sweep removed."""
+
+    deleted: int = 0
+    deleted_bytes: int = 0
+    messages_updated: int = 0
+
+
+class AudioRetention:
+    """Deletes audio past the age and total-size limits and unlinks it from messages."""
+
+    def __init__(
+        self,
+        store: Optional[AudioStore] = None,
+        max_age_days: int = settings.AUDIO_RETENTION_MAX_AGE_DAYS,
+        max_total_bytes: int = settings.AUDIO_RETENTION_MAX_TOTAL_BYTES,
+    ):
+        self.store = store or audio_store
+        self.max_age_days = max_age_days
+        self.max_total_bytes = max_total_bytes
+
+    def _expired(self, files: List[StoredAudio], now: float) -> List[StoredAudio]:
+        """Files to delete: too old, then oldest first until under the quota."""
+        files = sorted(files, key=lambda stored: stored.modified)
+        expired = []
+        if self.max_age_days > 0:
+            cutoff = now - self.max_age_days * 86400
+            expired = [stored for stored in files if stored.modified < cutoff]
+            files = files[len(expired):]
+
+        if self.max_total_bytes > 0:
+            total = sum(stored.size for stored in files)
+            for stored in files:
+                if total <= self.max_total_bytes:
+                    break
+                expired.append(stored)
+                total -= stored.size
+        return expired
+
+    async def sweep(self, now: Optional[float] = None) -> SweepResult:
+        """Run one retention pass over every audio folder."""
+        started = time.monotonic()
+        now = time.time() if now is None else now
+        files = []
+        for folder in AUDIO_FOLDERS:
+            files.extend(await self.store.list(folder))
+        # Fallback replies must stay playable whatever their age
+        files = [
+            stored for stored in files
+            if not (stored.folder == tts_cache.folder and tts_cache.is_pinned(stored.name))
+        ]
+        cutoff = now - self.max_age_days * 86400
+
+        result = SweepResult()
+        deleted_urls = []
+        for stored in self._expired(files, now):
+            try:
+                await self.store.delete(stored.folder, stored.name)
+            except Exception as e:
+                logger.warning(f"Could not delete {stored.url}: {e}")
+                continue
+            if stored.folder == tts_cache.folder:
+                tts_cache.discard(stored.name)
+            reason = "age" if self.max_age_days > 0 and stored.modified < cutoff else "quota"
+            retention_deleted.inc(folder=stored.folder, reason=reason)
+            retention_deleted_bytes.inc(stored.size)
+            result.deleted += 1
+            result.deleted_bytes += stored.size
+            deleted_urls.append(stored.url)
+
+        if deleted_urls:
+            result.messages_updated = await unlink_messages(deleted_urls)
+            logger.info(
+                f"Audio retention: deleted {result.deleted} files ({result.deleted_bytes} bytes), "
+                f"cleared {result.messages_updated} message links"
+            )
+        retention_sweep_duration.observe(time.monotonic() - started)
+        return result
+
+    async def run(self, interval: float = settings.AUDIO_RETENTION_SWEEP_INTERVAL_SECONDS) -> None:
+        """Sweep every ``interval`` seconds until cancelled."""
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Audio retention sweep failed: {e}")
+            await asyncio.sleep(interval)
+
+
+# Singleton instance
+audio_retention = AudioRetention()
@@ -0,0 +1,443 @@
+"""
+Pluggable storage for voice uploads and synthesized speech.
+
+Audio is addressed by (folder, name) and served at
+``/api/audio/<folder>/<name>`` whichever backend holds it:
+
+- ``LocalAudioStore`` keeps files under a root directory, sharded into
+  ``<folder>/<name[0:2]>/<name[2:4]>/`` so no directory grows huge
+- ``S3AudioStore`` keeps objects in an S3-compatible bucket (AWS S3, MinIO)
+"""
+
+import asyncio
+import hashlib
+import hmac
+import os
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote, urlsplit
+from uuid import uuid4
+
+import httpx
+
+from app.config import settings
+
+# Folders audio can live in (and be served from)
+AUDIO_FOLDERS = ("uploads", "tts")
+
+_NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]*(\.[A-Za-z0-9]+)?$")
+_URL_PATTERN = re.compile(r"^/api/audio/([a-z]+)/([^/]+)$")
+
+
+def valid_name(name: str) -> bool:
+    """Whether ``name`` is a plain file name (no separators or traversal)."""
+    return bool(_NAME_PATTERN.match(name))
+
+
+def audio_url(folder: str, name: str) -> str:
+    return f"/api/audio/{folder}/{name}"
+
+
+def parse_audio_url(url: str) -> Optional[Tuple[str, str]]:
+    """(folder, name) of an ``/api/audio/...`` URL, or None."""
+    match = _URL_PATTERN.match(url or "")
+    return (match.group(1), match.group(2)) if match else None
+
+
+def write_atomic(path: Path, content: bytes) -> None:
+    """Write ``content`` to ``path`` via a temp file, so readers never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{uuid4().hex}.tmp")
+    tmp.write_bytes(content)
+    os.replace(tmp, path)
+
+
+@dataclass(frozen=True)
+class StoredAudio:
+    """One stored audio file."""
+
+    folder: str
+    name: str
+    size: int
+    modified: float  # unix time
+
+    @property
+    def url(self) -> str:
+        return audio_url(self.folder, self.name)
+
+
+class AudioStore:
+    """Where voice uploads and synthesized speech are kept."""
+
+    async def put(self, folder: str, name: str, content: bytes) -> str:
+        """Store ``content`` and return its URL."""
+        raise NotImplementedError
+
+    async def get(self, folder: str, name: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def get_range(
+        self, folder: str, name: str, start: int, end: Optional[int] = None
+    ) -> Optional[Tuple[bytes, int]]:
+        """Bytes ``start``..``end`` (inclusive; None reads to the end) and the full size."""
+        content = await self.get(folder, name)
+        if content is None:
+            return None
+        return content[start:None if end is None else end + 1], len(content)
+
+    async def exists(self, folder: str, name: str) -> bool:
+        raise NotImplementedError
+
+    async def touch(self, folder: str, name: str) -> bool:
+        """
+        Mark an existing file as just used (retention ages files by their
+        modified time); False if there is no such file.
+        """
+        raise NotImplementedError
+
+    async def delete(self, folder: str, name: str) -> None:
+        raise NotImplementedError
+
+    async def list(self, folder: str) -> List[StoredAudio]:
+        raise NotImplementedError
+
+    def local_path(self, folder: str, name: str) -> Optional[Path]:
+        """Path of an existing file that can be served directly, if this store has one."""
+        return None
+
+    async def save(self, content: bytes, folder: str, extension: str) -> str:
+        """Store ``content`` under a new unique name and return its URL."""
+        return await self.put(folder, f"{uuid4()}.{extension}", content)
+
+    async def save_by_content(
+        self, content: bytes, folder: str, extension: str, digest: Optional[str] = None
+    ) -> str:
+        """
+        Store ``content`` under the SHA-256 of its bytes (``digest``, if the
+        caller has it) and return its URL. Identical content, such as a
+        retried upload, is kept once and not rewritten, only touched so
+        retention counts its age from the latest use.
+        """
+        name = f"{digest or hashlib.sha256(content).hexdigest()}.{extension}"
+        if await self.touch(folder, name):
+            return audio_url(folder, name)
+        return await self.put(folder, name, content)
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalAudioStore(AudioStore):
+    """
+    Files under ``root/<folder>/<aa>/<bb>/<name>``, where ``aa`` and ``bb``
+    are the first characters of the (uuid or hash) name.
+
+    File I/O runs in a worker thread, so a slow disk never stalls other
+    requests on the event loop. Files written before sharding (directly
+    in ``root/<folder>/``) are still found.
+    """
+
+    def __init__(self, root: str = settings.AUDIO_STORE_ROOT):
+        self.root = Path(root)
+
+    def path(self, folder: str, name: str) -> Path:
+        if len(name) < 5:
+            return self.root / folder / name
+        return self.root / folder / name[:2] / name[2:4] / name
+
+    def _legacy_path(self, folder: str, name: str) -> Path:
+        return self.root / folder / name
+
+    def local_path(self, folder: str, name: str) -> Optional[Path]:
+        for path in (self.path(folder, name), self._legacy_path(folder, name)):
+            if path.is_file():
+                return path
+        return None
+
+    async def put(self, folder: str, name: str, content: bytes) -> str:
+        await asyncio.to_thread(write_atomic, self.path(folder, name), content)
+        return audio_url(folder, name)
+
+    async def get(self, folder: str, name: str) -> Optional[bytes]:
+        path = await asyncio.to_thread(self.local_path, folder, name)
+        if path is None:
+            return None
+        try:
+            return await asyncio.to_thread(path.read_bytes)
+        except FileNotFoundError:
+            return None
+
+    async def exists(self, folder: str, name: str) -> bool:
+        return await asyncio.to_thread(self.local_path, folder, name) is not None
+
+    def _touch(self, folder: str, name: str) -> bool:
+        path = self.local_path(folder, name)
+        if path is None:
+            return False
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    async def touch(self, folder: str, name: str) -> bool:
+        return await asyncio.to_thread(self._touch, folder, name)
+
+    def _delete(self, folder: str, name: str) -> None:
+        for path in (self.path(folder, name), self._legacy_path(folder, name)):
+            try:
+                path.unlink()
+            except (FileNotFoundError, IsADirectoryError):
+                pass
+
+    async def delete(self, folder: str, name: str) -> None:
+        await asyncio.to_thread(self._delete, folder, name)
+
+    def _list(self, folder: str) -> List[StoredAudio]:
+        found = []
+        for directory, _, files in os.walk(self.root / folder):
+            for name in files:
+                if name.startswith("."):  # in-flight temp files
+                    continue
+                try:
+                    stat = os.stat(os.path.join(directory, name))
+                except FileNotFoundError:
+                    continue
+                found.append(StoredAudio(folder, name, stat.st_size, stat.st_mtime))
+        return found
+
+    async def list(self, folder: str) -> List[StoredAudio]:
+        return await asyncio.to_thread(self._list, folder)
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode("utf-8"), hashlib.sha256).digest()
+
+
+def _uri_encode(value: str, safe: str = "-_.~") -> str:
+    return quote(value, safe=safe)
+
+
+def sign_v4(
+    method: str,
+    path: str,
+    query: Dict[str, str],
+    headers: Dict[str, str],
+    payload_hash: str,
+    access_key: str,
+    secret_key: str,
+    region: str,
+    amz_date: str,
+    service: str = "s3",
+) -> str:
+    """
+    AWS Signature Version 4 ``Authorization`` header for a request.
+
+    ``headers`` must include ``host`` and ``x-amz-date``; all of them are signed.
+    """
+    canonical_query = "&".join(
+        f"{_uri_encode(k)}={_uri_encode(v)}" for k, v in sorted(query.items())
+    )
+    lowered = {k.lower(): " ".join(str(v).split()) for k, v in headers.items()}
+    signed_headers = ";".join(sorted(lowered))
+    canonical_headers = "".join(f"{k}:{lowered[k]}\n" for k in sorted(lowered))
+    canonical_request = "\n".join([
+        method,
+        _uri_encode(path, safe="-_.~/"),
+        canonical_query,
+        canonical_headers,
+        signed_headers,
+        payload_hash,
+    ])
+
+    date = amz_date[:8]
+    scope = f"{date}/{region}/{service}/aws4_request"
+    string_to_sign = "\n".join([
+        "AWS4-HMAC-SHA256",
+        amz_date,
+        scope,
+        _sha256(canonical_request.encode("utf-8")),
+    ])
+    key = _hmac(f"AWS4{secret_key}".encode("utf-8"), date)
+    for part in (region, service, "aws4_request"):
+        key = _hmac(key, part)
+    signature = hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+    return (
+        f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, "
+        f"SignedHeaders={signed_headers}, Signature={signature}"
+    )
+
+
+_S3_NS = "{http://s3.amazonaws.com/doc/2006-03-01/}"
+
+
+class S3AudioStore(AudioStore):
+    """
+    Objects at ``<prefix><folder>/<name>`` in an S3-compatible bucket.
+
+    Requests use path-style addressing and Signature V4 over httpx, which
+    works against AWS S3 and self-hosted stores such as MinIO.
+    """
+
+    def __init__(
+        self,
+        endpoint_url: str,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        region: str = "us-east-1",
+        prefix: str = "",
+        http_client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.prefix = prefix
+        self._host = urlsplit(self.endpoint_url).netloc
+        self._owns_client = http_client is None
+        self._client = http_client or httpx.AsyncClient(timeout=30.0)
+
+    def _key(self, folder: str, name: str) -> str:
+        return f"{self.prefix}{folder}/{name}"
+
+    async def _request(
+        self,
+        method: str,
+        key: str = "",
+        query: Optional[Dict[str, str]] = None,
+        content: bytes = b"",
+        headers: Optional[Dict[str, str]] = None,
+    ) -> httpx.Response:
+        query = query or {}
+        path = f"/{self.bucket}/{key}" if key else f"/{self.bucket}"
+        payload_hash = _sha256(content)
+        signed = {
+            "host": self._host,
+            "x-amz-content-sha256": payload_hash,
+            "x-amz-date": datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ"),
+            **(headers or {}),
+        }
+        signed["authorization"] = sign_v4(
+            method, path, query, signed, payload_hash,
+            self.access_key, self.secret_key, self.region, signed["x-amz-date"],
+        )
+        url = self.endpoint_url + _uri_encode(path, safe="-_.~/")
+        if query:
+            url += "?" + "&".join(f"{_uri_encode(k)}={_uri_encode(v)}" for k, v in sorted(query.items()))
+        return await self._client.request(method, url, content=content or None, headers=signed)
+
+    async def put(self, folder: str, name: str, content: bytes) -> str:
+        response = await self._request(
+            "PUT", self._key(folder, name), content=content,
+            headers={"content-type": "application/octet-stream"},
+        )
+        response.raise_for_status()
+        return audio_url(folder, name)
+
+    async def get(self, folder: str, name: str) -> Optional[bytes]:
+        response = await self._request("GET", self._key(folder, name))
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.content
+
+    async def get_range(
+        self, folder: str, name: str, start: int, end: Optional[int] = None
+    ) -> Optional[Tuple[bytes, int]]:
+        # Only the requested bytes leave the bucket, so seeking stays cheap
+        byte_range = f"bytes={start}-{'' if end is None else end}"
+        response = await self._request("GET", self._key(folder, name), headers={"range": byte_range})
+        if response.status_code == 404:
+            return None
+        if response.status_code == 416:
+            return b"", int(response.headers["content-range"].rsplit("/", 1)[1])
+        response.raise_for_status()
+        if response.status_code == 206:
+            return response.content, int(response.headers["content-range"].rsplit("/", 1)[1])
+        # Range ignored: the whole object came back
+        content = response.content
+        return content[start:None if end is None else end + 1], len(content)
+
+    async def exists(self, folder: str, name: str) -> bool:
+        response = await self._request("HEAD", self._key(folder, name))
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        return True
+
+    async def touch(self, folder: str, name: str) -> bool:
+        # S3 has no utime: copying the object onto itself renews LastModified
+        key = self._key(folder, name)
+        response = await self._request(
+            "PUT", key,
+            headers={
+                "x-amz-copy-source": f"/{self.bucket}/{_uri_encode(key, safe='-_.~/')}",
+                "x-amz-metadata-directive": "REPLACE",
+                "content-type": "application/octet-stream",
+            },
+        )
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        return True
+
+    async def delete(self, folder: str, name: str) -> None:
+        response = await self._request("DELETE", self._key(folder, name))
+        if response.status_code != 404:
+            response.raise_for_status()
+
+    async def list(self, folder: str) -> List[StoredAudio]:
+        prefix = self._key(folder, "")
+        found: List[StoredAudio] = []
+        token = None
+        while True:
+            query = {"list-type": "2", "prefix": prefix}
+            if token:
+                query["continuation-token"] = token
+            response = await self._request("GET", query=query)
+            response.raise_for_status()
+            root = ET.fromstring(response.content)
+            for item in root.iter(f"{_S3_NS}Contents"):
+                name = item.findtext(f"{_S3_NS}Key", "")[len(prefix):]
+                if not name or "/" in name:
+                    continue
+                modified = datetime.fromisoformat(
+                    item.findtext(f"{_S3_NS}LastModified", "").replace("Z", "+00:00")
+                )
+                size = int(item.findtext(f"{_S3_NS}Size", "0"))
+                found.append(StoredAudio(folder, name, size, modified.timestamp()))
+            if root.findtext(f"{_S3_NS}IsTruncated") != "true":
+                return found
+            token = root.findtext(f"{_S3_NS}NextContinuationToken")
+
+    async def close(self) -> None:
+        if self._owns_client:
+            await self._client.aclose()
+
+
+def create_audio_store() -> AudioStore:
+    """The store selected by AUDIO_STORE_BACKEND."""
+    if settings.AUDIO_STORE_BACKEND == "s3":
+        return S3AudioStore(
+            endpoint_url=settings.AUDIO_S3_ENDPOINT_URL,
+            bucket=settings.AUDIO_S3_BUCKET,
+            access_key=settings.AUDIO_S3_ACCESS_KEY_ID,
+            secret_key=settings.AUDIO_S3_SECRET_ACCESS_KEY,
+            region=settings.AUDIO_S3_REGION,
+            prefix=settings.AUDIO_S3_PREFIX,
+        )
+    return LocalAudioStore()
+
+
+# Singleton instance
+audio_store = create_audio_store()
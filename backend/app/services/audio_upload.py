@@ -0,0 +1,178 @@
+"""
+Streaming intake of voice uploads.
+
+The multipart body is parsed as it arrives instead of being spooled by the
+framework first, so an upload over ``MAX_AUDIO_SIZE`` is cut off at the
+limit and one over ``MAX_AUDIO_DURATION`` is refused as soon as its
+container headers say so. Nothing reaches disk or STT until it has passed.
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import HTTPException, Request
+from python_multipart.exceptions import FormParserError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from app.config import settings
+from app.services.audio_probe import probe_duration, sniff_format
+from app.utils.exceptions import AudioTooLargeError, AudioTooLongError
+from app.utils.metrics import metrics
+
+voice_uploads_rejected = metrics.counter(
+    "voice_uploads_rejected_total",
+    "Voice uploads refused before transcription, by reason",
+    ["reason"],
+)
+
+# Enough of the file for WAV, MP3 (Xing) and WebM headers
+PROBE_BYTES = 64 * 1024
+# Multipart boundaries and part headers on top of the audio itself
+MULTIPART_OVERHEAD = 16 * 1024
+
+# Request body schema for routes that read the upload with receive_audio_upload
+AUDIO_UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["audio"],
+                    "properties": {"audio": {"type": "string", "format": "binary"}},
+                }
+            }
+        },
+    }
+}
+
+
+@dataclass
+class AudioUpload:
+    """An uploaded audio file that passed the size and duration limits."""
+
+    content: bytes
+    filename: Optional[str] = None
+    content_type: Optional[str] = None
+    duration: Optional[float] = None  # None if the container didn't say
+
+    @property
+    def format(self) -> Optional[str]:
+        """Container sniffed from the content (wav, webm, mp3), if recognised."""
+        return sniff_format(self.content)
+
+
+class _AudioPart:
+    """Multipart callbacks that keep the bytes of one file field."""
+
+    def __init__(self, field: str):
+        self.field = field
+        self.found = False
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+        self.content = bytearray()
+        self._headers = {}
+        self._header_name = b""
+        self._header_value = b""
+        self._capturing = False
+
+    def on_part_begin(self) -> None:
+        self._headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._capturing = not self.found and options.get(b"name") == self.field.encode()
+        if self._capturing:
+            self.found = True
+            self.filename = options.get(b"filename", b"").decode("utf-8", "replace") or None
+            content_type = self._headers.get(b"content-type")
+            self.content_type = content_type.decode("latin-1") if content_type else None
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._capturing:
+            self.content += data[start:end]
+
+    def on_part_end(self) -> None:
+        self._capturing = False
+
+    def callbacks(self) -> dict:
+        return {
+            name: getattr(self, name)
+            for name in (
+                "on_part_begin", "on_header_field", "on_header_value", "on_header_end",
+                "on_headers_finished", "on_part_data", "on_part_end",
+            )
+        }
+
+
+def _reject_size() -> None:
+    voice_uploads_rejected.inc(reason="too_large")
+    raise AudioTooLargeError(settings.MAX_AUDIO_SIZE // (1024 * 1024))
+
+
+def _check_duration(duration: Optional[float]) -> None:
+    if duration is not None and duration > settings.MAX_AUDIO_DURATION:
+        voice_uploads_rejected.inc(reason="too_long")
+        raise AudioTooLongError(settings.MAX_AUDIO_DURATION)
+
+
+async def receive_audio_upload(request: Request, field: str = "audio") -> AudioUpload:
+    """
+    Read the ``field`` file from a multipart request body, enforcing the
+    audio size and duration limits while it streams in.
+    """
+    max_body = settings.MAX_AUDIO_SIZE + MULTIPART_OVERHEAD
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_body:
+        # Refuse without reading the body at all
+        _reject_size()
+
+    media_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if media_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(
+            status_code=422,
+            detail="Expected a multipart/form-data upload",
+        )
+
+    part = _AudioPart(field)
+    parser = MultipartParser(params[b"boundary"], part.callbacks())
+    received, duration, probed = 0, None, False
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            parser.write(chunk)
+            if len(part.content) > settings.MAX_AUDIO_SIZE or received > max_body:
+                _reject_size()
+            if not probed and len(part.content) >= PROBE_BYTES:
+                # Declared durations are known from the headers alone
+                probed = True
+                duration = probe_duration(bytes(part.content[:PROBE_BYTES]), complete=False)
+                _check_duration(duration)
+        parser.finalize()
+    except FormParserError as e:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Malformed multipart body: {e}",
+        )
+
+    if not part.found:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Missing file field '{field}'",
+        )
+
+    content = bytes(part.content)
+    if duration is None:
+        duration = probe_duration(content)
+        _check_duration(duration)
+    return AudioUpload(content, part.filename, part.content_type, duration)
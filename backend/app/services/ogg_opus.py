@@ -0,0 +1,153 @@
+"""
+Joining Ogg Opus files into one logical stream.
+
+Concatenated Ogg Opus files form a chained Ogg stream, which many
+browsers and ``<audio>`` decoders only play up to the end of the first
+link. ``remux_opus`` instead takes the Opus packets of every file and
+writes them as a single stream: the first file's ``OpusHead`` and
+``OpusTags``, then all audio packets with one serial number, continuous
+page sequence numbers and granule positions recomputed from each
+packet's TOC byte.
+"""
+
+import struct
+import zlib
+from typing import List, Optional, Tuple
+
+_CAPTURE = b"OggS"
+_HEADER = struct.Struct("<4sBBqIIIB")  # capture, version, flags, granule, serial, seq, crc, segments
+
+_BOS = 0x02
+_EOS = 0x04
+
+# Keep pages around the size libogg produces
+_PAGE_TARGET_BYTES = 4096
+_MAX_LACING = 255
+
+# Opus frame length (48 kHz samples) by TOC configuration (RFC 6716, 3.1)
+_FRAME_SAMPLES = (
+    [480, 960, 1920, 2880] * 3    # SILK-only: 10, 20, 40, 60 ms
+    + [480, 960] * 2              # Hybrid: 10, 20 ms
+    + [120, 240, 480, 960] * 4    # CELT-only: 2.5, 5, 10, 20 ms
+)
+
+
+# Bit-reversal of every byte value, for running Ogg's CRC through zlib
+_REVERSED = bytes(int(f"{i:08b}"[::-1], 2) for i in range(256))
+
+
+def _reverse32(value: int) -> int:
+    return int.from_bytes(value.to_bytes(4, "little").translate(_REVERSED), "big")
+
+
+def ogg_crc(data: bytes) -> int:
+    """
+    Ogg page checksum (CRC-32, polynomial 0x04C11DB7, no reflection).
+
+    This is zlib's CRC-32 on bit-reversed input, reversed back, with
+    zlib's initial value and final XOR cancelled out by the CRC of as
+    many zero bytes. Both CRCs run in C, so a page costs microseconds.
+    """
+    reflected = zlib.crc32(data.translate(_REVERSED)) ^ zlib.crc32(bytes(len(data)))
+    return _reverse32(reflected)
+
+
+def read_packets(data: bytes) -> List[bytes]:
+    """Packets of the first logical stream in an Ogg file, in order."""
+    packets: List[bytes] = []
+    partial: List[bytes] = []
+    serial: Optional[int] = None
+    offset = 0
+    while offset + _HEADER.size <= len(data):
+        capture, _, _, _, page_serial, _, _, count = _HEADER.unpack_from(data, offset)
+        if capture != _CAPTURE:
+            raise ValueError(f"Not an Ogg page at byte {offset}")
+        lacing = data[offset + _HEADER.size:offset + _HEADER.size + count]
+        body = offset + _HEADER.size + count
+        offset = body + sum(lacing)
+        if serial is None:
+            serial = page_serial
+        elif page_serial != serial:
+            continue
+        for size in lacing:
+            partial.append(data[body:body + size])
+            body += size
+            if size < 255:
+                packets.append(b"".join(partial))
+                partial = []
+    return packets
+
+
+def packet_samples(packet: bytes) -> int:
+    """48 kHz samples an Opus packet decodes to, from its TOC byte."""
+    if not packet:
+        return 0
+    toc = packet[0]
+    code = toc & 0x03
+    if code == 0:
+        frames = 1
+    elif code in (1, 2):
+        frames = 2
+    else:
+        frames = packet[1] & 0x3F if len(packet) > 1 else 0
+    return frames * _FRAME_SAMPLES[toc >> 3]
+
+
+def _page(flags: int, granule: int, serial: int, sequence: int, packets: List[bytes]) -> bytes:
+    lacing = bytearray()
+    for packet in packets:
+        lacing += b"\xff" * (len(packet) // 255) + bytes([len(packet) % 255])
+    header = _HEADER.pack(_CAPTURE, 0, flags, granule, serial, sequence, 0, len(lacing))
+    page = bytearray(header + bytes(lacing) + b"".join(packets))
+    struct.pack_into("<I", page, 22, ogg_crc(bytes(page)))
+    return bytes(page)
+
+
+def _lacing_size(packet: bytes) -> int:
+    return len(packet) // 255 + 1
+
+
+def _split_headers(packets: List[bytes]) -> Tuple[bytes, bytes, List[bytes]]:
+    if len(packets) < 2 or not packets[0].startswith(b"OpusHead") or not packets[1].startswith(b"OpusTags"):
+        raise ValueError("Not an Ogg Opus stream")
+    return packets[0], packets[1], packets[2:]
+
+
+def remux_opus(files: List[bytes], serial: Optional[int] = None) -> bytes:
+    """
+    One single-stream Ogg Opus file playing ``files`` back to back.
+
+    All files must share a channel layout (``OpusHead`` channel count and
+    mapping); TTS output of one voice does. Pre-skip applies once, at the
+    start of the joined stream.
+    """
+    if len(files) < 2:
+        return files[0] if files else b""
+    head, tags, audio = _split_headers(read_packets(files[0]))
+    for data in files[1:]:
+        other_head, _, packets = _split_headers(read_packets(data))
+        if other_head[9] != head[9] or other_head[18:] != head[18:]:
+            raise ValueError("Opus files differ in channel layout")
+        audio.extend(packets)
+
+    if serial is None:
+        serial = struct.unpack_from("<I", files[0], 14)[0]
+    pages = [_page(_BOS, 0, serial, 0, [head]), _page(0, 0, serial, 1, [tags])]
+
+    granule = struct.unpack_from("<H", head, 10)[0]  # pre-skip
+    batch: List[bytes] = []
+    lacing = size = 0
+    for index, packet in enumerate(audio):
+        granule += packet_samples(packet)
+        batch.append(packet)
+        lacing += _lacing_size(packet)
+        size += len(packet)
+        last = index == len(audio) - 1
+        following = audio[index + 1] if not last else b""
+        if last or size >= _PAGE_TARGET_BYTES or lacing + _lacing_size(following) > _MAX_LACING:
+            flags = _EOS if last else 0
+            pages.append(_page(flags, granule, serial, len(pages), batch))
+            batch, lacing, size = [], 0, 0
+    if not audio:
+        pages[-1] = _page(_EOS, 0, serial, 1, [tags])
+    return b"".join(pages)
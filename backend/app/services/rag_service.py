@@ -6,11 +6,15 @@ from io import BytesIO
 from typing import List, Optional, Tuple
 
 import numpy as np
-from openai import AsyncOpenAI
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
+from app.integrations.circuit_breaker import circuit_breakers
+from app.integrations.clients import client_registry
+from app.integrations.instrumentation import track_call
+from app.integrations.rate_limiter import Priority, estimate_tokens, rate_limiter
+from app.integrations.singleflight import SingleFlight, make_key
 from app.models.document import Document, DocumentChunk
 
 logger = logging.getLogger(__name__)
@@ -23,13 +27,16 @@ EMBEDDING_DIMENSIONS = 1536
 MAX_CHUNK_TOKENS = 500
 CHUNK_OVERLAP_TOKENS = 50
 
+# Shared across RAGService instances (one is created per request)
+embedding_flights = SingleFlight()
+
 
 class RAGService:
     """Service for RAG operations: parsing, embedding, and retrieval."""
 
     def __init__(self, db: AsyncSession):
         self.db = db
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        self.client = client_registry.openai
 
     async def parse_document(self, content: bytes, filename: str) -> List[str]:
         """Parse document content into text chunks."""
@@ -107,23 +114,48 @@ class RAGService:
 
         return chunks
 
-    async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+    async def generate_embeddings(
+        self,
+        texts: List[str],
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> List[List[float]]:
         """Generate embeddings for text chunks using OpenAI."""
         if not texts:
             return []
 
         try:
-            response = await self.client.embeddings.create(
-                model=EMBEDDING_MODEL,
-                input=texts,
+            if not settings.SINGLEFLIGHT_ENABLED:
+                return await self._create_embeddings(texts, priority)
+
+            # Identical concurrent requests (e.g. the same question) share one call
+            key = make_key("embeddings", EMBEDDING_MODEL, texts)
+            return await embedding_flights.do(
+                key, lambda: self._create_embeddings(texts, priority)
             )
-            
-            embeddings = [item.embedding for item in response.data]
-            return embeddings
         except Exception as e:
             logger.error(f"Failed to generate embeddings: {e}")
             raise
 
+    async def _create_embeddings(self, texts: List[str], priority: Priority) -> List[List[float]]:
+        async with track_call("embeddings", EMBEDDING_MODEL) as call:
+            # Fail fast before queueing; only the request itself is guarded
+            circuit_breakers.embeddings.check()
+            async with rate_limiter.slot(
+                EMBEDDING_MODEL, estimate_tokens(*texts), priority
+            ) as slot:
+                # A document's chunks go in one batch whose duration grows with
+                # its size, so only interactive (query) calls can be slow
+                async with circuit_breakers.embeddings.guard(timed=priority == Priority.INTERACTIVE):
+                    raw = await self.client.embeddings.with_raw_response.create(
+                        model=EMBEDDING_MODEL,
+                        input=texts,
+                    )
+                slot.update_from_headers(raw.headers)
+                response = raw.parse()
+            call.record_usage(getattr(response, "usage", None))
+
+        return [item.embedding for item in response.data]
+
     async def store_document(
         self,
         agent_id: str,
@@ -166,14 +198,17 @@ class RAGService:
         agent_id: str,
         query: str,
         top_k: int = 5,
+        query_embedding: Optional[List[float]] = None,
     ) -> List[Tuple[str, float]]:
         """Search for similar chunks using cosine similarity."""
-        # Generate query embedding
-        query_embeddings = await self.generate_embeddings([query])
-        if not query_embeddings:
-            return []
-        
-        query_embedding = np.array(query_embeddings[0])
+        # Generate query embedding unless the caller already has one
+        if query_embedding is None:
+            query_embeddings = await self.generate_embeddings([query])
+            if not query_embeddings:
+                return []
+            query_embedding = query_embeddings[0]
+
+        query_embedding = np.array(query_embedding)
 
         # Get all chunks for this agent's documents
         stmt = (
@@ -208,9 +243,12 @@ class RAGService:
         query: str,
         max_context_chars: int = 4000,
         similarity_threshold: float = 0.15,  # Lowered from 0.3 for better recall
+        query_embedding: Optional[List[float]] = None,
     ) -> Optional[str]:
         """Get relevant context from knowledge base for a query."""
-        similar_chunks = await self.search_similar(agent_id, query, top_k=5)
+        similar_chunks = await self.search_similar(
+            agent_id, query, top_k=5, query_embedding=query_embedding
+        )
         
         if not similar_chunks:
             logger.info(f"No chunks found for agent {agent_id}")
@@ -0,0 +1,190 @@
+"""Per-agent response cache with exact and semantic (embedding) matching."""
+
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a user query for exact-match lookups."""
+    return " ".join(query.lower().split())
+
+
+def _short_hash(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()[:16]
+
+
+def prompt_version(system_prompt: str) -> str:
+    """Version identifier for an agent's system prompt."""
+    return _short_hash(system_prompt)
+
+
+def knowledge_base_version(documents) -> str:
+    """Version identifier for an agent's knowledge base (its set of documents)."""
+    return _short_hash(
+        "|".join(sorted(f"{doc.id}:{doc.chunk_count}" for doc in documents))
+    )
+
+
+def conversation_version(history) -> str:
+    """Version identifier for the turns before a query ("" for the first turn)."""
+    if not history:
+        return ""
+    return _short_hash("\n".join(f"{turn['role']}:{turn['content']}" for turn in history))
+
+
+@dataclass
+class CacheEntry:
+    """A cached assistant response."""
+
+    namespace: str
+    query: str
+    embedding: Optional[np.ndarray]
+    response: str
+    created_at: float
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache of assistant responses.
+
+    Entries are grouped by namespace (agent id, system prompt version,
+    knowledge base version and the earlier turns of the conversation), so
+    editing the prompt or the documents naturally invalidates old answers and
+    a follow-up such as "why?" only matches the same conversation. Lookups try
+    an exact match on the normalized query first, then a cosine-similarity
+    scan over the namespace embeddings.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.RESPONSE_CACHE_MAX_ENTRIES,
+        ttl_seconds: int = settings.RESPONSE_CACHE_TTL_SECONDS,
+        similarity_threshold: float = settings.RESPONSE_CACHE_SIMILARITY_THRESHOLD,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[Tuple[str, str], CacheEntry]" = OrderedDict()
+        self._by_namespace: Dict[str, Dict[str, CacheEntry]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def namespace(agent_id: str, system_prompt: str, documents, history=()) -> str:
+        """Build the cache namespace for an agent and the turns before the query."""
+        return (
+            f"{agent_id}:{prompt_version(system_prompt)}"
+            f":{knowledge_base_version(documents)}"
+            f":{conversation_version(history)}"
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _is_expired(self, entry: CacheEntry, now: float) -> bool:
+        return now - entry.created_at > self.ttl_seconds
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        bucket = self._by_namespace.get(entry.namespace)
+        if bucket is not None:
+            bucket.pop(entry.query, None)
+            if not bucket:
+                del self._by_namespace[entry.namespace]
+
+    def get_exact(self, namespace: str, query: str) -> Optional[str]:
+        """Return the cached response for an identical (normalized) query."""
+        key = (namespace, normalize_query(query))
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self._is_expired(entry, time.monotonic()):
+            self._remove(key)
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.response
+
+    def get_similar(self, namespace: str, embedding: List[float]) -> Optional[str]:
+        """Return the cached response of the most similar query above the threshold."""
+        bucket = self._by_namespace.get(namespace)
+        if not bucket:
+            self.misses += 1
+            return None
+
+        now = time.monotonic()
+        for entry in list(bucket.values()):
+            if self._is_expired(entry, now):
+                self._remove((namespace, entry.query))
+
+        candidates = [e for e in bucket.values() if e.embedding is not None]
+        if not candidates:
+            self.misses += 1
+            return None
+
+        query_vec = _unit(embedding)
+        scores = np.stack([e.embedding for e in candidates]) @ query_vec
+        best = int(np.argmax(scores))
+        if float(scores[best]) < self.similarity_threshold:
+            self.misses += 1
+            return None
+
+        entry = candidates[best]
+        self._entries.move_to_end((namespace, entry.query))
+        self.hits += 1
+        logger.info(f"Semantic cache hit (similarity {float(scores[best]):.3f})")
+        return entry.response
+
+    def put(
+        self,
+        namespace: str,
+        query: str,
+        embedding: Optional[List[float]],
+        response: str,
+    ) -> None:
+        """Store a response, evicting the least recently used entries if full."""
+        normalized = normalize_query(query)
+        key = (namespace, normalized)
+        self._remove(key)
+
+        entry = CacheEntry(
+            namespace=namespace,
+            query=normalized,
+            embedding=_unit(embedding) if embedding else None,
+            response=response,
+            created_at=time.monotonic(),
+        )
+        self._entries[key] = entry
+        self._by_namespace.setdefault(namespace, {})[normalized] = entry
+
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+    def clear(self) -> None:
+        """Drop every cached response."""
+        self._entries.clear()
+        self._by_namespace.clear()
+
+
+def _unit(vector: List[float]) -> np.ndarray:
+    arr = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(arr)
+    return arr / norm if norm else arr
+
+
+# Singleton instance
+response_cache = ResponseCache()
@@ -0,0 +1,273 @@
+"""
+Sentence-pipelined text-to-speech for the voice path.
+
+The answer is split into sentences while the model is still generating,
+and each sentence is sent to TTS as soon as it is complete. The first
+audio segment is therefore ready roughly one sentence after the first
+token, instead of after the whole answer plus a single long TTS call.
+"""
+
+import asyncio
+import logging
+import re
+import struct
+import time
+from dataclasses import dataclass
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Callable, List, Optional, Union
+
+from app.config import settings
+from app.services.ogg_opus import remux_opus
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+first_audio = metrics.histogram(
+    "voice_first_audio_seconds",
+    "Time from the start of generation until the first TTS segment is ready",
+)
+segments_per_answer = metrics.histogram(
+    "voice_tts_segments",
+    "TTS segments (sentences) synthesized per voice answer",
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34),
+)
+
+# End of a sentence: terminal punctuation (plus closing quotes/brackets)
+# followed by whitespace, or a line break
+_SENTENCE_END = re.compile(r"[.!?…]+[\"')\]]*\s+|\n+")
+_SOFT_BREAK = re.compile(r"[,;:]\s+")
+
+
+def _split_point(text: str, min_chars: int, max_chars: int) -> Optional[int]:
+    """Index to cut ``text`` after, or None to keep buffering."""
+    for match in _SENTENCE_END.finditer(text):
+        if match.end() >= min_chars:
+            return match.end()
+    if len(text) < max_chars:
+        return None
+    # Overlong sentence: cut at the last clause break, else the last space
+    window = text[:max_chars]
+    breaks = list(_SOFT_BREAK.finditer(window))
+    if breaks:
+        return breaks[-1].end()
+    space = window.rfind(" ")
+    return space + 1 if space > 0 else max_chars
+
+
+async def split_sentences(
+    tokens: AsyncIterator[str],
+    min_chars: int = settings.VOICE_SENTENCE_MIN_CHARS,
+    max_chars: int = settings.VOICE_SENTENCE_MAX_CHARS,
+) -> AsyncGenerator[str, None]:
+    """
+    Regroup streamed tokens into sentences.
+
+    Sentences shorter than ``min_chars`` are merged with the next one so
+    "Sure!" does not become its own TTS call; sentences longer than
+    ``max_chars`` are cut at a clause break.
+    """
+    buffer = ""
+    async for token in tokens:
+        buffer += token
+        while True:
+            cut = _split_point(buffer, min_chars, max_chars)
+            if cut is None:
+                break
+            sentence, buffer = buffer[:cut].strip(), buffer[cut:]
+            if sentence:
+                yield sentence
+
+    if buffer.strip():
+        yield buffer.strip()
+
+
+def _strip_id3(segment: bytes) -> bytes:
+    """Drop a leading ID3v2 tag so it is not played back mid-stream."""
+    if len(segment) < 10 or segment[:3] != b"ID3":
+        return segment
+    size = 0
+    for byte in segment[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    return segment[10 + size:]
+
+
+def stitch_mp3(segments: List[bytes]) -> bytes:
+    """Join MP3 segments into one playable file (MP3 frames concatenate)."""
+    if not segments:
+        return b""
+    return segments[0] + b"".join(_strip_id3(segment) for segment in segments[1:])
+
+
+def stitch_audio(segments: List[bytes], audio_format: str = "mp3") -> bytes:
+    """
+    Join TTS segments of ``audio_format`` into one playable file.
+
+    AAC (ADTS) frames concatenate like MP3 frames. Ogg Opus segments are
+    remuxed into a single logical stream, since many players stop at the
+    end of the first link of a chained Ogg file; segments that can't be
+    remuxed are chained as a last resort.
+    """
+    if audio_format == "mp3":
+        return stitch_mp3(segments)
+    if audio_format == "opus":
+        try:
+            return remux_opus(segments)
+        except (ValueError, IndexError, struct.error) as e:
+            logger.warning(f"Could not remux {len(segments)} Opus segments, chaining them: {e}")
+    return b"".join(segments)
+
+
+@dataclass
+class Segment:
+    """Synthesized audio for one sentence of the answer."""
+
+    index: int
+    text: str
+    audio: bytes
+
+
+# Marks the end of one producer in SpeechPipeline.stream
+_END = object()
+
+
+class SpeechPipeline:
+    """
+    Overlaps generation with per-sentence TTS.
+
+    ``run`` consumes the token stream and returns the full text; TTS for
+    each sentence starts as soon as the sentence is complete, with at most
+    ``max_concurrency`` segments in flight. ``audio`` then waits for the
+    segments in sentence order. ``stream`` does both at once, yielding text
+    and segments as they become available.
+    """
+
+    def __init__(
+        self,
+        synthesize: Callable[[str], Awaitable[bytes]],
+        max_concurrency: int = settings.VOICE_TTS_MAX_CONCURRENCY,
+    ):
+        self._synthesize = synthesize
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._tasks: List[asyncio.Task] = []
+        self._sentences: List[str] = []
+        self._scheduled: asyncio.Queue = asyncio.Queue()
+        self._started = 0.0
+        self.text = ""
+        self.tts_error: Optional[BaseException] = None
+
+    @property
+    def segment_count(self) -> int:
+        return len(self._tasks)
+
+    async def _segment(self, sentence: str) -> bytes:
+        async with self._semaphore:
+            return await self._synthesize(sentence)
+
+    @staticmethod
+    def _retrieve_error(task: asyncio.Task) -> None:
+        # Segments cancelled after another one failed must not log
+        # "exception was never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    def _on_first_segment(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is None:
+            first_audio.observe(time.monotonic() - self._started)
+
+    def _schedule(self, sentence: str) -> None:
+        if self.tts_error is not None:
+            return
+        task = asyncio.ensure_future(self._segment(sentence))
+        task.add_done_callback(self._retrieve_error)
+        if not self._tasks:
+            task.add_done_callback(self._on_first_segment)
+        self._tasks.append(task)
+        self._sentences.append(sentence)
+        self._scheduled.put_nowait(task)
+
+    async def run(self, tokens: AsyncIterator[str]) -> str:
+        """Consume ``tokens``, scheduling TTS per sentence; return the full text."""
+        self._started = time.monotonic()
+        parts: List[str] = []
+
+        async def recorded() -> AsyncGenerator[str, None]:
+            async for token in tokens:
+                parts.append(token)
+                yield token
+
+        try:
+            async for sentence in split_sentences(recorded()):
+                self._schedule(sentence)
+        except BaseException:
+            self.cancel()
+            raise
+        finally:
+            self._scheduled.put_nowait(None)
+        segments_per_answer.observe(len(self._tasks))
+        self.text = "".join(parts)
+        return self.text
+
+    async def audio(self) -> List[bytes]:
+        """Audio segments in sentence order; raises if any segment failed."""
+        try:
+            return list(await asyncio.gather(*self._tasks))
+        except BaseException:
+            self.cancel()
+            raise
+
+    async def segments(self) -> AsyncGenerator[Segment, None]:
+        """Segments in sentence order, each as soon as it is ready (``run`` may still be going)."""
+        index = 0
+        while True:
+            task = await self._scheduled.get()
+            if task is None:
+                return
+            yield Segment(index, self._sentences[index], await task)
+            index += 1
+
+    async def stream(self, tokens: AsyncIterator[str]) -> AsyncGenerator[Union[str, Segment], None]:
+        """
+        Yield text as it is generated, interleaved with each ``Segment`` once
+        it and all earlier segments are ready.
+
+        A generation failure is raised. A TTS failure only stops the audio:
+        it is kept in ``tts_error`` and the text keeps streaming.
+        """
+        events: asyncio.Queue = asyncio.Queue()
+
+        async def forward() -> AsyncGenerator[str, None]:
+            async for token in tokens:
+                events.put_nowait(token)
+                yield token
+
+        async def deliver() -> None:
+            try:
+                async for segment in self.segments():
+                    events.put_nowait(segment)
+            except Exception as e:
+                self.tts_error = e
+                self.cancel()
+
+        generation = asyncio.ensure_future(self.run(forward()))
+        delivery = asyncio.ensure_future(deliver())
+        for task in (generation, delivery):
+            task.add_done_callback(lambda _: events.put_nowait(_END))
+
+        try:
+            finished = 0
+            while finished < 2:
+                event = await events.get()
+                if event is _END:
+                    finished += 1
+                    if generation.done() and not generation.cancelled() and generation.exception():
+                        break
+                    continue
+                yield event
+            generation.result()
+        finally:
+            generation.cancel()
+            delivery.cancel()
+            self.cancel()
+
+    def cancel(self) -> None:
+        for task in self._tasks:
+            task.cancel()
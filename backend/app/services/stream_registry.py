@@ -0,0 +1,115 @@
+"""Registry of in-flight chat generations that clients can resume after a disconnect."""
+
+import asyncio
+import logging
+from collections import deque
+from itertools import islice
+from typing import AsyncGenerator, AsyncIterator, Deque, Dict, Optional, Tuple, Union
+from uuid import uuid4
+
+from app.config import settings
+from app.utils.sse import encode_event
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationStream:
+    """
+    Sequence-numbered SSE events of a single generation.
+
+    Events are kept in a bounded buffer so a reconnecting client can replay
+    whatever it missed (by ``Last-Event-ID``) and then follow live events.
+    """
+
+    def __init__(self, session_id: str, max_events: int = settings.STREAM_BUFFER_MAX_EVENTS):
+        self.id = str(uuid4())
+        self.session_id = session_id
+        self.finished = False
+        self.task: Optional[asyncio.Task] = None
+        self._events: Deque[Tuple[int, bytes]] = deque(maxlen=max_events)
+        self._last_seq = 0
+        self._changed = asyncio.Event()
+
+    @property
+    def last_seq(self) -> int:
+        return self._last_seq
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def publish(self, frame: Union[bytes, str]) -> int:
+        """Append an SSE frame, tagging it with the next sequence number."""
+        if isinstance(frame, str):
+            frame = frame.encode("utf-8")
+        self._last_seq += 1
+        self._events.append((self._last_seq, b"id: %d\n" % self._last_seq + frame))
+        self._notify()
+        return self._last_seq
+
+    def finish(self) -> None:
+        """Mark the generation as complete and wake all subscribers."""
+        self.finished = True
+        self._notify()
+
+    async def subscribe(self, last_event_id: int = 0) -> AsyncGenerator[bytes, None]:
+        """
+        Yield buffered events after ``last_event_id``, then live ones until done.
+
+        When events after the cursor have already left the buffer, a ``gap``
+        event (without an id) comes first: the client cannot rebuild the
+        answer from what follows and should reload the message instead.
+        """
+        cursor = last_event_id
+        while True:
+            changed = self._changed
+            if self._events:
+                first_seq = self._events[0][0]
+                if cursor + 1 < first_seq:
+                    yield encode_event("gap", {"missed_from": cursor + 1, "resumes_at": first_seq})
+                    cursor = first_seq - 1
+                start = max(0, cursor + 1 - first_seq)
+                # Snapshot: the producer may append while we are suspended in yield
+                for seq, frame in list(islice(self._events, start, None)):
+                    cursor = seq
+                    yield frame
+
+            if self.finished and cursor >= self._last_seq:
+                return
+            if cursor >= self._last_seq:
+                await changed.wait()
+
+
+class StreamRegistry:
+    """Owns generation tasks so they keep running when the client goes away."""
+
+    def __init__(self, retention_seconds: int = settings.STREAM_RETENTION_SECONDS):
+        self.retention_seconds = retention_seconds
+        self._streams: Dict[str, GenerationStream] = {}
+
+    def start(self, session_id: str, source: AsyncIterator[Union[bytes, str]]) -> GenerationStream:
+        """Start pumping ``source`` into a new stream in a background task."""
+        stream = GenerationStream(session_id)
+        self._streams[stream.id] = stream
+        stream.task = asyncio.create_task(self._pump(stream, source))
+        return stream
+
+    def get(self, stream_id: str) -> Optional[GenerationStream]:
+        return self._streams.get(stream_id)
+
+    async def _pump(self, stream: GenerationStream, source: AsyncIterator[Union[bytes, str]]) -> None:
+        try:
+            async for frame in source:
+                stream.publish(frame)
+        except Exception as e:
+            logger.error(f"Generation stream {stream.id} failed: {type(e).__name__}: {e}", exc_info=True)
+            stream.publish(encode_event("error", {"error": str(e)}))
+        finally:
+            stream.finish()
+            asyncio.get_running_loop().call_later(
+                self.retention_seconds, self._streams.pop, stream.id, None
+            )
+
+
+# Singleton instance
+stream_registry = StreamRegistry()
@@ -0,0 +1,100 @@
+"""Transcript cache for uploaded audio, keyed by content hash, model and language."""
+
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Tuple
+
+from app.config import settings
+from app.integrations.singleflight import SingleFlight, make_key
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+stt_cache_requests = metrics.counter(
+    "stt_cache_requests_total",
+    "Transcript cache lookups by result",
+    ["result"],
+)
+
+
+def audio_digest(content: bytes) -> str:
+    """SHA-256 of an upload's bytes."""
+    return hashlib.sha256(content).hexdigest()
+
+
+class STTCache:
+    """
+    LRU + TTL cache of transcripts.
+
+    Clients retry uploads that timed out, so the same bytes arrive again:
+    a retry after the first transcription finished is answered from the
+    cache, and one that arrives while it is still running shares it.
+    Failures are not cached.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.STT_CACHE_MAX_ENTRIES,
+        ttl_seconds: int = settings.STT_CACHE_TTL_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.flights = SingleFlight()
+
+    @staticmethod
+    def key(digest: str, model: str, language: Optional[str]) -> str:
+        return make_key("speech_to_text", digest, model, language)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        text, created_at = entry
+        if time.monotonic() - created_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        self._entries.pop(key, None)
+        self._entries[key] = (text, time.monotonic())
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def transcribe(
+        self,
+        digest: str,
+        model: str,
+        language: Optional[str],
+        transcribe: Callable[[], Awaitable[str]],
+    ) -> str:
+        """The transcript of the audio with ``digest``, calling ``transcribe`` on a miss."""
+        if not settings.STT_CACHE_ENABLED:
+            return await transcribe()
+
+        key = self.key(digest, model, language)
+        text = self.get(key)
+        if text is not None:
+            stt_cache_requests.inc(result="hit")
+            logger.info(f"STT cache hit for audio {digest[:12]}")
+            return text
+
+        stt_cache_requests.inc(result="miss")
+        text = await self.flights.do(key, transcribe)
+        self.put(key, text)
+        return text
+
+    def clear(self) -> None:
+        """Drop every cached transcript."""
+        self._entries.clear()
+
+
+# Singleton instance
+stt_cache = STTCache()
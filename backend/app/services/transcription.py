@@ -0,0 +1,343 @@
+"""
+Segmented speech-to-text for streamed microphone audio.
+
+Audio arrives as 16-bit little-endian mono PCM. A simple energy-based
+voice activity detector cuts it into utterances at pauses, and each
+utterance is sent to STT as soon as it closes, while the user keeps
+talking. When the turn ends only the last utterance is still in flight,
+so the full transcript is ready shortly after the user stops.
+
+Long uploaded recordings get the same treatment after the fact: they are
+cut at pauses into overlapping segments that are transcribed in parallel,
+and the overlaps are merged out of the joined text. WAV is read directly;
+WebM/Opus (what browsers' MediaRecorder produces) and MP3 are decoded with
+PyAV, and without it installed they are sent to STT whole.
+"""
+
+import asyncio
+import io
+import logging
+import re
+import wave
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import av
+except ImportError:  # optional: without it only WAV uploads are split
+    av = None
+
+from app.config import settings
+from app.services.audio_probe import probe_duration, sniff_format
+
+logger = logging.getLogger(__name__)
+
+FRAME_MS = 20
+SAMPLE_WIDTH = 2  # bytes per 16-bit sample
+DECODE_SAMPLE_RATE = 16000  # what Whisper resamples to anyway
+
+
+def frame_db(frame: bytes) -> float:
+    """Loudness of a PCM frame in dBFS (-inf for digital silence)."""
+    samples = np.frombuffer(frame, dtype="<i2").astype(np.float64)
+    if samples.size == 0:
+        return float("-inf")
+    rms = np.sqrt(np.mean(samples * samples)) / 32768.0
+    return float(20 * np.log10(rms)) if rms > 0 else float("-inf")
+
+
+def pcm_to_wav(pcm: bytes, sample_rate: int) -> bytes:
+    """Wrap 16-bit mono PCM in a WAV container."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(SAMPLE_WIDTH)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def decode_wav(content: bytes) -> Optional[Tuple[bytes, int]]:
+    """16-bit mono PCM and sample rate of a WAV file (channels are mixed down); None if unsupported."""
+    try:
+        with wave.open(io.BytesIO(content), "rb") as wav:
+            if wav.getsampwidth() != SAMPLE_WIDTH or wav.getframerate() < 8000:
+                return None
+            channels, sample_rate = wav.getnchannels(), wav.getframerate()
+            pcm = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        return None
+    if channels > 1:
+        samples = np.frombuffer(pcm, dtype="<i2")[: len(pcm) // (2 * channels) * channels]
+        pcm = samples.reshape(-1, channels).mean(axis=1).astype("<i2").tobytes()
+    return pcm, sample_rate
+
+
+def decode_compressed(content: bytes) -> Optional[Tuple[bytes, int]]:
+    """16-bit mono PCM of a compressed recording via PyAV; None without it or if undecodable."""
+    if av is None:
+        return None
+    resampler = av.AudioResampler(format="s16", layout="mono", rate=DECODE_SAMPLE_RATE)
+    chunks = []
+    try:
+        with av.open(io.BytesIO(content)) as container:
+            for frame in container.decode(audio=0):
+                chunks += [out.to_ndarray().tobytes() for out in resampler.resample(frame)]
+        chunks += [out.to_ndarray().tobytes() for out in resampler.resample(None)]
+    except (av.error.FFmpegError, ValueError, IndexError) as e:
+        logger.warning(f"Could not decode {len(content)}-byte upload: {e}")
+        return None
+    return b"".join(chunks), DECODE_SAMPLE_RATE
+
+
+async def decode_recording(audio: bytes) -> Optional[Tuple[bytes, int]]:
+    """PCM and sample rate of an uploaded recording, decoding off the event loop."""
+    kind = sniff_format(audio)
+    if kind == "wav":
+        return decode_wav(audio)
+    if kind in ("webm", "mp3"):
+        return await asyncio.to_thread(decode_compressed, audio)
+    return None
+
+
+def frame_levels(pcm: bytes, sample_rate: int) -> np.ndarray:
+    """Loudness in dBFS of each whole ``FRAME_MS`` frame of 16-bit PCM."""
+    frame_samples = sample_rate * FRAME_MS // 1000
+    samples = np.frombuffer(pcm[: len(pcm) // SAMPLE_WIDTH * SAMPLE_WIDTH], dtype="<i2")
+    frames = samples[: len(samples) // frame_samples * frame_samples].reshape(-1, frame_samples)
+    rms = np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1)) / 32768.0
+    with np.errstate(divide="ignore"):
+        return 20 * np.log10(rms)
+
+
+def split_at_pauses(
+    pcm: bytes,
+    sample_rate: int,
+    segment_seconds: float = settings.VOICE_PARALLEL_STT_SEGMENT_SECONDS,
+    overlap_ms: int = settings.VOICE_PARALLEL_STT_OVERLAP_MS,
+) -> List[Tuple[int, int]]:
+    """
+    Byte ranges that cover ``pcm`` in segments of about ``segment_seconds``.
+
+    Each cut is placed at the quietest frame in the second half of the
+    segment, so it lands in a pause when there is one; segments then reach
+    ``overlap_ms`` past the cut on both sides in case it split a word.
+    """
+    levels = frame_levels(pcm, sample_rate)
+    frame_bytes = sample_rate * FRAME_MS // 1000 * SAMPLE_WIDTH
+    target = max(2, int(segment_seconds * 1000) // FRAME_MS)
+    overlap = overlap_ms // FRAME_MS
+
+    cuts, start = [0], 0
+    while len(levels) - start > target * 3 // 2:
+        window = levels[start + target // 2:start + target]
+        start += target // 2 + int(np.argmin(window))
+        cuts.append(start)
+    cuts.append(len(levels))
+
+    spans = []
+    for begin, end in zip(cuts, cuts[1:]):
+        first = max(0, begin - overlap) * frame_bytes
+        last = len(pcm) if end == len(levels) else min(len(levels), end + overlap) * frame_bytes
+        spans.append((first, last))
+    return spans
+
+
+def _words(text: str) -> List[str]:
+    return [re.sub(r"[^\w']", "", word.lower()) for word in text.split()]
+
+
+def merge_overlapping(texts: List[str], max_overlap_words: int = 12, min_overlap_words: int = 2) -> str:
+    """
+    Join transcripts of overlapping segments, dropping the words the
+    start of each one repeats from the end of the text before it.
+
+    Cuts land in pauses, so the overlap is often just silence: a single
+    matching word is more likely speech ("no. No means no") than a repeat,
+    and only runs of ``min_overlap_words`` or more are dropped.
+    """
+    merged: List[str] = []
+    for text in texts:
+        words = text.split()
+        if not words:
+            continue
+        tail, head = _words(" ".join(merged[-max_overlap_words:])), _words(text)
+        longest = min(len(tail), len(head))
+        repeated = next(
+            (n for n in range(longest, min_overlap_words - 1, -1) if tail[-n:] == head[:n]),
+            0,
+        )
+        merged += words[repeated:]
+    return " ".join(merged)
+
+
+async def transcribe_recording(
+    transcribe: Callable[[bytes, str], Awaitable[str]],
+    audio: bytes,
+    filename: str,
+) -> str:
+    """
+    Transcribe an uploaded recording. Recordings longer than
+    ``VOICE_PARALLEL_STT_MIN_SECONDS`` are decoded, split at pauses and
+    their segments transcribed concurrently; anything shorter, or that
+    can't be decoded, is sent whole.
+    """
+    duration = probe_duration(audio)
+    if duration is not None and duration < settings.VOICE_PARALLEL_STT_MIN_SECONDS:
+        return await transcribe(audio, filename)
+    decoded = await decode_recording(audio)
+    if decoded is None:
+        return await transcribe(audio, filename)
+    pcm, sample_rate = decoded
+    if len(pcm) / (sample_rate * SAMPLE_WIDTH) < settings.VOICE_PARALLEL_STT_MIN_SECONDS:
+        return await transcribe(audio, filename)
+
+    spans = split_at_pauses(pcm, sample_rate)
+    tasks = [
+        asyncio.ensure_future(transcribe(pcm_to_wav(pcm[first:last], sample_rate), f"segment-{index}.wav"))
+        for index, (first, last) in enumerate(spans)
+    ]
+    try:
+        texts = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    logger.debug(f"Transcribed {len(pcm) // (sample_rate * SAMPLE_WIDTH)}s recording in {len(spans)} segments")
+    return merge_overlapping([text.strip() for text in texts])
+
+
+class SpeechSegmenter:
+    """
+    Cuts a PCM stream into utterances with an energy VAD.
+
+    A segment closes after ``silence_ms`` of quiet following speech, or
+    once it reaches ``max_seconds``. Segments without any speech are
+    dropped, so silence is never sent to STT.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = settings.VOICE_WS_SAMPLE_RATE,
+        silence_ms: int = settings.VOICE_SEGMENT_SILENCE_MS,
+        max_seconds: float = settings.VOICE_SEGMENT_MAX_SECONDS,
+        threshold_db: float = settings.VOICE_VAD_THRESHOLD_DB,
+    ):
+        self.sample_rate = sample_rate
+        self.threshold_db = threshold_db
+        self.frame_bytes = sample_rate * FRAME_MS // 1000 * SAMPLE_WIDTH
+        if self.frame_bytes <= 0:
+            raise ValueError(f"Sample rate too low for {FRAME_MS} ms frames: {sample_rate}")
+        self.silence_frames = max(1, silence_ms // FRAME_MS)
+        self.max_bytes = int(max_seconds * sample_rate) * SAMPLE_WIDTH
+        self._pending = bytearray()  # less than one frame
+        self._segment = bytearray()
+        self._voiced = False
+        self._silent_frames = 0
+
+    def feed(self, pcm: bytes) -> List[bytes]:
+        """Add audio; return the segments it closed."""
+        self._pending += pcm
+        closed = []
+        while len(self._pending) >= self.frame_bytes:
+            frame = bytes(self._pending[:self.frame_bytes])
+            del self._pending[:self.frame_bytes]
+            self._segment += frame
+            if frame_db(frame) > self.threshold_db:
+                self._voiced = True
+                self._silent_frames = 0
+            else:
+                self._silent_frames += 1
+
+            paused = self._voiced and self._silent_frames >= self.silence_frames
+            if paused or len(self._segment) >= self.max_bytes:
+                segment = self._close()
+                if segment is not None:
+                    closed.append(segment)
+        return closed
+
+    def flush(self) -> Optional[bytes]:
+        """Close the segment in progress (end of turn)."""
+        self._segment += self._pending
+        self._pending.clear()
+        return self._close()
+
+    def _close(self) -> Optional[bytes]:
+        segment, voiced = bytes(self._segment), self._voiced
+        self._segment.clear()
+        self._voiced = False
+        self._silent_frames = 0
+        return segment if voiced else None
+
+
+class StreamingTranscriber:
+    """
+    Transcribes a turn of streamed PCM segment by segment.
+
+    ``feed`` starts STT for every segment the VAD closes; ``close`` ends
+    the turn and ``finish`` returns the transcript in speaking order.
+    ``on_segment`` is awaited with (index, text) as each segment is done.
+    """
+
+    def __init__(
+        self,
+        transcribe: Callable[[bytes, str], Awaitable[str]],
+        sample_rate: int = settings.VOICE_WS_SAMPLE_RATE,
+        on_segment: Optional[Callable[[int, str], Awaitable[None]]] = None,
+    ):
+        self.sample_rate = sample_rate
+        self.segmenter = SpeechSegmenter(sample_rate)
+        self.audio = bytearray()  # the whole turn, for storage
+        self._transcribe = transcribe
+        self._on_segment = on_segment
+        self._tasks: List[asyncio.Task] = []
+        self._closed = False
+
+    @property
+    def duration(self) -> float:
+        return len(self.audio) / (self.sample_rate * SAMPLE_WIDTH)
+
+    @property
+    def segment_count(self) -> int:
+        return len(self._tasks)
+
+    async def _segment(self, index: int, pcm: bytes) -> str:
+        text = (await self._transcribe(pcm_to_wav(pcm, self.sample_rate), f"segment-{index}.wav")).strip()
+        if self._on_segment is not None and text:
+            await self._on_segment(index, text)
+        return text
+
+    def _schedule(self, pcm: bytes) -> None:
+        task = asyncio.ensure_future(self._segment(len(self._tasks), pcm))
+        # Failures surface from finish(); don't log them as unretrieved
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._tasks.append(task)
+
+    def feed(self, pcm: bytes) -> None:
+        self.audio += pcm
+        for segment in self.segmenter.feed(pcm):
+            self._schedule(segment)
+
+    def close(self) -> bool:
+        """End the turn: start STT for the last segment; return whether there was speech."""
+        if not self._closed:
+            self._closed = True
+            tail = self.segmenter.flush()
+            if tail is not None:
+                self._schedule(tail)
+        return bool(self._tasks)
+
+    async def finish(self) -> str:
+        """Transcript of the whole turn ("" if no speech was detected)."""
+        self.close()
+        try:
+            texts = await asyncio.gather(*self._tasks)
+        except BaseException:
+            self.cancel()
+            raise
+        return " ".join(text for text in texts if text)
+
+    def cancel(self) -> None:
+        for task in self._tasks:
+            task.cancel()
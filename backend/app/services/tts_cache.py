@@ -0,0 +1,254 @@
+"""Content-addressed cache of synthesized speech with an LRU storage budget."""
+
+import hashlib
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from app.config import settings
+from app.services.audio_formats import DEFAULT_TTS_FORMAT, TTS_FORMATS
+from app.services.audio_links import unlink_messages
+from app.services.audio_store import AudioStore, audio_store, audio_url
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+tts_cache_requests = metrics.counter(
+    "tts_cache_requests_total",
+    "TTS cache lookups by result",
+    ["result"],
+)
+tts_cache_evictions = metrics.counter(
+    "tts_cache_evictions_total",
+    "TTS files evicted to stay within the storage budget",
+)
+tts_cache_size = metrics.gauge(
+    "tts_cache_bytes",
+    "Bytes of synthesized speech held in the TTS cache",
+)
+tts_cache_entries = metrics.gauge(
+    "tts_cache_entries",
+    "Files held in the TTS cache",
+)
+
+_KEY_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+_EXTENSIONS = {extension for extension, _ in TTS_FORMATS.values()}
+
+# A reused file's modified time is renewed at most this often (seconds);
+# retention works in days, so this is plenty and keeps hits cheap
+TOUCH_INTERVAL_SECONDS = 3600
+
+
+def speech_key(text: str, voice: str, model: str) -> str:
+    """Content address of the speech for ``text`` in ``voice`` from ``model``."""
+    return hashlib.sha256(f"{model}\0{voice}\0{text}".encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """
+    Synthesized speech stored under the hash of (text, voice, model).
+
+    Files live in the store's TTS folder as ``<key>.<format extension>``
+    (e.g. ``<key>.mp3``, ``<key>.opus``), so identical text is synthesized
+    once per format and shares one URL. An in-memory index keeps the files
+    in least-recently-used order with their sizes; once the total exceeds
+    ``max_bytes`` the oldest files are deleted. Messages still pointing at
+    an evicted file have their ``tts_audio_url`` cleared, as the retention
+    sweeper does.
+
+    Hits renew the stored file's modified time, which is what retention
+    ages files by. Pre-rendered fallback speech is pinned: neither eviction
+    nor retention deletes it.
+    """
+
+    def __init__(
+        self,
+        store: Optional[AudioStore] = None,
+        folder: str = "tts",
+        max_bytes: int = settings.TTS_CACHE_MAX_BYTES,
+    ):
+        self.store = store or audio_store
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self._index: "OrderedDict[str, int]" = OrderedDict()  # file name -> size
+        self._touched: Dict[str, float] = {}  # file name -> unix time its mtime was last renewed
+        self._pinned: Set[str] = set()
+        self._bytes = 0
+        self._loaded = False
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    @staticmethod
+    def _name(key: str, audio_format: str) -> str:
+        return f"{key}.{TTS_FORMATS[audio_format][0]}"
+
+    def url(self, key: str, audio_format: str = DEFAULT_TTS_FORMAT) -> str:
+        return audio_url(self.folder, self._name(key, audio_format))
+
+    async def load(self) -> None:
+        """Rebuild the index from the store, oldest first."""
+        self._index.clear()
+        self._touched.clear()
+        self._bytes = 0
+        self._loaded = True
+
+        files = []
+        for stored in await self.store.list(self.folder):
+            key, _, extension = stored.name.partition(".")
+            if extension in _EXTENSIONS and _KEY_PATTERN.match(key):
+                files.append((stored.modified, stored.name, stored.size))
+        for modified, name, size in sorted(files):
+            self._index[name] = size
+            self._touched[name] = modified
+            self._bytes += size
+        await self._evict()
+        logger.info(f"TTS cache loaded: {len(self._index)} files, {self._bytes} bytes")
+
+    async def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            await self.load()
+
+    async def _touch(self, name: str) -> None:
+        self._index.move_to_end(name)
+        now = time.time()
+        if now - self._touched.get(name, 0.0) < TOUCH_INTERVAL_SECONDS:
+            return
+        self._touched[name] = now
+        try:
+            await self.store.touch(self.folder, name)
+        except Exception as e:
+            logger.warning(f"Could not renew {name}: {e}")
+
+    def _drop(self, name: str) -> None:
+        size = self._index.pop(name, None)
+        self._touched.pop(name, None)
+        if size is not None:
+            self._bytes -= size
+
+    def is_pinned(self, name: str) -> bool:
+        """Whether ``name`` is pre-rendered fallback speech that must be kept."""
+        return name in self._pinned
+
+    async def _evict(self) -> None:
+        evicted = []
+        # The newest file stays even if it alone exceeds the budget
+        for name in list(self._index)[:-1]:
+            if self._bytes <= self.max_bytes:
+                break
+            if name in self._pinned:
+                continue
+            self._drop(name)
+            await self.store.delete(self.folder, name)
+            tts_cache_evictions.inc()
+            evicted.append(audio_url(self.folder, name))
+        if not evicted:
+            return
+        try:
+            await unlink_messages(evicted)
+        except Exception as e:
+            logger.error(f"Could not unlink {len(evicted)} evicted TTS files from messages: {e}")
+
+    def discard(self, name: str) -> None:
+        """Forget a file deleted from the store by someone else (e.g. retention)."""
+        self._drop(name)
+
+    async def lookup(self, key: str, audio_format: str = DEFAULT_TTS_FORMAT) -> Optional[str]:
+        """URL of the cached speech for ``key``, without reading it."""
+        await self._ensure_loaded()
+        name = self._name(key, audio_format)
+        if name not in self._index:
+            return None
+        await self._touch(name)
+        return self.url(key, audio_format)
+
+    async def get(self, key: str, audio_format: str = DEFAULT_TTS_FORMAT) -> Optional[bytes]:
+        """Cached speech for ``key``, or None."""
+        await self._ensure_loaded()
+        name = self._name(key, audio_format)
+        if name not in self._index:
+            tts_cache_requests.inc(result="miss")
+            return None
+        audio = await self.store.get(self.folder, name)
+        if audio is None:
+            # Deleted behind our back
+            self._drop(name)
+            tts_cache_requests.inc(result="miss")
+            return None
+        await self._touch(name)
+        tts_cache_requests.inc(result="hit")
+        return audio
+
+    async def put(self, key: str, audio: bytes, audio_format: str = DEFAULT_TTS_FORMAT) -> str:
+        """Store speech under ``key`` and return its URL."""
+        await self._ensure_loaded()
+        name = self._name(key, audio_format)
+        url = await self.store.put(self.folder, name, audio)
+
+        self._drop(name)
+        self._index[name] = len(audio)
+        self._touched[name] = time.time()
+        self._bytes += len(audio)
+        await self._evict()
+        return url
+
+    async def synthesize(
+        self,
+        text: str,
+        voice: str,
+        model: str,
+        synthesize: Callable[[str], Awaitable[bytes]],
+        audio_format: str = DEFAULT_TTS_FORMAT,
+    ) -> Tuple[bytes, str]:
+        """Speech and URL for ``text``, synthesizing and storing it on a miss."""
+        key = speech_key(text, voice, model)
+        if settings.TTS_CACHE_ENABLED:
+            audio = await self.get(key, audio_format)
+            if audio is not None:
+                return audio, self.url(key, audio_format)
+
+        audio = await synthesize(text)
+        return audio, await self.put(key, audio, audio_format)
+
+    async def prerender(
+        self,
+        texts: Iterable[str],
+        voice: str,
+        model: str,
+        synthesize: Callable[[str], Awaitable[bytes]],
+    ) -> int:
+        """
+        Make sure MP3 speech for each of ``texts`` is cached and pinned;
+        return how many were rendered.
+        """
+        rendered = 0
+        for text in texts:
+            key = speech_key(text, voice, model)
+            self._pinned.add(self._name(key, DEFAULT_TTS_FORMAT))
+            if await self.lookup(key) is not None:
+                continue
+            try:
+                await self.put(key, await synthesize(text))
+                rendered += 1
+            except Exception as e:
+                logger.warning(f"Could not pre-render speech for {text[:40]!r}: {e}")
+        return rendered
+
+    async def clear(self) -> None:
+        """Delete every cached file."""
+        await self._ensure_loaded()
+        for name in list(self._index):
+            self._drop(name)
+            await self.store.delete(self.folder, name)
+
+
+# Singleton instance
+tts_cache = TTSCache()
+tts_cache_size.set_function(lambda: {(): tts_cache.total_bytes})
+tts_cache_entries.set_function(lambda: {(): len(tts_cache)})
@@ -1,19 +1,30 @@
-import os
+import asyncio
+import base64
 import logging
-from pathlib import Path
-from uuid import uuid4
+from typing import Any, AsyncGenerator, AsyncIterator, List, Optional, Tuple
 
-from fastapi import UploadFile
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
+from app.integrations.instrumentation import set_current_agent
 from app.integrations.openai_client import openai_client
+from app.integrations.rate_limiter import Priority
 from app.models.agent import Agent
 from app.models.session import Session
 from app.models.message import Message, MessageRole, MessageType
 from app.schemas.message import MessageResponse
 from app.schemas.voice import VoiceMessageResponse
+from app.services.audio_formats import DEFAULT_TTS_FORMAT, TTS_FORMATS, negotiate_tts_format
+from app.services.audio_probe import sniff_format
+from app.services.audio_store import audio_store
+from app.services.audio_upload import AudioUpload
+from app.services.speech_pipeline import Segment, SpeechPipeline, stitch_audio
+from app.services.stt_cache import audio_digest, stt_cache
+from app.services.transcription import transcribe_recording
+from app.services.tts_cache import speech_key, tts_cache
+from app.services.voice_trace import VoiceTrace
+from app.utils.sse import coalesce_tokens, encode_event, encode_token
 
 logger = logging.getLogger(__name__)
 
@@ -28,25 +39,21 @@ FALLBACK_MESSAGES = {
 class VoiceService:
     """Service for handling voice operations."""
 
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, accept: Optional[str] = None):
         self.db = db
         self.openai = openai_client
+        # Client's Accept header; the TTS format is settled once the agent is known
+        self.accept = accept
+        self.audio_format = DEFAULT_TTS_FORMAT
+        # Stage timings of this request (see app.services.voice_trace)
+        self.trace = VoiceTrace()
 
-    async def _save_audio_file(self, content: bytes, folder: str, extension: str) -> str:
-        """Save audio file to disk and return the path."""
-        # Ensure directory exists
-        dir_path = Path(f"audio_files/{folder}")
-        dir_path.mkdir(parents=True, exist_ok=True)
-
-        # Generate unique filename
-        filename = f"{uuid4()}.{extension}"
-        file_path = dir_path / filename
-
-        # Write file
-        with open(file_path, "wb") as f:
-            f.write(content)
-
-        return f"/api/audio/{folder}/{filename}"
+    async def _save_audio_file(
+        self, content: bytes, folder: str, extension: str, digest: Optional[str] = None
+    ) -> str:
+        """Save audio file by content address (off the event loop) and return its URL."""
+        async with self.trace.span("upload_write", size=len(content)):
+            return await audio_store.save_by_content(content, folder, extension, digest)
 
     async def _save_message(
         self,
@@ -66,11 +73,16 @@ class VoiceService:
             audio_url=audio_url,
             tts_audio_url=tts_audio_url,
         )
-        self.db.add(message)
-        await self.db.flush()
-        await self.db.refresh(message)
+        async with self.trace.span("db_write"):
+            self.db.add(message)
+            await self.db.flush()
+            await self.db.refresh(message)
         return message
 
+    async def _commit(self) -> None:
+        async with self.trace.span("db_write"):
+            await self.db.commit()
+
     async def _get_conversation_history(self, session_id: str, limit: int = 20):
         """Get conversation history for context."""
         stmt = (
@@ -119,34 +131,112 @@ class VoiceService:
             created_at=message.created_at,
         )
 
+    def _start_upload(
+        self, audio_file: AudioUpload, audio_content: bytes, digest: str
+    ) -> Tuple[asyncio.Task, str]:
+        """
+        Start persisting the upload in the background; return the task
+        (resolving to its URL) and the filename to transcribe under.
+        """
+        # Whisper goes by the extension, so trust the bytes over the client
+        extension = sniff_format(audio_content) or (
+            "webm" if "webm" in (audio_file.content_type or "") else "mp3"
+        )
+        task = asyncio.ensure_future(
+            self._save_audio_file(audio_content, "uploads", extension, digest=digest)
+        )
+        return task, f"audio.{extension}"
+
+    async def _transcribe(self, audio_content: bytes, filename: str, digest: str) -> str:
+        """
+        Transcribe the upload, or reuse the transcript of identical audio;
+        long recordings are split and transcribed in parallel.
+        """
+        async with self.trace.span("stt", size=len(audio_content)):
+            return await stt_cache.transcribe(
+                digest,
+                self.openai.whisper_model,
+                self.openai.whisper_language,
+                lambda: transcribe_recording(self.openai.speech_to_text, audio_content, filename),
+            )
+
+    async def _answer_tokens(self, session_id: str, transcript: str) -> AsyncIterator[str]:
+        """Start streaming the agent's answer to ``transcript``."""
+        async with self.trace.span("history"):
+            history = await self._get_conversation_history(session_id)
+            agent = await self._get_agent_for_session(session_id)
+        set_current_agent(agent.id)
+        self.audio_format = negotiate_tts_format(agent.tts_format, self.accept)
+        return self._timed_tokens(
+            self.openai.chat_stream(
+                system_prompt=agent.system_prompt,
+                messages=history + [{"role": "user", "content": transcript}],
+                model_policy=agent.model_policy,
+            )
+        )
+
+    async def _timed_tokens(self, tokens: AsyncIterator[str]) -> AsyncGenerator[str, None]:
+        """Pass the answer through, timing it and counting its tokens."""
+        async with self.trace.span("chat") as span:
+            async for token in tokens:
+                span.tokens += 1
+                yield token
+
+    async def _speak(self, text: str) -> bytes:
+        """Speech for one sentence, from the TTS cache when it was said before."""
+        audio_format = self.audio_format
+        async with self.trace.span("tts") as span:
+            audio, _ = await tts_cache.synthesize(
+                text,
+                self.openai.tts_voice,
+                self.openai.tts_model,
+                lambda text: self.openai.text_to_speech(text, response_format=audio_format),
+                audio_format,
+            )
+            span.bytes = len(audio)
+        return audio
+
+    async def _fallback_speech_url(self, text: str) -> Optional[str]:
+        """URL of pre-rendered speech for a fallback reply (always MP3), if any."""
+        return await tts_cache.lookup(speech_key(text, self.openai.tts_voice, self.openai.tts_model))
+
+    async def _speech_url(self, text: str, audio: bytes) -> str:
+        """URL of speech for ``text``, storing ``audio`` if it is not cached yet."""
+        key = speech_key(text, self.openai.tts_voice, self.openai.tts_model)
+        async with self.trace.span("tts_store", size=len(audio)):
+            url = await tts_cache.lookup(key, self.audio_format)
+            if url is None:
+                url = await tts_cache.put(key, audio, self.audio_format)
+        return url
+
     async def process_voice_message(
         self,
         session_id: str,
-        audio_file: UploadFile,
+        audio_file: AudioUpload,
         audio_content: bytes,
     ) -> VoiceMessageResponse:
         """
         Process a voice message:
-        1. Save uploaded audio file
-        2. Transcribe with Whisper (STT)
-        3. Get chat response (non-streaming for voice)
-        4. Generate TTS audio
-        5. Save TTS file
+        1. Save uploaded audio file by content hash (in the background)
+        2. Transcribe with Whisper (STT) from the in-memory upload, unless
+           the same audio was transcribed recently (a retried upload)
+        3. Stream chat response, starting TTS per completed sentence
+        4. Wait for the TTS segments
+        5. Save the stitched TTS file
         6. Save messages to DB
         7. Return response with audio URLs
         """
-        # 1. Save user audio file
-        extension = "webm" if "webm" in (audio_file.content_type or "") else "mp3"
-        audio_url = await self._save_audio_file(audio_content, "uploads", extension)
-
-        # Get the actual file path for transcription
-        audio_path = Path(f"audio_files/uploads/{audio_url.split('/')[-1]}")
+        # 1. Save user audio file, concurrently with transcription
+        digest = audio_digest(audio_content)
+        upload, filename = self._start_upload(audio_file, audio_content, digest)
 
         try:
-            # 2. Transcribe with Whisper
-            transcript = await self.openai.speech_to_text(audio_path)
+            # 2. Transcribe with Whisper, straight from memory
+            transcript = await self._transcribe(audio_content, filename, digest)
         except Exception as e:
             logger.error(f"STT failed for session {session_id}: {type(e).__name__}: {str(e)}", exc_info=True)
+            self.trace.outcome = "stt_failed"
+            audio_url = await upload
             # STT failed - save error message
             user_msg = await self._save_message(
                 session_id=session_id,
@@ -158,26 +248,26 @@ class VoiceService:
                 session_id=session_id,
                 role=MessageRole.ASSISTANT.value,
                 content=FALLBACK_MESSAGES["stt_failed"],
+                tts_audio_url=await self._fallback_speech_url(FALLBACK_MESSAGES["stt_failed"]),
             )
             return VoiceMessageResponse(
                 user_message=self._message_to_response(user_msg),
                 assistant_message=self._message_to_response(ai_msg),
             )
 
+        audio_url = await upload
+
         # Update session title if first message
         await self._update_session_title(session_id, transcript)
 
         try:
-            # 3. Get AI response (non-streaming)
-            history = await self._get_conversation_history(session_id)
-            agent = await self._get_agent_for_session(session_id)
-
-            ai_response = await self.openai.chat_completion(
-                system_prompt=agent.system_prompt,
-                messages=history + [{"role": "user", "content": transcript}],
-            )
+            # 3. Stream the answer; TTS for each sentence starts while the
+            # rest is still being generated
+            pipeline = SpeechPipeline(self._speak)
+            ai_response = await pipeline.run(await self._answer_tokens(session_id, transcript))
         except Exception as e:
             logger.error(f"Chat completion failed for session {session_id}: {type(e).__name__}: {str(e)}", exc_info=True)
+            self.trace.outcome = "chat_failed"
             # Chat failed
             user_msg = await self._save_message(
                 session_id=session_id,
@@ -189,6 +279,7 @@ class VoiceService:
                 session_id=session_id,
                 role=MessageRole.ASSISTANT.value,
                 content=FALLBACK_MESSAGES["default"],
+                tts_audio_url=await self._fallback_speech_url(FALLBACK_MESSAGES["default"]),
             )
             return VoiceMessageResponse(
                 user_message=self._message_to_response(user_msg),
@@ -196,13 +287,17 @@ class VoiceService:
             )
 
         try:
-            # 4. Generate TTS audio
-            tts_audio = await self.openai.text_to_speech(ai_response)
+            # 4. Wait for the per-sentence TTS segments
+            segments = await pipeline.audio()
 
-            # 5. Save TTS audio file
-            tts_url = await self._save_audio_file(tts_audio, "tts", "mp3")
+            # 5. Stitch them into one TTS audio file
+            tts_url = None
+            if segments:
+                stitched = await asyncio.to_thread(stitch_audio, segments, self.audio_format)
+                tts_url = await self._speech_url(ai_response, stitched)
         except Exception as e:
             logger.error(f"TTS failed for session {session_id}: {type(e).__name__}: {str(e)}", exc_info=True)
+            self.trace.outcome = "tts_failed"
             # TTS failed - return text response without audio
             tts_url = None
 
@@ -226,3 +321,169 @@ class VoiceService:
             user_message=self._message_to_response(user_msg),
             assistant_message=self._message_to_response(ai_msg),
         )
+
+    async def _segment_event(self, segment: Segment, inline_audio: bool) -> bytes:
+        """Encode one TTS segment as an ``audio`` event (URL or inline base64)."""
+        data = {"index": segment.index, "text": segment.text}
+        if inline_audio:
+            data["content_type"] = TTS_FORMATS[self.audio_format][1]
+            data["data"] = base64.b64encode(segment.audio).decode("ascii")
+        else:
+            data["url"] = await self._speech_url(segment.text, segment.audio)
+        return encode_event("audio", data)
+
+    async def save_stt_failure(self, session_id: str, audio_url: Optional[str]) -> Message:
+        """Save a turn whose audio could not be transcribed; return the fallback reply."""
+        await self._save_message(
+            session_id=session_id,
+            role=MessageRole.USER.value,
+            content="[Audio message - transcription failed]",
+            audio_url=audio_url,
+        )
+        ai_msg = await self._save_message(
+            session_id=session_id,
+            role=MessageRole.ASSISTANT.value,
+            content=FALLBACK_MESSAGES["stt_failed"],
+            tts_audio_url=await self._fallback_speech_url(FALLBACK_MESSAGES["stt_failed"]),
+        )
+        await self._commit()
+        return ai_msg
+
+    async def stream_answer(
+        self, session_id: str, transcript: str, audio_url: Optional[str]
+    ) -> AsyncGenerator[Tuple[str, Any], None]:
+        """
+        Answer ``transcript`` and save the turn, yielding ``(event, data)``:
+
+        - ``token``: text as it is generated
+        - ``audio``: a ``Segment`` once it (and every earlier one) is ready
+        - ``audio_error``: TTS failed; the text keeps streaming
+        - ``error``: generation failed; the fallback reply was saved
+        - ``done``: the message ids and the stitched TTS file URL
+        """
+        await self._update_session_title(session_id, transcript)
+
+        pipeline = SpeechPipeline(self._speak)
+        segments: List[bytes] = []
+        try:
+            tokens = await self._answer_tokens(session_id, transcript)
+            # Release the connection while the answer streams
+            await self._commit()
+
+            async for item in pipeline.stream(coalesce_tokens(tokens)):
+                if isinstance(item, Segment):
+                    segments.append(item.audio)
+                    yield "audio", item
+                else:
+                    yield "token", item
+        except Exception as e:
+            logger.error(f"Chat completion failed for session {session_id}: {type(e).__name__}: {str(e)}", exc_info=True)
+            self.trace.outcome = "chat_failed"
+            await self._save_message(
+                session_id=session_id,
+                role=MessageRole.USER.value,
+                content=transcript,
+                audio_url=audio_url,
+            )
+            ai_msg = await self._save_message(
+                session_id=session_id,
+                role=MessageRole.ASSISTANT.value,
+                content=FALLBACK_MESSAGES["default"],
+                tts_audio_url=await self._fallback_speech_url(FALLBACK_MESSAGES["default"]),
+            )
+            await self._commit()
+            yield "error", {"error": str(e), "fallback_message": ai_msg.content, "message_id": ai_msg.id}
+            return
+
+        tts_url = None
+        if pipeline.tts_error is not None:
+            e = pipeline.tts_error
+            logger.error(f"TTS failed for session {session_id}: {type(e).__name__}: {str(e)}")
+            self.trace.outcome = "tts_failed"
+            yield "audio_error", {"error": str(e), "fallback_message": FALLBACK_MESSAGES["tts_failed"]}
+        elif segments:
+            stitched = await asyncio.to_thread(stitch_audio, segments, self.audio_format)
+            tts_url = await self._speech_url(pipeline.text, stitched)
+
+        user_msg = await self._save_message(
+            session_id=session_id,
+            role=MessageRole.USER.value,
+            content=transcript,
+            audio_url=audio_url,
+        )
+        ai_msg = await self._save_message(
+            session_id=session_id,
+            role=MessageRole.ASSISTANT.value,
+            content=pipeline.text,
+            tts_audio_url=tts_url,
+        )
+        await self._commit()
+
+        yield "done", {
+            "user_message_id": user_msg.id,
+            "message_id": ai_msg.id,
+            "full_content": pipeline.text,
+            "tts_audio_url": tts_url,
+        }
+
+    async def process_voice_message_stream(
+        self,
+        session_id: str,
+        audio_file: AudioUpload,
+        audio_content: bytes,
+        inline_audio: bool = False,
+        timings: bool = False,
+    ) -> AsyncGenerator[bytes, None]:
+        """
+        Process a voice message and stream the reply via SSE:
+
+        1. ``transcript`` as soon as Whisper returns
+        2. ``token`` frames while the answer is generated
+        3. ``audio`` per sentence once its TTS segment (and every earlier
+           one) is ready: a segment URL, or base64 ``data`` with ``inline_audio``
+        4. ``done`` with the message ids and the stitched TTS file URL (and,
+           with ``timings``, the stage breakdown so far)
+
+        Failures save the same fallback messages as ``process_voice_message``
+        and end the stream with an ``error`` event.
+        """
+        digest = audio_digest(audio_content)
+        upload, filename = self._start_upload(audio_file, audio_content, digest)
+
+        try:
+            transcript = await self._transcribe(audio_content, filename, digest)
+        except Exception as e:
+            logger.error(f"STT failed for session {session_id}: {type(e).__name__}: {str(e)}", exc_info=True)
+            self.trace.outcome = "stt_failed"
+            ai_msg = await self.save_stt_failure(session_id, await upload)
+            yield encode_event(
+                "error",
+                {"error": str(e), "fallback_message": ai_msg.content, "message_id": ai_msg.id},
+            )
+            return
+
+        yield encode_event("transcript", {"content": transcript})
+        audio_url = await upload
+
+        async for event, data in self.stream_answer(session_id, transcript, audio_url):
+            if event == "token":
+                yield encode_token(data)
+            elif event == "audio":
+                yield await self._segment_event(data, inline_audio)
+            elif event == "done" and timings:
+                yield encode_event(event, {**data, "timings": self.trace.breakdown()})
+            else:
+                yield encode_event(event, data)
+
+
+async def prerender_fallback_speech() -> int:
+    """Synthesize every fallback reply ahead of time, so failed turns still get audio."""
+    from app.services.chat_service import FALLBACK_MESSAGES as CHAT_FALLBACK_MESSAGES
+
+    texts = dict.fromkeys([*FALLBACK_MESSAGES.values(), *CHAT_FALLBACK_MESSAGES.values()])
+    return await tts_cache.prerender(
+        texts,
+        openai_client.tts_voice,
+        openai_client.tts_model,
+        lambda text: openai_client.text_to_speech(text, priority=Priority.BULK),
+    )
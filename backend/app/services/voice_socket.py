@@ -0,0 +1,230 @@
+"""
+Full-duplex voice conversations over a WebSocket.
+
+Client -> server:
+
+- binary frames: 16-bit little-endian mono PCM (``sample_rate`` Hz)
+- ``{"type": "start", "sample_rate": 16000}``: optional, before a turn's audio;
+  the rate must be an integer from 8000 to 48000 Hz, otherwise the turn's
+  audio is dropped until the next ``end``
+- ``{"type": "end"}``: the user stopped talking; answer the turn
+- ``{"type": "cancel"}``: stop the answer in progress (barge-in)
+
+Server -> client (JSON text frames, plus one binary frame per ``audio``):
+
+- ``{"type": "transcript", "index": i, "content": ..., "final": false}`` as
+  each speech segment is transcribed, then ``"final": true`` with the turn
+- ``{"type": "token", "content": ...}`` while the answer is generated
+- ``{"type": "audio", "index", "text", "content_type"}`` followed by a
+  binary frame with that sentence's speech
+- ``audio_error``, ``error`` and ``done`` as in the SSE endpoint
+
+Audio keeps flowing while an answer streams, so the next turn is being
+transcribed before the current answer has finished playing.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from app.config import settings
+from app.database.connection import session_scope
+from app.integrations.openai_client import openai_client
+from app.services.audio_formats import TTS_FORMATS
+from app.services.audio_store import audio_store
+from app.services.transcription import StreamingTranscriber, pcm_to_wav
+from app.services.voice_service import VoiceService
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 48000
+
+voice_ws_connections = metrics.gauge(
+    "voice_ws_connections",
+    "Open voice WebSocket connections",
+)
+voice_ws_turns = metrics.counter(
+    "voice_ws_turns_total",
+    "Voice WebSocket turns by outcome",
+    ["outcome"],
+)
+
+
+class VoiceSocket:
+    """One voice WebSocket connection to a chat session."""
+
+    open_connections = 0
+
+    def __init__(self, websocket: WebSocket, session_id: str):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.sample_rate = settings.VOICE_WS_SAMPLE_RATE
+        self._send_lock = asyncio.Lock()
+        self._transcriber: Optional[StreamingTranscriber] = None
+        self._turn: Optional[asyncio.Task] = None
+        self._discarding = False
+
+    async def send(self, message: Dict[str, Any], audio: Optional[bytes] = None) -> None:
+        """Send a JSON message (and its binary audio frame) without interleaving."""
+        async with self._send_lock:
+            await self.websocket.send_text(json.dumps(message))
+            if audio is not None:
+                await self.websocket.send_bytes(audio)
+
+    async def _partial_transcript(self, index: int, text: str) -> None:
+        await self.send({"type": "transcript", "index": index, "content": text, "final": False})
+
+    def _transcriber_for_turn(self) -> StreamingTranscriber:
+        if self._transcriber is None:
+            self._transcriber = StreamingTranscriber(
+                openai_client.speech_to_text,
+                sample_rate=self.sample_rate,
+                on_segment=self._partial_transcript,
+            )
+            self._discarding = False
+        return self._transcriber
+
+    async def _on_audio(self, pcm: bytes) -> None:
+        if self._discarding:
+            return
+        transcriber = self._transcriber_for_turn()
+        transcriber.feed(pcm)
+        if transcriber.duration > settings.MAX_AUDIO_DURATION:
+            # Drop the rest of this turn instead of paying to transcribe it
+            transcriber.cancel()
+            self._transcriber = None
+            self._discarding = True
+            voice_ws_turns.inc(outcome="too_long")
+            await self.send({
+                "type": "error",
+                "error": f"Audio too long (max {settings.MAX_AUDIO_DURATION} seconds)",
+            })
+
+    async def _on_message(self, message: Dict[str, Any]) -> None:
+        kind = message.get("type")
+        if kind == "start":
+            if self._transcriber is None:
+                rate = message.get("sample_rate", settings.VOICE_WS_SAMPLE_RATE)
+                if isinstance(rate, bool) or not isinstance(rate, int) or not (
+                    MIN_SAMPLE_RATE <= rate <= MAX_SAMPLE_RATE
+                ):
+                    # Ignore this turn's audio rather than segment it at a bogus rate
+                    self._discarding = True
+                    await self.send({
+                        "type": "error",
+                        "error": f"sample_rate must be an integer from {MIN_SAMPLE_RATE} to {MAX_SAMPLE_RATE}",
+                    })
+                    return
+                self.sample_rate = rate
+                self._discarding = False
+        elif kind == "end":
+            self._discarding = False
+            transcriber, self._transcriber = self._transcriber, None
+            if transcriber is not None:
+                self._turn = asyncio.ensure_future(self._answer_turn(transcriber, self._turn))
+        elif kind == "cancel":
+            if self._turn is not None:
+                self._turn.cancel()
+        else:
+            await self.send({"type": "error", "error": f"Unknown message type: {kind!r}"})
+
+    async def _answer_turn(
+        self, transcriber: StreamingTranscriber, previous: Optional[asyncio.Task]
+    ) -> None:
+        if not transcriber.close():
+            voice_ws_turns.inc(outcome="no_speech")
+            await self.send({"type": "transcript", "content": "", "final": True})
+            return
+
+        # Persist the user's audio while the last segment is transcribed
+        upload = asyncio.ensure_future(
+            audio_store.save(pcm_to_wav(bytes(transcriber.audio), transcriber.sample_rate), "uploads", "wav")
+        )
+        try:
+            try:
+                transcript = await transcriber.finish()
+            except Exception as e:
+                logger.error(f"STT failed for session {self.session_id}: {type(e).__name__}: {str(e)}")
+                async with session_scope() as db:
+                    ai_msg = await VoiceService(db).save_stt_failure(self.session_id, await upload)
+                voice_ws_turns.inc(outcome="stt_failed")
+                await self.send({
+                    "type": "error",
+                    "error": str(e),
+                    "fallback_message": ai_msg.content,
+                    "message_id": ai_msg.id,
+                })
+                return
+
+            if previous is not None:
+                # Answers are spoken in order: wait for the previous turn
+                await asyncio.gather(previous, return_exceptions=True)
+
+            await self.send({"type": "transcript", "content": transcript, "final": True})
+            if not transcript:
+                # Speech-like noise that STT found no words in
+                voice_ws_turns.inc(outcome="no_speech")
+                return
+
+            audio_url = await upload
+            async with session_scope() as db:
+                service = VoiceService(db)
+                async for event, data in service.stream_answer(self.session_id, transcript, audio_url):
+                    if event == "token":
+                        await self.send({"type": "token", "content": data})
+                    elif event == "audio":
+                        await self.send(
+                            {
+                                "type": "audio",
+                                "index": data.index,
+                                "text": data.text,
+                                "content_type": TTS_FORMATS[service.audio_format][1],
+                            },
+                            data.audio,
+                        )
+                    else:
+                        await self.send({"type": event, **data})
+            voice_ws_turns.inc(outcome="answered")
+        except asyncio.CancelledError:
+            transcriber.cancel()
+            voice_ws_turns.inc(outcome="cancelled")
+            raise
+        finally:
+            if not upload.done():
+                await asyncio.shield(upload)
+
+    async def run(self) -> None:
+        """Serve the connection until the client disconnects."""
+        VoiceSocket.open_connections += 1
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                if message.get("bytes") is not None:
+                    await self._on_audio(message["bytes"])
+                elif message.get("text") is not None:
+                    try:
+                        payload = json.loads(message["text"])
+                    except ValueError:
+                        payload = None
+                    if not isinstance(payload, dict):
+                        await self.send({"type": "error", "error": "Messages must be JSON objects"})
+                        continue
+                    await self._on_message(payload)
+        except WebSocketDisconnect:
+            return
+        finally:
+            VoiceSocket.open_connections -= 1
+            if self._transcriber is not None:
+                self._transcriber.cancel()
+            if self._turn is not None:
+                self._turn.cancel()
+
+
+voice_ws_connections.set_function(lambda: {(): VoiceSocket.open_connections})
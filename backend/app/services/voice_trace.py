@@ -0,0 +1,173 @@
+"""
+Per-stage timing of voice requests.
+
+Each voice request carries a ``VoiceTrace``; the pipeline wraps every stage
+(upload write, STT, history read, chat completion, TTS, stored speech and
+database writes) in a span. Spans feed the ``voice_stage_*`` histograms,
+the trace is logged as one line when the request ends, and callers can
+return the breakdown to the client as a ``Server-Timing`` header.
+
+Stages overlap (the upload is written during STT, sentences are spoken
+while the answer is generated), so the breakdown gives each stage's start
+offset as well as its duration.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from app.integrations.instrumentation import CALL_BUCKETS
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+VOICE_STAGES = ("upload_write", "stt", "history", "chat", "tts", "tts_store", "db_write")
+
+voice_stage_duration = metrics.histogram(
+    "voice_stage_duration_seconds",
+    "Duration of each voice pipeline stage",
+    ["stage", "outcome"],
+    buckets=(0.005, 0.01, 0.025) + CALL_BUCKETS,
+)
+voice_stage_bytes = metrics.histogram(
+    "voice_stage_bytes",
+    "Audio bytes handled by a voice pipeline stage",
+    ["stage"],
+    buckets=(1024, 8192, 32768, 131072, 524288, 1048576, 2097152, 5242880),
+)
+voice_stage_tokens = metrics.histogram(
+    "voice_stage_tokens",
+    "Tokens streamed by a voice pipeline stage",
+    ["stage"],
+    buckets=(10, 25, 50, 100, 200, 400, 800, 1600),
+)
+voice_stages_in_flight = metrics.gauge(
+    "voice_stages_in_flight",
+    "Voice pipeline stages running right now",
+    ["stage"],
+)
+voice_request_duration = metrics.histogram(
+    "voice_request_duration_seconds",
+    "End-to-end duration of voice requests",
+    ["outcome"],
+    buckets=CALL_BUCKETS,
+)
+
+
+@dataclass
+class StageSpan:
+    """One run of a pipeline stage."""
+
+    stage: str
+    started: float
+    finished: Optional[float] = None
+    bytes: int = 0
+    tokens: int = 0
+    outcome: str = "ok"
+
+    @property
+    def duration(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+
+class VoiceTrace:
+    """Stage spans of one voice request."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+        self.spans: List[StageSpan] = []
+        self.outcome = "ok"
+
+    @asynccontextmanager
+    async def span(self, stage: str, size: int = 0) -> AsyncIterator[StageSpan]:
+        """Time a stage; set ``bytes`` / ``tokens`` on the yielded span as they are known."""
+        span = StageSpan(stage, time.monotonic(), bytes=size)
+        self.spans.append(span)
+        voice_stages_in_flight.inc(stage=stage)
+        try:
+            yield span
+        except (asyncio.CancelledError, GeneratorExit):
+            span.outcome = "cancelled"
+            raise
+        except BaseException:
+            span.outcome = "error"
+            raise
+        finally:
+            span.finished = time.monotonic()
+            voice_stages_in_flight.dec(stage=stage)
+            voice_stage_duration.observe(span.duration, stage=stage, outcome=span.outcome)
+            if span.bytes:
+                voice_stage_bytes.observe(span.bytes, stage=stage)
+            if span.tokens:
+                voice_stage_tokens.observe(span.tokens, stage=stage)
+
+    def breakdown(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Per stage: start offset and wall time (first start to last end, in
+        ms), number of spans, and total bytes and tokens.
+        """
+        stages: Dict[str, Dict[str, Any]] = {}
+        for stage in VOICE_STAGES:
+            spans = [span for span in self.spans if span.stage == stage]
+            if not spans:
+                continue
+            first = min(span.started for span in spans)
+            last = max(span.started + span.duration for span in spans)
+            stages[stage] = {
+                "start_ms": round((first - self.started) * 1000, 1),
+                "duration_ms": round((last - first) * 1000, 1),
+                "count": len(spans),
+                "bytes": sum(span.bytes for span in spans),
+                "tokens": sum(span.tokens for span in spans),
+            }
+        return stages
+
+    @property
+    def duration(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    def server_timing(self) -> str:
+        """The breakdown as a ``Server-Timing`` header value (durations in ms)."""
+        entries = []
+        for stage, timing in self.breakdown().items():
+            desc = f"start={timing['start_ms']}ms n={timing['count']}"
+            if timing["bytes"]:
+                desc += f" bytes={timing['bytes']}"
+            if timing["tokens"]:
+                desc += f" tokens={timing['tokens']}"
+            entries.append(f'{stage};dur={timing["duration_ms"]};desc="{desc}"')
+        entries.append(f"total;dur={round(self.duration * 1000, 1)}")
+        return ", ".join(entries)
+
+    def describe(self) -> str:
+        parts = [f"outcome={self.outcome}", f"total={self.duration:.2f}s"]
+        for stage, timing in self.breakdown().items():
+            part = f"{stage}={timing['duration_ms'] / 1000:.2f}s"
+            if timing["count"] > 1:
+                part += f"x{timing['count']}"
+            if timing["bytes"]:
+                part += f"/{timing['bytes']}B"
+            if timing["tokens"]:
+                part += f"/{timing['tokens']}tok"
+            parts.append(part)
+        return " ".join(parts)
+
+    def __enter__(self) -> "VoiceTrace":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.finish("error" if exc_type is not None else None)
+
+    def finish(self, outcome: Optional[str] = None) -> None:
+        """End the request: record its total duration and log the breakdown."""
+        if self.finished is not None:
+            return
+        self.finished = time.monotonic()
+        if outcome is not None:
+            self.outcome = outcome
+        voice_request_duration.observe(self.duration, outcome=self.outcome)
+        logger.info(f"Voice request: {self.describe()}")
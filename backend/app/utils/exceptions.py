@@ -31,6 +31,16 @@ class AudioTooLargeError(HTTPException):
         )
 
 
+class AudioTooLongError(HTTPException):
+    """Raised when audio is longer than the allowed duration."""
+
+    def __init__(self, max_seconds: int):
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Audio too long (max {max_seconds} seconds)",
+        )
+
+
 class TranscriptionFailedError(HTTPException):
     """Raised when audio transcription fails."""
 
@@ -0,0 +1,226 @@
+"""
+Async load generator for the chat SSE endpoint.
+
+Creates an agent and one session per concurrent stream, then keeps
+``--concurrency`` streams open against ``POST /sessions/{id}/messages``
+until ``--requests`` messages have been answered. Reports time to first
+token, stream duration and throughput percentiles, plus the server's CPU
+and memory usage scraped from ``/api/metrics``.
+
+Run the backend against the mock server, then:
+
+    python -m loadtest.load_generator --base-url http://localhost:8000/api \\
+        --concurrency 50 --requests 500
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+
+PROCESS_METRICS = re.compile(
+    r"^(process_cpu_seconds_total|process_resident_memory_bytes) ([0-9.e+]+)$", re.M
+)
+
+
+@dataclass
+class StreamResult:
+    """Timings of one SSE response."""
+
+    ok: bool
+    ttft: Optional[float] = None
+    duration: float = 0.0
+    frames: int = 0
+    chars: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class ServerSample:
+    cpu_seconds: float
+    memory_bytes: float
+
+
+@dataclass
+class LoadReport:
+    results: List[StreamResult] = field(default_factory=list)
+    samples: List[ServerSample] = field(default_factory=list)
+    elapsed: float = 0.0
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile (``q`` in 0..100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def _setup(client: httpx.AsyncClient, sessions: int) -> List[str]:
+    response = await client.post(
+        "/agents",
+        json={"name": "Load test agent", "system_prompt": "You are a helpful assistant."},
+    )
+    response.raise_for_status()
+    agent_id = response.json()["id"]
+
+    session_ids = []
+    for i in range(sessions):
+        response = await client.post(f"/agents/{agent_id}/sessions", json={"title": f"load {i}"})
+        response.raise_for_status()
+        session_ids.append(response.json()["id"])
+    return session_ids
+
+
+async def run_stream(client: httpx.AsyncClient, session_id: str, content: str) -> StreamResult:
+    """Send one message and time its SSE response."""
+    started = time.perf_counter()
+    result = StreamResult(ok=False)
+    event = None
+    try:
+        async with client.stream(
+            "POST", f"/sessions/{session_id}/messages", json={"content": content}
+        ) as response:
+            if response.status_code != 200:
+                result.error = f"HTTP {response.status_code}"
+                return result
+            async for line in response.aiter_lines():
+                if line.startswith("event: "):
+                    event = line[7:]
+                elif line.startswith("data: ") and event == "token":
+                    if result.ttft is None:
+                        result.ttft = time.perf_counter() - started
+                    result.frames += 1
+                    result.chars += len(json.loads(line[6:]).get("content", ""))
+                elif line.startswith("data: ") and event == "error":
+                    result.error = json.loads(line[6:]).get("error", "error event")
+                elif line.startswith("data: ") and event == "done":
+                    result.ok = True
+    except httpx.HTTPError as e:
+        result.error = f"{type(e).__name__}: {e}"
+    finally:
+        result.duration = time.perf_counter() - started
+    return result
+
+
+async def sample_server(client: httpx.AsyncClient) -> Optional[ServerSample]:
+    """Read process CPU and memory from the backend's metrics endpoint."""
+    try:
+        response = await client.get("/metrics")
+        response.raise_for_status()
+    except httpx.HTTPError:
+        return None
+    values: Dict[str, float] = {
+        name: float(value) for name, value in PROCESS_METRICS.findall(response.text)
+    }
+    if len(values) < 2:
+        return None
+    return ServerSample(values["process_cpu_seconds_total"], values["process_resident_memory_bytes"])
+
+
+async def run_load(
+    base_url: str,
+    concurrency: int,
+    requests: int,
+    content: str,
+    sample_interval: float = 1.0,
+) -> LoadReport:
+    """Keep ``concurrency`` streams open until ``requests`` have completed."""
+    limits = httpx.Limits(max_connections=concurrency + 2, max_keepalive_connections=concurrency + 2)
+    timeout = httpx.Timeout(120.0, connect=10.0)
+    report = LoadReport()
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        session_ids = await _setup(client, concurrency)
+        remaining = iter(range(requests))
+
+        async def worker(session_id: str) -> None:
+            for _ in remaining:
+                report.results.append(await run_stream(client, session_id, content))
+
+        async def sampler() -> None:
+            while True:
+                sample = await sample_server(client)
+                if sample is not None:
+                    report.samples.append(sample)
+                await asyncio.sleep(sample_interval)
+
+        sampling = asyncio.create_task(sampler())
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(worker(session_id) for session_id in session_ids))
+        finally:
+            report.elapsed = time.perf_counter() - started
+            sampling.cancel()
+        final = await sample_server(client)
+        if final is not None:
+            report.samples.append(final)
+
+    return report
+
+
+def format_report(report: LoadReport) -> str:
+    ok = [r for r in report.results if r.ok]
+    failed = len(report.results) - len(ok)
+    ttfts = [r.ttft for r in ok if r.ttft is not None]
+    durations = [r.duration for r in ok]
+    rates = [r.chars / r.duration for r in ok if r.duration > 0]
+
+    def row(name: str, values: List[float], unit: str, scale: float = 1.0) -> str:
+        cells = "  ".join(
+            f"p{q}={percentile(values, q) * scale:.1f}{unit}" for q in (50, 90, 95, 99)
+        )
+        return f"{name:<18}{cells}"
+
+    lines = [
+        f"requests: {len(report.results)}  ok: {len(ok)}  failed: {failed}  "
+        f"elapsed: {report.elapsed:.1f}s  "
+        f"throughput: {len(ok) / max(report.elapsed, 1e-9):.1f} req/s, "
+        f"{sum(r.chars for r in ok) / max(report.elapsed, 1e-9):.0f} chars/s",
+        row("ttft", ttfts, "ms", 1000),
+        row("stream duration", durations, "ms", 1000),
+        row("per-stream rate", rates, " chars/s"),
+    ]
+
+    if len(report.samples) >= 2:
+        first, last = report.samples[0], report.samples[-1]
+        cpu = (last.cpu_seconds - first.cpu_seconds) / max(report.elapsed, 1e-9)
+        peak = max(s.memory_bytes for s in report.samples)
+        lines.append(
+            f"server cpu: {cpu * 100:.0f}% of one core  "
+            f"rss: {last.memory_bytes / 2**20:.0f} MiB (peak {peak / 2**20:.0f} MiB)"
+        )
+
+    errors: Dict[str, int] = {}
+    for r in report.results:
+        if r.error:
+            errors[r.error] = errors.get(r.error, 0) + 1
+    for error, count in sorted(errors.items(), key=lambda item: -item[1])[:5]:
+        lines.append(f"error x{count}: {error}")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SSE load generator for the chat endpoint")
+    parser.add_argument("--base-url", default="http://localhost:8000/api")
+    parser.add_argument("--concurrency", type=int, default=10, help="concurrent SSE streams")
+    parser.add_argument("--requests", type=int, default=100, help="total messages to send")
+    parser.add_argument("--content", default="Tell me about streaming responses.")
+    parser.add_argument("--sample-interval", type=float, default=1.0)
+    args = parser.parse_args()
+
+    report = asyncio.run(
+        run_load(args.base_url, args.concurrency, args.requests, args.content, args.sample_interval)
+    )
+    print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+Local stand-in for the OpenAI endpoints the platform calls.
+
+Implements chat completions (streaming and non-streaming), embeddings,
+transcriptions and speech with configurable latency, token rate, payload
+sizes and error injection, so the backend can be load-tested without
+spending tokens. Point the backend at it with
+``OPENAI_BASE_URL=http://localhost:9000/v1``.
+
+Run with:
+
+    python -m loadtest.mock_openai --port 9000 --ttft-ms 300 --tokens-per-second 50
+
+Settings can also be changed at runtime with ``PUT /mock/config``.
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import time
+from dataclasses import asdict, dataclass, fields
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+from uuid import uuid4
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+WORDS = (
+    "the quick brown fox jumps over the lazy dog while an assistant explains "
+    "how streaming responses arrive token by token to the waiting client"
+).split()
+
+
+@dataclass
+class MockConfig:
+    """Behaviour of the mock server."""
+
+    ttft_ms: float = 300.0  # delay before the first chat token
+    tokens_per_second: float = 50.0
+    completion_tokens: int = 200
+    jitter: float = 0.1  # +/- fraction applied to every delay
+    embedding_dimensions: int = 1536
+    embedding_latency_ms: float = 50.0
+    transcription_latency_ms: float = 500.0
+    transcript_words: int = 30
+    speech_latency_ms: float = 400.0
+    speech_bytes: int = 32_000
+    error_rate: float = 0.0  # fraction of requests answered with error_status
+    error_status: int = 500
+    rate_limit_requests: int = 10_000  # reported in x-ratelimit-* headers
+    rate_limit_tokens: int = 10_000_000
+
+
+config = MockConfig()
+app = FastAPI(title="Mock OpenAI")
+
+
+def _delay(ms: float) -> float:
+    seconds = ms / 1000
+    return max(0.0, seconds * (1 + random.uniform(-config.jitter, config.jitter)))
+
+
+def _headers() -> Dict[str, str]:
+    return {
+        "x-ratelimit-limit-requests": str(config.rate_limit_requests),
+        "x-ratelimit-remaining-requests": str(config.rate_limit_requests - 1),
+        "x-ratelimit-limit-tokens": str(config.rate_limit_tokens),
+        "x-ratelimit-remaining-tokens": str(config.rate_limit_tokens - 1),
+    }
+
+
+def _injected_error() -> Optional[JSONResponse]:
+    if config.error_rate <= 0 or random.random() >= config.error_rate:
+        return None
+    headers = _headers()
+    if config.error_status == 429:
+        headers["retry-after"] = "1"
+    return JSONResponse(
+        {
+            "error": {
+                "message": "Injected error from mock server",
+                "type": "server_error" if config.error_status >= 500 else "invalid_request_error",
+                "code": None,
+            }
+        },
+        status_code=config.error_status,
+        headers=headers,
+    )
+
+
+def _completion_words(count: int) -> List[str]:
+    return [WORDS[i % len(WORDS)] + " " for i in range(count)]
+
+
+_seen_prefixes = set()
+
+
+def _cached_tokens(messages: List[Dict[str, Any]]) -> int:
+    """Mimic provider prompt caching: repeated 1024+ token system prompts, in 128-token steps."""
+    if not messages or messages[0].get("role") != "system":
+        return 0
+    prefix = str(messages[0].get("content", ""))
+    tokens = len(prefix) // 4
+    key = hashlib.sha256(prefix.encode()).digest()
+    if key not in _seen_prefixes:
+        _seen_prefixes.add(key)
+        return 0
+    return tokens // 128 * 128 if tokens >= 1024 else 0
+
+
+def _usage(prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> Dict[str, Any]:
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": cached_tokens},
+    }
+
+
+def _prompt_tokens(messages: List[Dict[str, Any]]) -> int:
+    return sum(len(str(m.get("content", ""))) for m in messages) // 4 + 1
+
+
+@app.head("/v1")
+@app.head("/v1/")
+async def warm() -> Response:
+    return Response(status_code=200)
+
+
+@app.get("/mock/config")
+async def get_config() -> Dict[str, Any]:
+    return asdict(config)
+
+
+@app.put("/mock/config")
+async def update_config(changes: Dict[str, Any]) -> Dict[str, Any]:
+    """Update settings at runtime, e.g. ``{"error_rate": 0.2}``."""
+    known = {f.name for f in fields(MockConfig)}
+    for name, value in changes.items():
+        if name in known:
+            setattr(config, name, type(getattr(config, name))(value))
+    return asdict(config)
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request) -> Response:
+    body = await request.json()
+    error = _injected_error()
+    if error is not None:
+        return error
+
+    model = body.get("model", "gpt-4o-mini")
+    prompt_tokens = _prompt_tokens(body.get("messages", []))
+    cached_tokens = _cached_tokens(body.get("messages", []))
+    words = _completion_words(int(body.get("max_tokens") or config.completion_tokens))
+    completion_id = f"chatcmpl-{uuid4().hex}"
+    created = int(time.time())
+
+    if not body.get("stream"):
+        # Answer after the whole completion would have been generated
+        await asyncio.sleep(
+            _delay(config.ttft_ms) + len(words) / max(config.tokens_per_second, 1e-6)
+        )
+        return JSONResponse(
+            {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "".join(words).strip()},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": _usage(prompt_tokens, len(words), cached_tokens),
+            },
+            headers=_headers(),
+        )
+
+    include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+    def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, usage=None) -> bytes:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            if delta is not None
+            else [],
+        }
+        if usage is not None:
+            payload["usage"] = usage
+        return f"data: {json.dumps(payload)}\n\n".encode()
+
+    async def stream() -> AsyncIterator[bytes]:
+        await asyncio.sleep(_delay(config.ttft_ms))
+        yield chunk({"role": "assistant", "content": ""})
+        interval = 1 / max(config.tokens_per_second, 1e-6)
+        next_at = time.monotonic()
+        for word in words:
+            next_at += interval
+            pause = next_at - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            yield chunk({"content": word})
+        yield chunk({}, finish_reason="stop")
+        if include_usage:
+            yield chunk(None, usage=_usage(prompt_tokens, len(words), cached_tokens))
+        yield b"data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=_headers())
+
+
+def _embedding(text: str, encoding_format: str) -> Union[List[float], str]:
+    # Deterministic per text, so identical inputs get identical vectors
+    seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "big")
+    vector = np.random.default_rng(seed).standard_normal(config.embedding_dimensions)
+    vector = (vector / np.linalg.norm(vector)).astype(np.float32)
+    if encoding_format == "base64":
+        # The SDK asks for base64-packed float32 by default
+        return base64.b64encode(vector.tobytes()).decode()
+    return vector.tolist()
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request) -> Response:
+    body = await request.json()
+    error = _injected_error()
+    if error is not None:
+        return error
+
+    texts = body.get("input", [])
+    encoding = body.get("encoding_format", "float")
+    if isinstance(texts, str):
+        texts = [texts]
+    await asyncio.sleep(_delay(config.embedding_latency_ms))
+    tokens = sum(len(text) for text in texts) // 4 + 1
+    return JSONResponse(
+        {
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": i, "embedding": _embedding(text, encoding)}
+                for i, text in enumerate(texts)
+            ],
+            "model": body.get("model", "text-embedding-3-small"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        },
+        headers=_headers(),
+    )
+
+
+@app.post("/v1/audio/transcriptions")
+async def transcriptions(request: Request) -> Response:
+    form = await request.form()
+    upload = form.get("file")
+    if upload is not None:
+        await upload.read()
+    error = _injected_error()
+    if error is not None:
+        return error
+
+    await asyncio.sleep(_delay(config.transcription_latency_ms))
+    text = "".join(_completion_words(config.transcript_words)).strip()
+    return JSONResponse({"text": text}, headers=_headers())
+
+
+@app.post("/v1/audio/speech")
+async def speech(request: Request) -> Response:
+    body = await request.json()
+    error = _injected_error()
+    if error is not None:
+        return error
+
+    await asyncio.sleep(_delay(config.speech_latency_ms))
+    media_types = {"opus": "audio/ogg", "aac": "audio/aac", "wav": "audio/wav"}
+    fmt = body.get("response_format", "mp3")
+    return Response(
+        content=random.randbytes(config.speech_bytes),
+        media_type=media_types.get(fmt, "audio/mpeg"),
+        headers=_headers(),
+    )
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Mock OpenAI server for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    for f in fields(MockConfig):
+        parser.add_argument(
+            f"--{f.name.replace('_', '-')}", type=type(f.default), default=f.default
+        )
+    args = parser.parse_args()
+
+    for f in fields(MockConfig):
+        setattr(config, f.name, getattr(args, f.name))
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
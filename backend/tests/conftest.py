@@ -3,6 +3,7 @@ Pytest configuration and fixtures for API testing.
 """
 import asyncio
 from typing import AsyncGenerator
+from unittest.mock import patch
 from uuid import uuid4
 
 import pytest
@@ -16,6 +17,7 @@ from app.models.base import Base
 from app.models.agent import Agent
 from app.models.session import Session
 from app.models.message import Message, MessageType, MessageRole
+from app.services.stt_cache import stt_cache
 
 # Test database URL (in-memory SQLite)
 TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
@@ -41,6 +43,14 @@ def event_loop():
     loop.close()
 
 
+@pytest.fixture(autouse=True)
+def clear_stt_cache():
+    """Transcripts are cached by audio content; don't let them leak between tests."""
+    stt_cache.clear()
+    yield
+    stt_cache.clear()
+
+
 @pytest_asyncio.fixture
 async def db_session() -> AsyncGenerator[AsyncSession, None]:
     """Create a fresh test database session for each test."""
@@ -66,11 +76,13 @@ async def client(db_session: AsyncSession) -> AsyncGenerator[AsyncClient, None]:
 
     app.dependency_overrides[get_db] = override_get_db
 
-    async with AsyncClient(
-        transport=ASGITransport(app=app),
-        base_url="http://test",
-    ) as client:
-        yield client
+    # Sessions opened outside the request (background generations) use the test DB too
+    with patch("app.database.connection.async_session_maker", test_async_session_maker):
+        async with AsyncClient(
+            transport=ASGITransport(app=app),
+            base_url="http://test",
+        ) as client:
+            yield client
 
     app.dependency_overrides.clear()
 
@@ -10,8 +10,12 @@ Endpoints tested:
 """
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 
+from app.database.connection import add_missing_columns
 from app.models.agent import Agent
+from app.models.base import Base
 from app.models.session import Session
 
 
@@ -246,6 +250,34 @@ class TestUpdateAgent:
         assert data["name"] == sample_agent.name  # Unchanged
         assert data["system_prompt"] == "New prompt only."
 
+    @pytest.mark.asyncio
+    async def test_update_agent_model_policy(self, client: AsyncClient, sample_agent: Agent):
+        """Test pinning an agent to a model tier."""
+        response = await client.put(
+            f"/api/agents/{sample_agent.id}", json={"model_policy": "fast"}
+        )
+
+        assert response.status_code == 200
+        assert response.json()["model_policy"] == "fast"
+
+        response = await client.put(
+            f"/api/agents/{sample_agent.id}", json={"model_policy": "fastest"}
+        )
+        assert response.status_code == 422
+
+    @pytest.mark.asyncio
+    async def test_update_agent_tts_format(self, client: AsyncClient, sample_agent: Agent):
+        """Test choosing a compressed TTS format for an agent."""
+        assert (await client.get(f"/api/agents/{sample_agent.id}")).json()["tts_format"] == "mp3"
+
+        response = await client.put(f"/api/agents/{sample_agent.id}", json={"tts_format": "opus"})
+
+        assert response.status_code == 200
+        assert response.json()["tts_format"] == "opus"
+
+        response = await client.put(f"/api/agents/{sample_agent.id}", json={"tts_format": "flac"})
+        assert response.status_code == 422
+
     @pytest.mark.asyncio
     async def test_update_agent_not_found(self, client: AsyncClient):
         """Test updating a non-existent agent."""
@@ -318,3 +350,30 @@ class TestDeleteAgent:
         for session in sessions:
             session_response = await client.get(f"/api/sessions/{session.id}")
             assert session_response.status_code == 404
+
+
+class TestAgentSchemaUpgrade:
+    """Test suite for upgrading an agents table created by an older release."""
+
+    @pytest.mark.asyncio
+    async def test_new_columns_are_added_with_defaults(self):
+        """Test that existing agents load after the missing columns are added, twice over."""
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        async with engine.begin() as conn:
+            await conn.execute(text(
+                "CREATE TABLE agents (id VARCHAR(36) PRIMARY KEY, name VARCHAR(100) NOT NULL, "
+                "system_prompt TEXT NOT NULL, created_at DATETIME, updated_at DATETIME)"
+            ))
+            await conn.execute(text("INSERT INTO agents (id, name, system_prompt) VALUES ('old', 'Old', 'Hi')"))
+            # What init_db does: create the other tables, then upgrade (idempotently)
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(add_missing_columns)
+            await conn.run_sync(add_missing_columns)
+
+        async with AsyncSession(engine) as db:
+            agent = (await db.execute(select(Agent))).scalar_one()
+        await engine.dispose()
+
+        assert agent.response_cache_enabled is False
+        assert agent.model_policy == "auto"
+        assert agent.tts_format == "mp3"
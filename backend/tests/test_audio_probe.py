@@ -0,0 +1,78 @@
+"""
+Tests for container sniffing and header-only duration probing.
+"""
+import struct
+
+import pytest
+
+from app.services.audio_probe import probe_duration, sniff_format
+from app.services.transcription import pcm_to_wav
+
+
+def mp3_frame(payload: bytes = b"") -> bytes:
+    """A 128 kbps 44.1 kHz stereo MPEG-1 layer III frame (417 bytes)."""
+    header = bytes([0xFF, 0xFB, 0x90, 0x00])
+    return (header + payload).ljust(417, b"\x00")
+
+
+def ebml(element: int, body: bytes) -> bytes:
+    """An EBML element with an 8-byte size."""
+    element_id = element.to_bytes((element.bit_length() + 7) // 8, "big")
+    return element_id + (0x01 << 56 | len(body)).to_bytes(8, "big") + body
+
+
+def webm(*segment_children: bytes) -> bytes:
+    header = ebml(0x1A45DFA3, ebml(0x4282, b"webm"))
+    # MediaRecorder writes the segment with an unknown size
+    return header + bytes.fromhex("18538067") + b"\x01\xff\xff\xff\xff\xff\xff\xff" + b"".join(segment_children)
+
+
+def cluster(timecode: int, *block_timecodes: int) -> bytes:
+    blocks = b"".join(
+        ebml(0xA3, b"\x81" + struct.pack(">h", relative) + b"\x80opus") for relative in block_timecodes
+    )
+    return ebml(0x1F43B675, ebml(0xE7, timecode.to_bytes(2, "big")) + blocks)
+
+
+class TestProbeDuration:
+    """Test suite for probe_duration and sniff_format."""
+
+    def test_wav_duration_from_header(self):
+        """Test that WAV duration comes from the byte rate and data size."""
+        wav = pcm_to_wav(b"\x00\x00" * 16000 * 3, 16000)
+
+        assert sniff_format(wav) == "wav"
+        assert probe_duration(wav) == pytest.approx(3.0)
+        # The header alone is enough
+        assert probe_duration(wav[:64], complete=False) == pytest.approx(3.0)
+
+    def test_mp3_cbr_and_xing(self):
+        """Test CBR MP3 estimated from size, and VBR from its Xing frame count."""
+        cbr = b"ID3\x03\x00\x00\x00\x00\x00\x00" + mp3_frame() * 100
+
+        assert sniff_format(cbr) == "mp3"
+        assert probe_duration(cbr) == pytest.approx(100 * 417 * 8 / 128000)
+        assert probe_duration(cbr[:4096], complete=False) is None
+
+        xing = mp3_frame(b"\x00" * 32 + b"Xing" + struct.pack(">II", 1, 5000))
+        assert probe_duration(xing, complete=False) == pytest.approx(5000 * 1152 / 44100)
+
+    def test_webm_declared_duration(self):
+        """Test that Info/Duration is scaled by TimecodeScale."""
+        info = ebml(0x1549A966, ebml(0x2AD7B1, (1_000_000).to_bytes(3, "big")) + ebml(0x4489, struct.pack(">d", 95_500.0)))
+        data = webm(info, cluster(0, 0, 20))
+
+        assert sniff_format(data) == "webm"
+        assert probe_duration(data[:200], complete=False) == pytest.approx(95.5)
+
+    def test_webm_without_duration_uses_last_block(self):
+        """Test MediaRecorder-style WebM: the last block timestamp gives the length."""
+        data = webm(cluster(0, 0, 20, 40), cluster(31_000, 0, 980))
+
+        assert probe_duration(data[:100], complete=False) is None
+        assert probe_duration(data) == pytest.approx(31.98)
+
+    def test_unknown_formats_are_not_judged(self):
+        """Test that unrecognised bytes report no duration."""
+        assert sniff_format(b"WEBM" + b"\x00" * 100) is None
+        assert probe_duration(b"\x00" * 1024) is None
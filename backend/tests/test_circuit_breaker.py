@@ -0,0 +1,242 @@
+"""
+Tests for per-endpoint circuit breakers.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from app.integrations.circuit_breaker import (
+    CircuitBreaker,
+    CircuitBreakers,
+    CircuitOpenError,
+    CircuitState,
+)
+from app.integrations.openai_client import OpenAIClient
+
+
+def _breaker(**kwargs) -> CircuitBreaker:
+    options = dict(
+        slow_call_seconds=1.0,
+        window=10,
+        min_calls=4,
+        failure_rate=0.5,
+        slow_call_rate=0.8,
+        open_seconds=30,
+        half_open_calls=2,
+    )
+    options.update(kwargs)
+    return CircuitBreaker("test", **options)
+
+
+async def _fail(breaker: CircuitBreaker, error: Exception = None) -> None:
+    with pytest.raises(Exception):
+        async with breaker.guard():
+            raise error or httpx.ConnectError("down")
+
+
+async def _succeed(breaker: CircuitBreaker) -> None:
+    async with breaker.guard():
+        pass
+
+
+@pytest.mark.asyncio
+class TestCircuitBreaker:
+    """Test suite for CircuitBreaker state transitions."""
+
+    async def test_opens_on_error_rate(self):
+        """Test that the circuit opens once the failure rate crosses the threshold."""
+        breaker = _breaker()
+        await _succeed(breaker)
+        await _succeed(breaker)
+        await _fail(breaker)
+        assert breaker.state == CircuitState.CLOSED
+
+        await _fail(breaker)
+        assert breaker.state == CircuitState.OPEN
+
+        with pytest.raises(CircuitOpenError):
+            async with breaker.guard():
+                pytest.fail("call should not run while open")
+
+    async def test_client_errors_do_not_count(self):
+        """Test that non-transient errors leave the circuit closed."""
+        breaker = _breaker()
+        for _ in range(6):
+            await _fail(breaker, ValueError("bad request"))
+
+        assert breaker.state == CircuitState.CLOSED
+
+    async def test_opens_on_slow_calls(self):
+        """Test that mostly slow calls open the circuit."""
+        breaker = _breaker()
+        for _ in range(4):
+            breaker.before_call()
+            breaker.record(failed=False, latency=5.0)
+
+        assert breaker.state == CircuitState.OPEN
+
+    async def test_half_open_closes_after_successful_trials(self):
+        """Test that the circuit closes after enough successful trial calls."""
+        breaker = _breaker()
+        for _ in range(4):
+            await _fail(breaker)
+
+        with patch("app.integrations.circuit_breaker.time.monotonic", return_value=10**9):
+            assert breaker.state == CircuitState.HALF_OPEN
+            await _succeed(breaker)
+            assert breaker.state == CircuitState.HALF_OPEN
+            await _succeed(breaker)
+
+        assert breaker.state == CircuitState.CLOSED
+
+    async def test_half_open_failure_reopens(self):
+        """Test that a failed trial call re-opens the circuit."""
+        breaker = _breaker()
+        for _ in range(4):
+            await _fail(breaker)
+
+        with patch("app.integrations.circuit_breaker.time.monotonic", return_value=10**9):
+            await _fail(breaker)
+            assert breaker.state == CircuitState.OPEN
+
+    async def test_half_open_limits_trial_calls(self):
+        """Test that only half_open_calls trial calls are admitted at once."""
+        breaker = _breaker(half_open_calls=1)
+        for _ in range(4):
+            await _fail(breaker)
+
+        with patch("app.integrations.circuit_breaker.time.monotonic", return_value=10**9):
+            breaker.before_call()
+            assert not breaker.available
+            with pytest.raises(CircuitOpenError):
+                breaker.before_call()
+
+    async def test_disabled(self):
+        """Test that a disabled breaker never rejects calls."""
+        breaker = _breaker()
+        for _ in range(4):
+            await _fail(breaker)
+
+        with patch("app.integrations.circuit_breaker.settings.CIRCUIT_BREAKER_ENABLED", False):
+            assert breaker.available
+            await _succeed(breaker)
+
+
+@pytest.mark.asyncio
+class TestFailFast:
+    """Test suite for fast fallbacks while a circuit is open."""
+
+    async def _open(self, breaker: CircuitBreaker) -> None:
+        for _ in range(breaker.min_calls):
+            breaker.before_call()
+            breaker.record(failed=True)
+
+    async def test_chat_stream_fails_fast_to_fallback(self, client, sample_session):
+        """Test that an open chat circuit returns the fallback without calling OpenAI."""
+        breakers = CircuitBreakers()
+        await self._open(breakers.chat)
+
+        upstream = MagicMock()
+        with patch("app.integrations.openai_client.circuit_breakers", breakers), \
+             patch("app.services.chat_service.circuit_breakers", breakers), \
+             patch(
+                 "app.integrations.openai_client.OpenAIClient._chat_stream_upstream", upstream
+             ):
+            response = await client.post(
+                f"/api/sessions/{sample_session.id}/messages",
+                json={"content": "Hello"},
+            )
+
+        assert response.status_code == 200
+        assert "event: error" in response.text
+        assert "having trouble responding" in response.text
+        upstream.assert_not_called()
+
+    async def test_rag_skipped_when_embeddings_open(self, db_session, sample_agent):
+        """Test that RAG is skipped without an embedding call while its circuit is open."""
+        from app.services.chat_service import ChatService
+
+        breakers = CircuitBreakers()
+        await self._open(breakers.embeddings)
+
+        service = ChatService(db_session)
+        service.rag_service.generate_embeddings = AsyncMock()
+        with patch("app.services.chat_service.circuit_breakers", breakers):
+            assert await service._get_query_embedding("hello") is None
+
+        service.rag_service.generate_embeddings.assert_not_called()
+
+    async def test_rate_limit_queue_does_not_count_as_slow(self, monkeypatch):
+        """Test that only the upstream request is timed, not the wait for a slot."""
+        breakers = CircuitBreakers()
+        breakers.chat = _breaker(slow_call_seconds=0.05, min_calls=1, slow_call_rate=0.5)
+
+        @asynccontextmanager
+        async def queued_slot(*args, **kwargs):
+            await asyncio.sleep(0.1)
+            yield MagicMock()
+
+        async def chunks():
+            yield MagicMock(choices=[MagicMock(delta=MagicMock(content="Hi"))])
+
+        client = OpenAIClient()
+        monkeypatch.setattr(OpenAIClient, "chat_client", MagicMock())
+        client.chat_client.chat.completions.with_raw_response.create = AsyncMock(
+            return_value=MagicMock(headers={}, parse=MagicMock(return_value=chunks()))
+        )
+        with patch("app.integrations.openai_client.circuit_breakers", breakers), \
+             patch("app.integrations.openai_client.rate_limiter.slot", queued_slot):
+            tokens = [t async for t in client.chat_stream("system", [{"role": "user", "content": "queued"}])]
+
+        assert tokens == ["Hi"]
+        assert breakers.chat.state == CircuitState.CLOSED
+
+        @asynccontextmanager
+        async def unexpected_slot(*args, **kwargs):
+            raise AssertionError("an open circuit should not queue for a slot")
+            yield
+
+        await self._open(breakers.chat)
+        with patch("app.integrations.openai_client.circuit_breakers", breakers), \
+             patch("app.integrations.openai_client.rate_limiter.slot", unexpected_slot), \
+             pytest.raises(CircuitOpenError):
+            await client.chat_completion("system", [{"role": "user", "content": "open"}])
+
+    async def test_queue_and_bulk_batches_do_not_trip_stt_or_embeddings(self, db_session, monkeypatch):
+        """Test that slot waits never count as slow, and bulk embedding batches aren't timed."""
+        from app.integrations.rate_limiter import Priority
+        from app.services.rag_service import RAGService
+
+        breakers = CircuitBreakers()
+        breakers.stt = _breaker(slow_call_seconds=0.05, min_calls=1, slow_call_rate=0.5)
+        breakers.embeddings = _breaker(slow_call_seconds=0.05, min_calls=1, slow_call_rate=0.5)
+
+        @asynccontextmanager
+        async def queued_slot(*args, **kwargs):
+            await asyncio.sleep(0.1)
+            yield MagicMock()
+
+        async def slow_embeddings(**kwargs):
+            await asyncio.sleep(0.1)
+            data = [MagicMock(embedding=[0.0]) for _ in kwargs["input"]]
+            return MagicMock(headers={}, parse=MagicMock(return_value=MagicMock(data=data, usage=None)))
+
+        client = OpenAIClient()
+        monkeypatch.setattr(OpenAIClient, "client", MagicMock())
+        client.client.audio.transcriptions.create = AsyncMock(return_value=MagicMock(text="hi"))
+        rag = RAGService(db_session)
+        rag.client = MagicMock()
+        rag.client.embeddings.with_raw_response.create = slow_embeddings
+
+        with patch("app.integrations.openai_client.circuit_breakers", breakers), \
+             patch("app.integrations.openai_client.rate_limiter.slot", queued_slot), \
+             patch("app.services.rag_service.circuit_breakers", breakers), \
+             patch("app.services.rag_service.rate_limiter.slot", queued_slot):
+            assert await client.speech_to_text(b"RIFF", "audio.wav") == "hi"
+            await rag._create_embeddings(["chunk one", "chunk two"], Priority.BULK)
+
+        assert breakers.stt.state == CircuitState.CLOSED
+        assert breakers.embeddings.state == CircuitState.CLOSED
@@ -0,0 +1,202 @@
+"""
+Tests for hedged requests and jittered retries.
+"""
+import asyncio
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from app.integrations.hedging import (
+    LatencyTracker,
+    backoff_delay,
+    hedge_wins,
+    hedged_call,
+    hedged_stream,
+    is_retryable,
+)
+
+
+def _warm_tracker(operation: str, latency: float = 0.01) -> LatencyTracker:
+    tracker = LatencyTracker(operation, min_samples=5)
+    for _ in range(10):
+        tracker.observe(latency)
+    return tracker
+
+
+class TestLatencyTracker:
+    """Test suite for LatencyTracker."""
+
+    def test_no_hedge_without_samples(self):
+        """Test that hedging waits for enough observations."""
+        tracker = LatencyTracker("test", min_samples=5)
+        tracker.observe(1.0)
+
+        assert tracker.hedge_after() is None
+
+    def test_hedge_after_uses_quantile_and_floor(self):
+        """Test that the hedge delay is the quantile, floored at the minimum."""
+        tracker = LatencyTracker("test", min_samples=5)
+        for value in range(1, 21):
+            tracker.observe(float(value))
+
+        with patch("app.integrations.hedging.settings.OPENAI_HEDGE_QUANTILE", 0.95):
+            assert tracker.hedge_after() == 20.0
+
+        fast = _warm_tracker("test")
+        with patch("app.integrations.hedging.settings.OPENAI_HEDGE_MIN_DELAY_SECONDS", 0.5):
+            assert fast.hedge_after() == 0.5
+
+
+class TestRetryPolicy:
+    """Test suite for retry classification and backoff."""
+
+    def test_retryable_errors(self):
+        """Test which errors are retried."""
+
+        class StatusError(Exception):
+            def __init__(self, status_code):
+                self.status_code = status_code
+
+        assert is_retryable(httpx.ReadTimeout("slow"))
+        assert is_retryable(StatusError(429))
+        assert is_retryable(StatusError(503))
+        assert not is_retryable(StatusError(400))
+        assert not is_retryable(ValueError("bad"))
+
+    def test_backoff_is_jittered_and_capped(self):
+        """Test that backoff stays within the exponential ceiling."""
+        with patch("app.integrations.hedging.settings.OPENAI_RETRY_MAX_DELAY_SECONDS", 1.0):
+            delays = [backoff_delay(10) for _ in range(50)]
+
+        assert all(0 <= delay <= 1.0 for delay in delays)
+        assert len(set(delays)) > 1
+
+
+@pytest.mark.asyncio
+class TestHedgedCall:
+    """Test suite for hedged_call."""
+
+    async def test_hedge_wins_when_primary_is_slow(self):
+        """Test that a hedge answers for a stalled primary, which is cancelled."""
+        tracker = _warm_tracker("test_call")
+        calls = []
+        cancelled = []
+
+        async def fn():
+            calls.append(1)
+            try:
+                await asyncio.sleep(10 if len(calls) == 1 else 0)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+            return len(calls)
+
+        wins = hedge_wins.get(operation="test_call")
+        with patch("app.integrations.hedging.settings.OPENAI_HEDGE_MIN_DELAY_SECONDS", 0.01):
+            result = await hedged_call(fn, tracker)
+
+        assert result == 2
+        assert cancelled == [1]
+        assert hedge_wins.get(operation="test_call") == wins + 1
+
+    async def test_no_hedge_when_disallowed(self):
+        """Test that can_hedge=False never fires a second call."""
+        tracker = _warm_tracker("test_call")
+        calls = []
+
+        async def fn():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        with patch("app.integrations.hedging.settings.OPENAI_HEDGE_MIN_DELAY_SECONDS", 0.01):
+            assert await hedged_call(fn, tracker, lambda: False) == "ok"
+        assert len(calls) == 1
+
+    async def test_retries_transient_errors(self):
+        """Test that transient failures are retried with backoff."""
+        tracker = LatencyTracker("test_retry")
+        attempts = []
+
+        async def fn():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise httpx.ConnectError("reset")
+            return "ok"
+
+        with patch("app.integrations.hedging.settings.OPENAI_RETRY_BASE_DELAY_SECONDS", 0.001):
+            assert await hedged_call(fn, tracker) == "ok"
+        assert len(attempts) == 3
+
+    async def test_does_not_retry_client_errors(self):
+        """Test that non-retryable errors surface immediately."""
+        tracker = LatencyTracker("test_retry")
+        attempts = []
+
+        async def fn():
+            attempts.append(1)
+            raise ValueError("bad request")
+
+        with pytest.raises(ValueError):
+            await hedged_call(fn, tracker)
+        assert len(attempts) == 1
+
+    async def test_gives_up_after_max_retries(self):
+        """Test that retries stop at OPENAI_MAX_RETRIES."""
+        tracker = LatencyTracker("test_retry")
+        attempts = []
+
+        async def fn():
+            attempts.append(1)
+            raise httpx.ConnectError("down")
+
+        with patch("app.integrations.hedging.settings.OPENAI_MAX_RETRIES", 1), \
+             patch("app.integrations.hedging.settings.OPENAI_RETRY_BASE_DELAY_SECONDS", 0.001):
+            with pytest.raises(httpx.ConnectError):
+                await hedged_call(fn, tracker)
+        assert len(attempts) == 2
+
+
+@pytest.mark.asyncio
+class TestHedgedStream:
+    """Test suite for hedged_stream."""
+
+    async def test_hedged_stream_uses_first_responder(self):
+        """Test that the stream whose first token arrives first is used and the other closed."""
+        tracker = _warm_tracker("test_stream")
+        started = []
+        closed = []
+
+        async def stream():
+            index = len(started)
+            started.append(index)
+            try:
+                await asyncio.sleep(10 if index == 0 else 0)
+                for token in ["a", "b", "c"]:
+                    yield f"{token}{index}"
+            finally:
+                closed.append(index)
+
+        with patch("app.integrations.hedging.settings.OPENAI_HEDGE_MIN_DELAY_SECONDS", 0.01):
+            tokens = [token async for token in hedged_stream(stream, tracker)]
+
+        assert tokens == ["a1", "b1", "c1"]
+        assert sorted(closed) == [0, 1]
+
+    async def test_stream_retries_before_first_token(self):
+        """Test that a stream failing before its first token is retried."""
+        tracker = LatencyTracker("test_stream_retry")
+        attempts = []
+
+        async def stream():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise httpx.ReadTimeout("slow")
+            yield "ok"
+
+        with patch("app.integrations.hedging.settings.OPENAI_RETRY_BASE_DELAY_SECONDS", 0.001):
+            tokens = [token async for token in hedged_stream(stream, tracker)]
+
+        assert tokens == ["ok"]
+        assert len(attempts) == 2
@@ -0,0 +1,147 @@
+"""
+Tests for per-call OpenAI instrumentation.
+"""
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.integrations import instrumentation
+from app.integrations.circuit_breaker import CircuitOpenError
+from app.integrations.instrumentation import (
+    CallRecord,
+    calls_total,
+    completion_tokens_used,
+    current_agent_id,
+    set_current_agent,
+    track_call,
+)
+from app.integrations.openai_client import OpenAIClient
+from app.integrations.rate_limiter import rate_limiter
+
+
+def usage(prompt=0, completion=0, cached=0):
+    return SimpleNamespace(
+        prompt_tokens=prompt,
+        completion_tokens=completion,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=cached),
+    )
+
+
+class TestCallRecord:
+    """Test suite for CallRecord and track_call."""
+
+    @pytest.mark.asyncio
+    async def test_records_outcome_and_agent(self):
+        """Test that calls are counted per agent and outcome."""
+        current_agent_id.set("agent-1")
+        labels = dict(operation="test_op", model="m", agent="agent-1")
+        before_ok = calls_total.get(**labels, outcome="ok")
+        before_err = calls_total.get(**labels, outcome="error")
+
+        async with track_call("test_op", "m"):
+            pass
+        with pytest.raises(RuntimeError):
+            async with track_call("test_op", "m"):
+                raise RuntimeError("boom")
+
+        assert calls_total.get(**labels, outcome="ok") == before_ok + 1
+        assert calls_total.get(**labels, outcome="error") == before_err + 1
+        current_agent_id.set(None)
+
+    def test_agent_labels_are_bounded(self):
+        """Test that agents past the label limit share the "other" label."""
+        with patch.object(instrumentation, "_labelled_agents", set()), \
+             patch("app.integrations.instrumentation.settings.METRICS_MAX_AGENT_LABELS", 2):
+            labels = [instrumentation.agent_label(agent) for agent in ("a", "b", "c", "a", None)]
+
+        assert labels == ["a", "b", "other", "a", ""]
+
+    @pytest.mark.asyncio
+    async def test_outcome_classification(self):
+        """Test that timeouts, 429s, open circuits and cancellation are told apart."""
+        rate_limited = RuntimeError("rate limited")
+        rate_limited.status_code = 429
+
+        assert instrumentation._outcome(asyncio.TimeoutError()) == "timeout"
+        assert instrumentation._outcome(rate_limited) == "rate_limited"
+        assert instrumentation._outcome(CircuitOpenError("chat", 1.0)) == "circuit_open"
+        assert instrumentation._outcome(asyncio.CancelledError()) == "cancelled"
+        assert instrumentation._outcome(ValueError()) == "error"
+
+    def test_usage_and_tokens_per_second(self):
+        """Test that usage blocks fill token counts and generation rate."""
+        record = CallRecord("chat_stream", "m")
+        record.first_token = record.started + 0.5
+        record.record_usage(usage(prompt=100, completion=50, cached=64))
+        record.finished = record.started + 1.5
+
+        assert (record.prompt_tokens, record.completion_tokens, record.cached_tokens) == (100, 50, 64)
+        assert record.ttft == pytest.approx(0.5)
+        assert record.tokens_per_second == pytest.approx(50.0)
+
+    def test_slow_calls_are_logged(self, caplog):
+        """Test that a call over the TTFT threshold logs a warning with its breakdown."""
+        record = CallRecord("chat_stream", "m")
+        record.first_token = record.started + 9
+
+        with patch.object(instrumentation.settings, "SLOW_TTFT_SECONDS", 5.0):
+            record.finish()
+
+        assert "Slow OpenAI call" in caplog.text
+        assert "ttft=9.00s" in caplog.text
+
+    @pytest.mark.asyncio
+    async def test_scheduler_wait_is_attributed_to_the_call(self):
+        """Test that time spent waiting for a rate-limit slot lands in queue_seconds."""
+        async def slow_acquire(*args):
+            await asyncio.sleep(0.02)
+
+        limiter = rate_limiter.limiter("queue-model")
+        async with track_call("test_op", "queue-model") as record:
+            with patch.object(limiter, "acquire", slow_acquire), \
+                 patch.object(limiter, "release", MagicMock()):
+                async with rate_limiter.slot("queue-model"):
+                    pass
+
+        assert record.queue_seconds >= 0.015
+
+
+class TestOpenAIClientInstrumentation:
+    """Test suite for instrumentation inside OpenAIClient."""
+
+    @pytest.mark.asyncio
+    async def test_stream_records_ttft_and_usage(self, monkeypatch):
+        """Test that a chat stream records TTFT and usage from the final chunk."""
+        client = OpenAIClient()
+
+        async def chunks():
+            yield MagicMock(choices=[MagicMock(delta=MagicMock(content="Hi"))])
+            yield MagicMock(choices=[], usage=usage(prompt=10, completion=7))
+
+        raw = MagicMock(headers={}, parse=MagicMock(return_value=chunks()))
+        monkeypatch.setattr(OpenAIClient, "chat_client", MagicMock())
+        client.chat_client.chat.completions.with_raw_response.create = AsyncMock(return_value=raw)
+
+        set_current_agent("agent-2")
+        model = client.model
+        before = completion_tokens_used.get(model=model, agent="agent-2")
+        records = []
+        original = instrumentation.CallRecord.finish
+
+        def capture(record, outcome="ok"):
+            records.append(record)
+            original(record, outcome)
+
+        with patch.object(instrumentation.CallRecord, "finish", capture), \
+             patch("app.integrations.model_router.settings.MODEL_ROUTING_ENABLED", False):
+            tokens = [t async for t in client.chat_stream("system", [{"role": "user", "content": "Hello"}])]
+
+        assert tokens == ["Hi"]
+        assert records[0].operation == "chat_stream"
+        assert records[0].ttft is not None
+        assert completion_tokens_used.get(model=model, agent="agent-2") == before + 7
+        kwargs = client.chat_client.chat.completions.with_raw_response.create.call_args.kwargs
+        assert kwargs["stream_options"] == {"include_usage": True}
+        set_current_agent(None)
@@ -0,0 +1,119 @@
+"""
+Tests for the mock OpenAI server and load generator helpers.
+"""
+import pytest
+from httpx import ASGITransport, AsyncClient
+from openai import AsyncOpenAI, InternalServerError
+
+from loadtest import mock_openai
+from loadtest.load_generator import LoadReport, StreamResult, format_report, percentile
+
+
+@pytest.fixture
+def mock_config():
+    """Fast, deterministic mock settings restored after each test."""
+    original = mock_openai.MockConfig(**vars(mock_openai.config))
+    mock_openai.config.ttft_ms = 0
+    mock_openai.config.tokens_per_second = 10_000
+    mock_openai.config.completion_tokens = 5
+    mock_openai.config.embedding_latency_ms = 0
+    mock_openai.config.speech_latency_ms = 0
+    mock_openai.config.speech_bytes = 100
+    yield mock_openai.config
+    for name, value in vars(original).items():
+        setattr(mock_openai.config, name, value)
+
+
+@pytest.fixture
+def sdk(mock_config) -> AsyncOpenAI:
+    """OpenAI SDK client talking to the mock server in-process."""
+    http_client = AsyncClient(transport=ASGITransport(app=mock_openai.app))
+    return AsyncOpenAI(
+        api_key="test", base_url="http://mock/v1", http_client=http_client, max_retries=0
+    )
+
+
+@pytest.mark.asyncio
+class TestMockOpenAI:
+    """Test suite for the mock server, exercised through the real SDK."""
+
+    async def test_chat_stream_with_usage(self, sdk):
+        """Test streamed chunks and the trailing usage chunk."""
+        stream = await sdk.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": "Hi"}],
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        content, usage = "", None
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                content += chunk.choices[0].delta.content
+            if chunk.usage:
+                usage = chunk.usage
+
+        assert len(content.split()) == 5
+        assert usage.completion_tokens == 5
+
+    async def test_chat_completion(self, sdk):
+        """Test the non-streaming completion."""
+        response = await sdk.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": "Hi"}],
+        )
+
+        assert response.choices[0].message.content
+        assert response.usage.completion_tokens == 5
+
+    async def test_embeddings_are_deterministic(self, sdk, mock_config):
+        """Test embedding size and that identical texts embed identically."""
+        mock_config.embedding_dimensions = 8
+        response = await sdk.embeddings.create(
+            model="text-embedding-3-small", input=["a", "a", "b"]
+        )
+
+        vectors = [item.embedding for item in response.data]
+        assert len(vectors[0]) == 8
+        assert vectors[0] == vectors[1] != vectors[2]
+
+    async def test_speech(self, sdk):
+        """Test that speech returns the configured payload size."""
+        response = await sdk.audio.speech.create(model="tts-1", voice="alloy", input="Hi")
+
+        assert len(response.content) == 100
+
+    async def test_error_injection(self, sdk, mock_config):
+        """Test that error_rate=1 fails every request with error_status."""
+        mock_config.error_rate = 1.0
+
+        with pytest.raises(InternalServerError):
+            await sdk.chat.completions.create(
+                model="gpt-4o-mini", messages=[{"role": "user", "content": "Hi"}]
+            )
+
+
+class TestLoadReport:
+    """Test suite for load generator reporting."""
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        values = [float(v) for v in range(1, 101)]
+
+        assert percentile(values, 50) == 50
+        assert percentile(values, 99) == 99
+        assert percentile([], 50) == 0.0
+
+    def test_format_report(self):
+        """Test that the report lists percentiles and errors."""
+        report = LoadReport(
+            results=[
+                StreamResult(ok=True, ttft=0.1, duration=1.0, frames=3, chars=30),
+                StreamResult(ok=False, error="HTTP 500"),
+            ],
+            elapsed=2.0,
+        )
+
+        text = format_report(report)
+        assert "ok: 1  failed: 1" in text
+        assert "ttft" in text and "p99=100.0ms" in text
+        assert "error x1: HTTP 500" in text
@@ -8,6 +8,7 @@ Endpoints tested:
 import pytest
 from httpx import AsyncClient
 from unittest.mock import AsyncMock, patch, MagicMock
+from sqlalchemy import select
 
 from app.models.agent import Agent
 from app.models.session import Session
@@ -415,3 +416,36 @@ class TestMessageValidation:
             )
 
             assert response.status_code == 200
+
+
+class TestStreamingTransactions:
+    """Test suite for DB transaction scope during SSE streaming."""
+
+    @pytest.mark.asyncio
+    async def test_no_transaction_open_while_tokens_stream(
+        self, db_session, sample_session: Session
+    ):
+        """Test that the chat pipeline commits before streaming tokens."""
+        from app.services.chat_service import ChatService
+
+        chat_service = ChatService(db_session)
+        chat_service.openai = MagicMock()
+        in_transaction_during_stream = []
+
+        async def mock_stream(**kwargs):
+            for token in ["Hello", " there"]:
+                in_transaction_during_stream.append(db_session.in_transaction())
+                yield token
+
+        chat_service.openai.chat_stream = mock_stream
+
+        events = [e async for e in chat_service.send_message_stream(sample_session.id, "Hi")]
+
+        assert in_transaction_during_stream == [False, False]
+        assert not db_session.in_transaction()
+        assert b"event: done" in events[-1]
+
+        result = await db_session.execute(
+            select(Message).where(Message.session_id == sample_session.id)
+        )
+        assert [m.content for m in result.scalars().all()] == ["Hi", "Hello there"]
@@ -0,0 +1,95 @@
+"""
+Tests for the metrics registry and endpoint.
+
+Endpoints tested:
+- GET /api/metrics - Prometheus text exposition
+"""
+import pytest
+from httpx import AsyncClient
+
+from app.integrations.clients import client_registry
+from app.integrations.openai_client import openai_client
+from app.services.rag_service import RAGService
+from app.utils.metrics import MetricsRegistry
+
+
+class TestMetricsRegistry:
+    """Test suite for MetricsRegistry rendering."""
+
+    def test_counter_with_labels(self):
+        """Test counter exposition with labels."""
+        registry = MetricsRegistry()
+        counter = registry.counter("calls_total", "Calls", ["endpoint"])
+        counter.inc(endpoint="chat")
+        counter.inc(2, endpoint="chat")
+
+        text = registry.render()
+
+        assert "# TYPE calls_total counter" in text
+        assert 'calls_total{endpoint="chat"} 3' in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test histogram buckets, sum and count."""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+
+        text = registry.render()
+
+        assert 'latency_seconds_bucket{le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{le="1"} 2' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+        assert "latency_seconds_count 3" in text
+        assert histogram.quantile(0.5) == 1.0
+
+    def test_gauge_function_evaluated_on_render(self):
+        """Test that callback gauges are computed at scrape time."""
+        registry = MetricsRegistry()
+        gauge = registry.gauge("pool_connections", "Connections", ["state"])
+        gauge.set_function(lambda: {("idle",): 4})
+
+        assert 'pool_connections{state="idle"} 4' in registry.render()
+
+    def test_get_or_create_returns_same_metric(self):
+        """Test that registering a name twice returns the same metric."""
+        registry = MetricsRegistry()
+
+        assert registry.counter("x_total", "X") is registry.counter("x_total", "X")
+        with pytest.raises(ValueError):
+            registry.gauge("x_total", "X")
+
+
+class TestSharedClient:
+    """Test suite for the shared OpenAI client registry."""
+
+    def test_rag_and_chat_share_one_client(self, db_session):
+        """Test that RAGService reuses the process-wide client."""
+        assert RAGService(db_session).client is openai_client.client
+        assert client_registry.openai is openai_client.client
+
+    @pytest.mark.asyncio
+    async def test_client_is_replaced_after_close(self):
+        """Test that the singleton picks up the new client once the registry is closed."""
+        closed = openai_client.client
+        chat = openai_client.chat_client
+        await client_registry.close()
+
+        assert client_registry.pool_stats() == {"active": 0, "idle": 0}
+        assert openai_client.client is not closed
+        assert openai_client.chat_client is not chat
+        assert openai_client.chat_client.max_retries == 0
+
+
+class TestMetricsEndpoint:
+    """Test suite for GET /api/metrics."""
+
+    @pytest.mark.asyncio
+    async def test_metrics_endpoint(self, client: AsyncClient):
+        """Test that the endpoint serves Prometheus text including pool metrics."""
+        response = await client.get("/api/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "openai_http_pool_utilization" in response.text
@@ -0,0 +1,123 @@
+"""
+Tests for per-request chat model routing.
+"""
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.integrations.model_router import ModelRouter, ModelTier, prompt_tokens
+from app.integrations.openai_client import OpenAIClient
+
+
+@pytest.fixture
+def tiers():
+    """Distinct models per tier."""
+    with patch("app.integrations.model_router.settings.OPENAI_FAST_MODEL", "fast-model"), \
+         patch("app.integrations.model_router.settings.OPENAI_MODEL", "standard-model"), \
+         patch("app.integrations.model_router.settings.OPENAI_LARGE_MODEL", "large-model"):
+        yield
+
+
+class TestModelRouter:
+    """Test suite for ModelRouter decisions."""
+
+    def test_trivial_turn_goes_to_fast_tier(self, tiers):
+        """Test that short small talk without context uses the fast model."""
+        route = ModelRouter().route("chat_stream", prompt_tokens=500, message_tokens=2, message="Thanks!")
+
+        assert route.tier == ModelTier.FAST
+        assert route.model == "fast-model"
+
+    def test_short_question_uses_standard_tier(self, tiers):
+        """Test that a short real question or a bare reply is not downgraded."""
+        router = ModelRouter()
+        for message in ["What is your refund policy?", "Refund policy", "yes"]:
+            route = router.route(
+                "chat_stream", prompt_tokens=500, message_tokens=len(message) // 4, message=message
+            )
+
+            assert route.tier == ModelTier.STANDARD
+            assert route.reason == "default"
+
+    def test_long_history_skips_fast_tier(self, tiers):
+        """Test that a short follow-up in a long conversation is not downgraded."""
+        route = ModelRouter().route(
+            "chat_stream", prompt_tokens=3000, message_tokens=2, history_tokens=2500, message="thanks"
+        )
+
+        assert route.tier == ModelTier.STANDARD
+
+    def test_rag_context_uses_standard_tier(self, tiers):
+        """Test that requests with RAG context are not sent to the fast model."""
+        route = ModelRouter().route(
+            "chat_stream", prompt_tokens=900, message_tokens=2, has_context=True
+        )
+
+        assert route.tier == ModelTier.STANDARD
+        assert route.reason == "rag_context"
+
+    def test_large_prompt_uses_large_tier(self, tiers):
+        """Test that very large prompts use the large model."""
+        route = ModelRouter().route("chat_stream", prompt_tokens=50_000, message_tokens=40)
+
+        assert route.tier == ModelTier.LARGE
+        assert route.model == "large-model"
+
+    def test_agent_policy_pins_tier(self, tiers):
+        """Test that a pinned agent policy overrides the heuristics."""
+        route = ModelRouter().route(
+            "chat_stream", prompt_tokens=50_000, message_tokens=2, policy="fast"
+        )
+
+        assert route.tier == ModelTier.FAST
+        assert route.reason == "agent_policy"
+
+    def test_slow_model_falls_back_a_tier(self, tiers):
+        """Test that an over-budget model is avoided when the cheaper one is faster."""
+        router = ModelRouter()
+        for _ in range(30):
+            router.tracker("chat_stream", "standard-model").observe(9.0)
+            router.tracker("chat_stream", "fast-model").observe(0.4)
+
+        route = router.route("chat_stream", prompt_tokens=900, message_tokens=100)
+
+        assert route.tier == ModelTier.FAST
+        assert route.reason == "latency"
+
+    def test_disabled(self, tiers):
+        """Test that disabling routing always uses OPENAI_MODEL."""
+        with patch("app.integrations.model_router.settings.MODEL_ROUTING_ENABLED", False):
+            route = ModelRouter().route("chat_stream", prompt_tokens=10, message_tokens=1)
+
+        assert route.model == "standard-model"
+
+    def test_prompt_tokens(self):
+        """Test the prompt size estimate split."""
+        total, message, history = prompt_tokens(
+            "x" * 400,
+            [{"role": "user", "content": "a" * 40}, {"role": "user", "content": "b" * 8}],
+        )
+
+        assert (message, history) == (3, 11)
+        assert total == 101 + message + history
+
+
+class TestOpenAIClientRouting:
+    """Test suite for routing inside OpenAIClient."""
+
+    @pytest.mark.asyncio
+    async def test_chat_completion_uses_routed_model(self, tiers, monkeypatch):
+        """Test that the upstream request carries the routed model."""
+        client = OpenAIClient()
+        completion = MagicMock(choices=[MagicMock(message=MagicMock(content="hi"))], usage=None)
+        create = AsyncMock(return_value=MagicMock(headers={}, parse=MagicMock(return_value=completion)))
+        monkeypatch.setattr(OpenAIClient, "chat_client", MagicMock())
+        client.chat_client.chat.completions.with_raw_response.create = create
+
+        await client.chat_completion("system", [{"role": "user", "content": "thanks"}])
+        await client.chat_completion(
+            "system", [{"role": "user", "content": "thanks"}], model_policy="large"
+        )
+
+        models = [call.kwargs["model"] for call in create.call_args_list]
+        assert models == ["fast-model", "large-model"]
@@ -0,0 +1,127 @@
+"""
+Tests for joining Ogg Opus files into one logical stream.
+"""
+import struct
+
+import pytest
+
+from app.services.ogg_opus import ogg_crc, packet_samples, read_packets, remux_opus
+from app.services.speech_pipeline import stitch_audio
+
+PRE_SKIP = 312
+
+# TOC bytes: CELT 20 ms (config 19) mono, one frame; SILK 60 ms (config 3), two frames
+CELT_20MS = 19 << 3
+SILK_60MS_X2 = (3 << 3) | 0x01
+
+
+def crc(data: bytes) -> int:
+    """Bitwise Ogg CRC, independent of the table-driven one under test."""
+    value = 0
+    for byte in data:
+        value ^= byte << 24
+        for _ in range(8):
+            value = ((value << 1) ^ 0x04C11DB7) if value & 0x80000000 else value << 1
+            value &= 0xFFFFFFFF
+    return value
+
+
+def page(flags, granule, serial, sequence, packets):
+    lacing = b"".join(b"\xff" * (len(p) // 255) + bytes([len(p) % 255]) for p in packets)
+    data = bytearray(struct.pack("<4sBBqIIIB", b"OggS", 0, flags, granule, serial, sequence, 0, len(lacing)))
+    data += lacing + b"".join(packets)
+    struct.pack_into("<I", data, 22, crc(bytes(data)))
+    return bytes(data)
+
+
+def opus_file(serial, packets, channels=1):
+    """An Ogg Opus file shaped like a TTS response: headers, then one packet per page."""
+    head = b"OpusHead" + struct.pack("<BBHIhB", 1, channels, PRE_SKIP, 24000, 0, 0)
+    tags = b"OpusTags" + struct.pack("<I", 4) + b"test" + struct.pack("<I", 0)
+    pages = [page(0x02, 0, serial, 0, [head]), page(0, 0, serial, 1, [tags])]
+    granule = PRE_SKIP
+    for index, packet in enumerate(packets):
+        granule += packet_samples(packet)
+        flags = 0x04 if index == len(packets) - 1 else 0
+        pages.append(page(flags, granule, serial, index + 2, [packet]))
+    return b"".join(pages)
+
+
+def demux(data):
+    """Walk every page, checking the framing a decoder relies on, and return (pages, packets)."""
+    pages, packets, partial = [], [], b""
+    offset = 0
+    while offset < len(data):
+        capture, version, flags, granule, serial, sequence, checksum, count = struct.unpack_from(
+            "<4sBBqIIIB", data, offset
+        )
+        assert capture == b"OggS" and version == 0
+        lacing = data[offset + 27:offset + 27 + count]
+        end = offset + 27 + count + sum(lacing)
+        raw = bytearray(data[offset:end])
+        raw[22:26] = b"\x00\x00\x00\x00"
+        assert crc(bytes(raw)) == checksum
+        body = offset + 27 + count
+        for size in lacing:
+            partial += data[body:body + size]
+            body += size
+            if size < 255:
+                packets.append(partial)
+                partial = b""
+        pages.append({"flags": flags, "granule": granule, "serial": serial, "sequence": sequence})
+        offset = end
+    assert partial == b""
+    return pages, packets
+
+
+class TestRemuxOpus:
+    """Test suite for remux_opus."""
+
+    def test_packet_samples_reads_the_toc(self):
+        """Test the 48 kHz duration of a packet for each frame-count code."""
+        assert packet_samples(bytes([CELT_20MS, 0])) == 960
+        assert packet_samples(bytes([SILK_60MS_X2, 0])) == 2 * 2880
+        assert packet_samples(bytes([(19 << 3) | 0x03, 0x05, 0])) == 5 * 960
+        assert packet_samples(b"") == 0
+
+    def test_stitched_file_is_one_decodable_stream(self):
+        """Test that stitched TTS segments demux as a single stream with continuous timing."""
+        first = [bytes([CELT_20MS]) + bytes([n]) * 40 for n in range(3)]
+        second = [bytes([SILK_60MS_X2]) + b"\x07" * 300, bytes([CELT_20MS]) + b"\x08" * 510]
+        third = [bytes([CELT_20MS]) + bytes([n % 256]) * 60 for n in range(400)]
+        files = [opus_file(11, first), opus_file(22, second), opus_file(33, third)]
+
+        pages, packets = demux(stitch_audio(files, "opus"))
+
+        assert {p["serial"] for p in pages} == {11}
+        assert [p["sequence"] for p in pages] == list(range(len(pages)))
+        assert [p["flags"] & 0x02 for p in pages].count(0x02) == 1 and pages[0]["flags"] & 0x02
+        assert [p["flags"] & 0x04 for p in pages].count(0x04) == 1 and pages[-1]["flags"] & 0x04
+        assert packets[0].startswith(b"OpusHead") and packets[1].startswith(b"OpusTags")
+        assert packets[2:] == first + second + third
+        granules = [p["granule"] for p in pages[2:]]
+        assert granules == sorted(granules)
+        assert granules[-1] - PRE_SKIP == 403 * 960 + 2 * 2880 + 960
+
+    def test_read_packets_follows_the_first_stream(self):
+        """Test that a chained file yields only its first link's packets."""
+        chained = opus_file(1, [b"\x98a"]) + opus_file(2, [b"\x98b"])
+
+        assert read_packets(chained)[2:] == [b"\x98a"]
+
+    def test_mismatched_channels_are_rejected(self):
+        """Test that segments with different channel counts are not merged."""
+        with pytest.raises(ValueError):
+            remux_opus([opus_file(1, [b"\x98a"]), opus_file(2, [b"\x98b"], channels=2)])
+
+    def test_unparseable_segments_fall_back_to_chaining(self):
+        """Test that stitch_audio still returns audio when a segment isn't Ogg Opus."""
+        segments = [opus_file(1, [b"\x98a"]), b"not ogg"]
+
+        assert stitch_audio(segments, "opus") == b"".join(segments)
+        assert stitch_audio([segments[0]], "opus") == segments[0]
+
+    def test_crc_matches_the_bitwise_definition(self):
+        """Test the zlib-based checksum against a plain bitwise CRC."""
+        for data in [b"", b"OggS", bytes(range(256)) * 17]:
+            assert ogg_crc(data) == crc(data)
@@ -0,0 +1,106 @@
+"""
+Tests for cache-friendly prompt assembly.
+"""
+from unittest.mock import patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from openai import AsyncOpenAI
+
+from app.integrations.instrumentation import cached_prompt_tokens
+from app.integrations.openai_client import OpenAIClient
+from app.services.prompt_assembly import KNOWLEDGE_BASE_POLICY, build_prompt
+from loadtest import mock_openai
+
+
+HISTORY = [
+    {"role": "user", "content": "Hi"},
+    {"role": "assistant", "content": "Hello!"},
+    {"role": "user", "content": "What does the CV say?"},
+]
+
+
+class TestBuildPrompt:
+    """Test suite for build_prompt."""
+
+    def test_segment_order(self):
+        """Test static policy, then agent prompt, then history, context and the new message."""
+        prompt = build_prompt("You are Bob.", HISTORY, "CV: ten years of Python", knowledge_base=True)
+
+        assert prompt.system_prompt.startswith(KNOWLEDGE_BASE_POLICY)
+        assert prompt.system_prompt.endswith("You are Bob.")
+        assert [m["role"] for m in prompt.messages] == ["user", "assistant", "system", "user"]
+        assert "ten years of Python" in prompt.messages[2]["content"]
+        assert prompt.messages[-1] == HISTORY[-1]
+        assert prompt.has_context
+
+    def test_prefix_is_stable_across_turns(self):
+        """Test that the prefix does not change with context or history."""
+        first = build_prompt("You are Bob.", HISTORY[:1], "context A", knowledge_base=True)
+        second = build_prompt("You are Bob.", HISTORY, "context B", knowledge_base=True)
+        no_hit = build_prompt("You are Bob.", HISTORY, None, knowledge_base=True)
+
+        assert first.system_prompt == second.system_prompt == no_hit.system_prompt
+        assert first.prefix_fingerprint == second.prefix_fingerprint
+        assert second.messages[:2] == HISTORY[:2]
+
+    def test_without_knowledge_base(self):
+        """Test that agents without documents get only their own prompt."""
+        prompt = build_prompt("You are Bob.", HISTORY)
+
+        assert prompt.system_prompt == "You are Bob."
+        assert prompt.messages == HISTORY
+        assert prompt.segment_tokens["static_policy"] == 0
+
+    def test_segment_tokens(self):
+        """Test the per-segment token composition."""
+        prompt = build_prompt("You are Bob.", HISTORY, "context", knowledge_base=True)
+
+        tokens = prompt.segment_tokens
+        assert set(tokens) == {"static_policy", "agent_prompt", "history", "context", "user_message"}
+        assert tokens["static_policy"] > 500
+        assert prompt.total_tokens == sum(tokens.values())
+
+
+@pytest.mark.asyncio
+class TestPromptCacheUsage:
+    """Test suite for cache-related request fields and usage accounting."""
+
+    async def test_stream_records_cached_tokens(self, monkeypatch):
+        """Test that cached_tokens from the final usage chunk is recorded."""
+        http_client = AsyncClient(transport=ASGITransport(app=mock_openai.app))
+        client = OpenAIClient()
+        monkeypatch.setattr(OpenAIClient, "chat_client", AsyncOpenAI(
+            api_key="test", base_url="http://mock/v1", http_client=http_client, max_retries=0
+        ))
+        # Providers only cache prefixes of 1024+ tokens
+        agent_prompt = "You are Bob, a careful assistant. " * 100
+        prompt = build_prompt(agent_prompt, HISTORY, "context", knowledge_base=True)
+        model = "gpt-4o-mini"
+        before = cached_prompt_tokens.get(model=model)
+
+        with patch.object(mock_openai.config, "ttft_ms", 0), \
+             patch.object(mock_openai.config, "completion_tokens", 3), \
+             patch.object(mock_openai.config, "tokens_per_second", 10_000), \
+             patch("app.integrations.model_router.settings.MODEL_ROUTING_ENABLED", False), \
+             patch("app.integrations.model_router.settings.OPENAI_MODEL", model):
+            for _ in range(2):
+                tokens = [
+                    token
+                    async for token in client.chat_stream(
+                        prompt.system_prompt,
+                        prompt.messages,
+                        prompt_cache_key=prompt.prefix_fingerprint,
+                    )
+                ]
+                assert tokens
+
+        assert cached_prompt_tokens.get(model=model) - before >= 1024
+
+    async def test_request_carries_prompt_cache_key(self):
+        """Test that the prefix fingerprint is sent as prompt_cache_key."""
+        client = OpenAIClient()
+        request = client._chat_request("system", HISTORY, "gpt-4o-mini", "abc123")
+
+        assert request["prompt_cache_key"] == "abc123"
+        assert "prompt_cache_key" not in client._chat_request("system", HISTORY)
@@ -0,0 +1,113 @@
+"""
+Tests for the client-side rate limiter and priority scheduler.
+"""
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.integrations.rate_limiter import ModelLimiter, Priority, RateLimiter, TokenBucket, _parse_reset
+
+
+class TestTokenBucket:
+    """Test suite for TokenBucket."""
+
+    def test_consume_and_wait(self):
+        """Test that an empty bucket reports the refill wait."""
+        bucket = TokenBucket(per_minute=60)
+        bucket.consume(60)
+
+        assert bucket.time_until(1) == pytest.approx(1.0, abs=0.05)
+
+    def test_update_from_provider(self):
+        """Test that provider limits override the local estimate."""
+        bucket = TokenBucket(per_minute=60)
+        bucket.update(limit=600, remaining=10)
+
+        assert bucket.capacity == 600
+        assert bucket.level == pytest.approx(10, abs=1)
+
+    def test_parse_reset(self):
+        """Test parsing of x-ratelimit-reset-* durations."""
+        assert _parse_reset("6m0s") == 360
+        assert _parse_reset("250ms") == 0.25
+        assert _parse_reset(None) is None
+
+
+class TestModelLimiter:
+    """Test suite for ModelLimiter scheduling."""
+
+    @pytest.mark.asyncio
+    async def test_interactive_outranks_bulk(self):
+        """Test that queued interactive work is granted before bulk work."""
+        limiter = ModelLimiter("m", rpm=1000, tpm=100000, max_concurrency=1)
+        await limiter.acquire(1, Priority.INTERACTIVE)  # occupy the only slot
+        order = []
+
+        async def wait(priority):
+            await limiter.acquire(1, priority)
+            order.append(priority)
+            limiter.release()
+
+        bulk = asyncio.create_task(wait(Priority.BULK))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(wait(Priority.INTERACTIVE))
+        await asyncio.sleep(0)
+
+        limiter.release()
+        await asyncio.gather(bulk, interactive)
+
+        assert order == [Priority.INTERACTIVE, Priority.BULK]
+
+    def test_aimd(self):
+        """Test multiplicative decrease on 429 and additive increase on success."""
+        limiter = ModelLimiter("m", max_concurrency=16)
+
+        limiter.on_rate_limited()
+        assert limiter.concurrency == 8
+
+        limiter.on_success()
+        assert 8 < limiter.concurrency < 9
+
+    def test_headers_update_buckets(self):
+        """Test syncing from x-ratelimit-* headers."""
+        limiter = ModelLimiter("m", rpm=10, tpm=1000)
+        limiter.update_from_headers({
+            "x-ratelimit-limit-requests": "5000",
+            "x-ratelimit-remaining-requests": "4999",
+            "x-ratelimit-limit-tokens": "2000000",
+            "x-ratelimit-remaining-tokens": "1999000",
+        })
+
+        assert limiter.requests.capacity == 5000
+        assert limiter.tokens.capacity == 2000000
+
+
+class TestRateLimiterSlot:
+    """Test suite for RateLimiter.slot."""
+
+    @pytest.mark.asyncio
+    async def test_rate_limit_error_shrinks_concurrency(self):
+        """Test that a 429 inside the slot triggers AIMD backoff."""
+        limiter = RateLimiter()
+        error = Exception("rate_limit")
+        error.status_code = 429
+        error.response = MagicMock(headers={})
+
+        with pytest.raises(Exception):
+            async with limiter.slot("m"):
+                raise error
+
+        model_limiter = limiter.limiter("m")
+        assert model_limiter.concurrency < model_limiter.max_concurrency
+        assert model_limiter.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_slot_released_after_success(self):
+        """Test that the concurrency slot is returned."""
+        limiter = RateLimiter()
+
+        async with limiter.slot("m", tokens=10):
+            assert limiter.limiter("m").in_flight == 1
+
+        assert limiter.limiter("m").in_flight == 0
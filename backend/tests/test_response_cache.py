@@ -0,0 +1,217 @@
+"""
+Tests for the per-agent response cache.
+
+Covers:
+- ResponseCache exact / semantic lookups, TTL and LRU eviction
+- ChatService serving cached answers as a replayed SSE stream
+- POST /api/sessions/{session_id}/messages bypass header
+"""
+import json
+from uuid import uuid4
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.agent import Agent
+from app.models.session import Session
+from app.services.chat_service import ChatService
+from app.services.response_cache import ResponseCache, conversation_version, response_cache
+
+
+def parse_sse(events: list[bytes]) -> list[tuple[str, dict]]:
+    """Parse raw SSE frames into (event, data) pairs."""
+    parsed = []
+    for frame in b"".join(events).decode().strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.split("\n"))
+        parsed.append((lines["event"], json.loads(lines["data"])))
+    return parsed
+
+
+class TestResponseCache:
+    """Test suite for the ResponseCache store."""
+
+    def test_exact_match_hits_after_normalization(self):
+        """Test that whitespace and case differences still hit exactly."""
+        cache = ResponseCache(max_entries=10, ttl_seconds=60, similarity_threshold=0.9)
+        cache.put("ns", "What are your hours?", None, "9 to 5")
+
+        assert cache.get_exact("ns", "  what are   your HOURS? ") == "9 to 5"
+
+    def test_namespaces_are_isolated(self):
+        """Test that entries do not leak across namespaces."""
+        cache = ResponseCache(max_entries=10, ttl_seconds=60, similarity_threshold=0.9)
+        cache.put("ns-a", "hello", [1.0, 0.0], "A")
+
+        assert cache.get_exact("ns-b", "hello") is None
+        assert cache.get_similar("ns-b", [1.0, 0.0]) is None
+
+    def test_semantic_match_above_threshold(self):
+        """Test that a near-duplicate embedding hits."""
+        cache = ResponseCache(max_entries=10, ttl_seconds=60, similarity_threshold=0.9)
+        cache.put("ns", "opening hours", [1.0, 0.1], "9 to 5")
+
+        assert cache.get_similar("ns", [1.0, 0.12]) == "9 to 5"
+
+    def test_semantic_match_below_threshold_misses(self):
+        """Test that a dissimilar embedding misses."""
+        cache = ResponseCache(max_entries=10, ttl_seconds=60, similarity_threshold=0.9)
+        cache.put("ns", "opening hours", [1.0, 0.0], "9 to 5")
+
+        assert cache.get_similar("ns", [0.0, 1.0]) is None
+
+    def test_expired_entries_are_dropped(self):
+        """Test that entries past their TTL no longer hit."""
+        cache = ResponseCache(max_entries=10, ttl_seconds=0, similarity_threshold=0.9)
+        cache.put("ns", "hello", [1.0, 0.0], "hi")
+
+        with patch("app.services.response_cache.time.monotonic", return_value=1e12):
+            assert cache.get_exact("ns", "hello") is None
+        assert len(cache) == 0
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted when full."""
+        cache = ResponseCache(max_entries=2, ttl_seconds=60, similarity_threshold=0.9)
+        cache.put("ns", "first", None, "1")
+        cache.put("ns", "second", None, "2")
+        cache.get_exact("ns", "first")
+        cache.put("ns", "third", None, "3")
+
+        assert cache.get_exact("ns", "first") == "1"
+        assert cache.get_exact("ns", "second") is None
+        assert cache.get_exact("ns", "third") == "3"
+
+
+class TestChatServiceResponseCache:
+    """Test suite for cache integration in ChatService.send_message_stream."""
+
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        response_cache.clear()
+        yield
+        response_cache.clear()
+
+    async def _new_session(self, db: AsyncSession, agent: Agent) -> str:
+        session = Session(id=str(uuid4()), agent_id=agent.id, title="Another Session")
+        db.add(session)
+        await db.commit()
+        return session.id
+
+    async def _run(self, db: AsyncSession, session_id: str, content: str, use_cache: bool = True):
+        chat_service = ChatService(db)
+        chat_service.openai = MagicMock()
+
+        async def mock_stream(**kwargs):
+            for token in ["Open ", "9 to 5"]:
+                yield token
+
+        chat_service.openai.chat_stream = MagicMock(side_effect=mock_stream)
+        chat_service.rag_service.generate_embeddings = AsyncMock(return_value=[[1.0, 0.0]])
+
+        events = [e async for e in chat_service.send_message_stream(session_id, content, use_cache)]
+        return chat_service, parse_sse(events)
+
+    @pytest.mark.asyncio
+    async def test_second_identical_question_is_served_from_cache(
+        self, db_session: AsyncSession, sample_agent: Agent, sample_session: Session
+    ):
+        """Test that the same opening question in another session replays the cached answer."""
+        sample_agent.response_cache_enabled = True
+        await db_session.commit()
+
+        first_service, first = await self._run(db_session, sample_session.id, "Hours?")
+        other_session = await self._new_session(db_session, sample_agent)
+        second_service, second = await self._run(db_session, other_session, "hours?")
+
+        assert first_service.openai.chat_stream.call_count == 1
+        assert second_service.openai.chat_stream.call_count == 0
+        assert second[-1][0] == "done"
+        assert second[-1][1]["cached"] is True
+        assert second[-1][1]["full_content"] == "Open 9 to 5"
+        assert "".join(d["content"] for e, d in second if e == "token") == "Open 9 to 5"
+
+    @pytest.mark.asyncio
+    async def test_follow_up_is_keyed_by_the_conversation(
+        self, db_session: AsyncSession, sample_agent: Agent, sample_session: Session
+    ):
+        """Test that a follow-up only hits after the same earlier turns."""
+        sample_agent.response_cache_enabled = True
+        await db_session.commit()
+        await self._run(db_session, sample_session.id, "Why?")
+
+        other_session = await self._new_session(db_session, sample_agent)
+        await self._run(db_session, other_session, "Hours?")
+        service, _ = await self._run(db_session, other_session, "Why?")
+
+        assert service.openai.chat_stream.call_count == 1
+        assert conversation_version([]) == ""
+        assert conversation_version([{"role": "user", "content": "Hours?"}]) != ""
+
+    @pytest.mark.asyncio
+    async def test_cache_disabled_by_default(
+        self, db_session: AsyncSession, sample_session: Session
+    ):
+        """Test that agents without opt-in always call the model."""
+        await self._run(db_session, sample_session.id, "Hours?")
+        service, events = await self._run(db_session, sample_session.id, "Hours?")
+
+        assert service.openai.chat_stream.call_count == 1
+        assert "cached" not in events[-1][1]
+
+    @pytest.mark.asyncio
+    async def test_bypass_skips_lookup(
+        self, db_session: AsyncSession, sample_agent: Agent, sample_session: Session
+    ):
+        """Test that use_cache=False forces a fresh completion."""
+        sample_agent.response_cache_enabled = True
+        await db_session.commit()
+
+        await self._run(db_session, sample_session.id, "Hours?")
+        service, _ = await self._run(db_session, sample_session.id, "Hours?", use_cache=False)
+
+        assert service.openai.chat_stream.call_count == 1
+
+
+class TestResponseCacheBypassHeader:
+    """Test suite for the bypass header on POST /api/sessions/{session_id}/messages."""
+
+    @pytest.mark.asyncio
+    async def test_bypass_header_disables_cache(
+        self, client: AsyncClient, sample_session: Session
+    ):
+        """Test that the bypass header is forwarded as use_cache=False."""
+        with patch("app.services.chat_service.ChatService") as mock_chat_service:
+            calls = []
+
+            async def mock_stream(*args):
+                calls.append(args)
+                yield "event: done\ndata: {}\n\n"
+
+            mock_instance = MagicMock()
+            mock_instance.send_message_stream = mock_stream
+            mock_chat_service.return_value = mock_instance
+
+            response = await client.post(
+                f"/api/sessions/{sample_session.id}/messages",
+                json={"content": "Hello"},
+                headers={"X-Cache-Bypass": "1"},
+            )
+
+            assert response.status_code == 200
+            assert calls[0][2] is False
+
+    @pytest.mark.asyncio
+    async def test_agent_cache_flag_round_trip(self, client: AsyncClient):
+        """Test that response_cache_enabled can be set on create and update."""
+        response = await client.post(
+            "/api/agents",
+            json={"name": "Support", "system_prompt": "Help.", "response_cache_enabled": True},
+        )
+        assert response.json()["response_cache_enabled"] is True
+
+        agent_id = response.json()["id"]
+        response = await client.put(
+            f"/api/agents/{agent_id}", json={"response_cache_enabled": False}
+        )
+        assert response.json()["response_cache_enabled"] is False
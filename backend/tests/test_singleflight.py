@@ -0,0 +1,126 @@
+"""
+Tests for single-flight coalescing of upstream calls.
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.integrations.openai_client import OpenAIClient
+from app.integrations.singleflight import SingleFlight, make_key
+
+
+class TestSingleFlight:
+    """Test suite for SingleFlight."""
+
+    def test_make_key_is_order_independent_for_dicts(self):
+        """Test that equal requests produce equal keys."""
+        assert make_key({"a": 1, "b": [1, 2]}) == make_key({"b": [1, 2], "a": 1})
+        assert make_key({"a": 1}) != make_key({"a": 2})
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_upstream_call(self):
+        """Test that identical in-flight calls run the function once."""
+        flights = SingleFlight()
+        calls = 0
+
+        async def upstream():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*[flights.do("key", upstream) for _ in range(5)])
+
+        assert results == ["result"] * 5
+        assert calls == 1
+        assert flights.shared_calls == 4
+        assert flights.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_errors_propagate_to_all_waiters(self):
+        """Test that an upstream failure reaches every waiter."""
+        flights = SingleFlight()
+
+        async def upstream():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("rate_limit")
+
+        results = await asyncio.gather(
+            *[flights.do("key", upstream) for _ in range(3)], return_exceptions=True
+        )
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    @pytest.mark.asyncio
+    async def test_sequential_calls_are_not_cached(self):
+        """Test that a finished call is not reused."""
+        flights = SingleFlight()
+        upstream = AsyncMock(return_value="x")
+
+        await flights.do("key", upstream)
+        await flights.do("key", upstream)
+
+        assert upstream.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_stream_is_multicast(self):
+        """Test that concurrent identical streams share one upstream stream."""
+        flights = SingleFlight()
+        starts = 0
+
+        async def upstream():
+            nonlocal starts
+            starts += 1
+            for token in ["a", "b", "c"]:
+                await asyncio.sleep(0.005)
+                yield token
+
+        async def consume():
+            return [t async for t in flights.stream("key", upstream)]
+
+        results = await asyncio.gather(consume(), consume(), consume())
+
+        assert results == [["a", "b", "c"]] * 3
+        assert starts == 1
+
+    @pytest.mark.asyncio
+    async def test_finished_stream_is_not_replayed(self):
+        """Test that a stream started right after another finished goes upstream again."""
+        flights = SingleFlight()
+        starts = 0
+
+        async def upstream():
+            nonlocal starts
+            starts += 1
+            yield "a"
+
+        for _ in range(2):
+            assert [t async for t in flights.stream("key", upstream)] == ["a"]
+
+        assert starts == 2
+
+
+class TestOpenAIClientSingleFlight:
+    """Test suite for coalescing inside OpenAIClient."""
+
+    @pytest.mark.asyncio
+    async def test_identical_chat_completions_coalesce(self, monkeypatch):
+        """Test that identical concurrent completions make one API call."""
+        client = OpenAIClient()
+
+        async def create(**kwargs):
+            await asyncio.sleep(0.01)
+            completion = MagicMock(choices=[MagicMock(message=MagicMock(content="hi"))], usage=None)
+            return MagicMock(headers={}, parse=MagicMock(return_value=completion))
+
+        monkeypatch.setattr(OpenAIClient, "chat_client", MagicMock())
+        client.chat_client.chat.completions.with_raw_response.create = AsyncMock(side_effect=create)
+
+        messages = [{"role": "user", "content": "Hello"}]
+        results = await asyncio.gather(
+            *[client.chat_completion("system", messages) for _ in range(4)]
+        )
+
+        assert results == ["hi"] * 4
+        assert client.chat_client.chat.completions.with_raw_response.create.call_count == 1
@@ -0,0 +1,223 @@
+"""
+Tests for sentence-pipelined TTS in the voice path.
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.session import Session
+from app.services.speech_pipeline import Segment, SpeechPipeline, split_sentences, stitch_mp3
+from app.services.audio_store import LocalAudioStore
+from app.services.tts_cache import TTSCache
+from app.services.voice_service import VoiceService
+
+
+async def stream(*tokens):
+    for token in tokens:
+        yield token
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+class TestSplitSentences:
+    """Test suite for split_sentences."""
+
+    @pytest.mark.asyncio
+    async def test_splits_on_sentence_boundaries_across_tokens(self):
+        """Test that sentences are emitted as soon as they end, even mid-token."""
+        tokens = stream("The weather is ", "nice today. It will", " rain tomorrow!\nBring", " an umbrella")
+
+        sentences = await collect(split_sentences(tokens, min_chars=5, max_chars=300))
+
+        assert sentences == [
+            "The weather is nice today.",
+            "It will rain tomorrow!",
+            "Bring an umbrella",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_short_sentences_merge_with_the_next(self):
+        """Test that sentences under min_chars are not synthesized alone."""
+        sentences = await collect(
+            split_sentences(stream("Sure! Here is the answer you wanted. Bye."), min_chars=20)
+        )
+
+        assert sentences == ["Sure! Here is the answer you wanted.", "Bye."]
+
+    @pytest.mark.asyncio
+    async def test_decimals_do_not_end_a_sentence(self):
+        """Test that a period without following whitespace is not a boundary."""
+        sentences = await collect(split_sentences(stream("Pi is about 3.14 in value. Yes."), min_chars=1))
+
+        assert sentences == ["Pi is about 3.14 in value.", "Yes."]
+
+    @pytest.mark.asyncio
+    async def test_long_sentences_are_cut_at_clause_breaks(self):
+        """Test that overlong sentences are split at a comma rather than mid-word."""
+        text = "word " * 10 + "and then, " + "more " * 10
+
+        sentences = await collect(split_sentences(stream(text), min_chars=1, max_chars=70))
+
+        assert sentences[0].endswith("then,")
+        assert " ".join(sentences).split() == text.split()
+
+
+class TestStitchMp3:
+    """Test suite for stitch_mp3."""
+
+    def test_strips_id3_tags_after_the_first_segment(self):
+        """Test that only the first segment keeps its ID3 header."""
+        tag = b"ID3\x04\x00\x00\x00\x00\x00\x02" + b"xx"
+        segments = [tag + b"AAA", tag + b"BBB", b"CCC"]
+
+        assert stitch_mp3(segments) == tag + b"AAABBBCCC"
+        assert stitch_mp3([]) == b""
+
+
+class TestSpeechPipeline:
+    """Test suite for SpeechPipeline."""
+
+    @pytest.mark.asyncio
+    async def test_tts_starts_before_generation_finishes(self):
+        """Test that the first sentence is synthesized while tokens still stream."""
+        events = []
+
+        async def synthesize(text):
+            events.append(("tts", text))
+            return text.encode()
+
+        async def tokens():
+            for token in ["First sentence is here. ", "Second sentence ", "follows now."]:
+                events.append(("token", token))
+                await asyncio.sleep(0.01)
+                yield token
+
+        pipeline = SpeechPipeline(synthesize, max_concurrency=2)
+        text = await pipeline.run(tokens())
+        segments = await pipeline.audio()
+
+        assert text == "First sentence is here. Second sentence follows now."
+        assert segments == [b"First sentence is here.", b"Second sentence follows now."]
+        assert events.index(("tts", "First sentence is here.")) < events.index(("token", "follows now."))
+
+    @pytest.mark.asyncio
+    async def test_segments_keep_sentence_order(self):
+        """Test that audio is returned in sentence order even if TTS finishes out of order."""
+        async def synthesize(text):
+            await asyncio.sleep(0.03 if text.startswith("Slow") else 0)
+            return text.encode()
+
+        pipeline = SpeechPipeline(synthesize, max_concurrency=3)
+        await pipeline.run(stream("Slow first sentence here. Fast second sentence here."))
+
+        assert await pipeline.audio() == [b"Slow first sentence here.", b"Fast second sentence here."]
+
+    @pytest.mark.asyncio
+    async def test_generation_failure_cancels_pending_tts(self):
+        """Test that a failing stream cancels segments already scheduled."""
+        started = asyncio.Event()
+
+        async def synthesize(text):
+            started.set()
+            await asyncio.sleep(10)
+            return b""
+
+        async def tokens():
+            yield "A complete first sentence. "
+            await started.wait()
+            raise RuntimeError("stream broke")
+
+        pipeline = SpeechPipeline(synthesize)
+        with pytest.raises(RuntimeError):
+            await pipeline.run(tokens())
+
+        await asyncio.sleep(0)
+        assert pipeline._tasks[0].cancelled()
+
+
+class TestVoiceServicePipeline:
+    """Test suite for the streamed voice answer in VoiceService."""
+
+    @pytest.mark.asyncio
+    async def test_voice_answer_is_streamed_and_stitched(
+        self, db_session: AsyncSession, sample_session: Session, tmp_path
+    ):
+        """Test that the voice path streams the answer and stitches per-sentence audio."""
+        service = VoiceService(db_session)
+        service.openai = MagicMock(tts_voice="alloy", tts_model="tts-1")
+        service.openai.speech_to_text = AsyncMock(return_value="What is the weather?")
+
+        async def chat_stream(**kwargs):
+            for token in ["It is sunny and warm today. ", "Expect clear skies tonight."]:
+                yield token
+
+        service.openai.chat_stream = chat_stream
+        service.openai.text_to_speech = AsyncMock(side_effect=lambda text, **kwargs: text.encode())
+        upload = MagicMock(content_type="audio/webm")
+
+        store = LocalAudioStore(str(tmp_path))
+        cache = TTSCache(store)
+        save = AsyncMock(return_value="/api/audio/uploads/in.webm")
+        with patch.object(service, "_save_audio_file", save), \
+             patch("app.services.voice_service.tts_cache", cache):
+            response = await service.process_voice_message(sample_session.id, upload, b"audio")
+
+        content = "It is sunny and warm today. Expect clear skies tonight."
+        assert response.assistant_message.content == content
+        assert service.openai.text_to_speech.call_count == 2
+        tts_url = response.assistant_message.tts_audio_url
+        stitched = store.local_path("tts", tts_url.rsplit("/", 1)[-1]).read_bytes()
+        assert stitched == b"It is sunny and warm today.Expect clear skies tonight."
+
+
+class TestSpeechPipelineStream:
+    """Test suite for SpeechPipeline.stream."""
+
+    @pytest.mark.asyncio
+    async def test_interleaves_text_and_segments(self):
+        """Test that the first segment arrives before generation has finished."""
+        async def synthesize(text):
+            return text.encode()
+
+        async def tokens():
+            yield "The first sentence is done. "
+            await asyncio.sleep(0.05)
+            yield "The second one is too."
+
+        pipeline = SpeechPipeline(synthesize)
+        items = [item async for item in pipeline.stream(tokens())]
+
+        kinds = ["segment" if isinstance(item, Segment) else "text" for item in items]
+        assert kinds == ["text", "segment", "text", "segment"]
+        assert pipeline.text == "The first sentence is done. The second one is too."
+
+    @pytest.mark.asyncio
+    async def test_tts_failure_keeps_text_streaming(self):
+        """Test that a failed segment stops audio but not the text."""
+        async def synthesize(text):
+            raise RuntimeError("tts down")
+
+        pipeline = SpeechPipeline(synthesize)
+        items = [item async for item in pipeline.stream(stream("First sentence goes here. ", "And a second."))]
+
+        assert all(isinstance(item, str) for item in items)
+        assert isinstance(pipeline.tts_error, RuntimeError)
+        assert pipeline.text == "First sentence goes here. And a second."
+
+    @pytest.mark.asyncio
+    async def test_generation_failure_is_raised(self):
+        """Test that a failing token stream propagates out of stream()."""
+        async def synthesize(text):
+            return b""
+
+        async def tokens():
+            yield "Partial sentence. "
+            raise RuntimeError("stream broke")
+
+        pipeline = SpeechPipeline(synthesize)
+        with pytest.raises(RuntimeError):
+            [item async for item in pipeline.stream(tokens())]
@@ -0,0 +1,98 @@
+"""
+Tests for SSE encoding and token coalescing.
+"""
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+
+from app.utils.sse import coalesce_tokens, encode_event, encode_token
+
+
+async def token_source(tokens, delay: float = 0.0):
+    """Yield tokens with an optional delay before each one."""
+    for token in tokens:
+        if delay:
+            await asyncio.sleep(delay)
+        yield token
+
+
+class TestEncoding:
+    """Test suite for SSE frame encoding."""
+
+    def test_encode_token_matches_json_payload(self):
+        """Test that the pre-encoded template produces valid JSON data."""
+        frame = encode_token('He said "hi" 🎉\n')
+
+        assert frame.startswith(b"event: token\ndata: ")
+        assert frame.endswith(b"\n\n")
+        data = frame.decode().split("data: ", 1)[1].strip()
+        assert json.loads(data) == {"content": 'He said "hi" 🎉\n'}
+
+    def test_encode_event(self):
+        """Test that named events carry their JSON payload."""
+        frame = encode_event("done", {"message_id": "abc"})
+
+        assert frame == b'event: done\ndata: {"message_id": "abc"}\n\n'
+
+
+class TestCoalesceTokens:
+    """Test suite for coalesce_tokens."""
+
+    @pytest.mark.asyncio
+    async def test_fast_tokens_are_merged_by_size(self):
+        """Test that a burst of tokens is flushed on the byte limit."""
+        tokens = ["ab"] * 10
+        frames = [f async for f in coalesce_tokens(token_source(tokens), 1000, 6)]
+
+        assert "".join(frames) == "ab" * 10
+        assert frames[0] == "ababab"
+        assert len(frames) == 4
+
+    @pytest.mark.asyncio
+    async def test_stalled_stream_flushes_on_interval(self):
+        """Test that buffered text is sent when the model stalls."""
+
+        async def stalling():
+            yield "Hello"
+            await asyncio.sleep(0.2)
+            yield " world"
+
+        frames = []
+        async for frame in coalesce_tokens(stalling(), 20, 1024):
+            frames.append(frame)
+
+        assert frames == ["Hello", " world"]
+
+    @pytest.mark.asyncio
+    async def test_one_task_per_stream(self):
+        """Test that tokens are not each wrapped in their own task."""
+        real_ensure_future = asyncio.ensure_future
+        with patch("app.utils.sse.asyncio.ensure_future", side_effect=real_ensure_future) as ensure_future:
+            frames = [f async for f in coalesce_tokens(token_source(["ab"] * 200), 1000, 64)]
+
+        assert "".join(frames) == "ab" * 200
+        assert ensure_future.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_zero_interval_passes_through(self):
+        """Test that coalescing can be disabled."""
+        frames = [f async for f in coalesce_tokens(token_source(["a", "b", "c"]), 0, 256)]
+
+        assert frames == ["a", "b", "c"]
+
+    @pytest.mark.asyncio
+    async def test_buffered_text_flushed_before_error(self):
+        """Test that tokens received before an upstream error are not lost."""
+
+        async def failing():
+            yield "partial"
+            raise RuntimeError("boom")
+
+        frames = []
+        with pytest.raises(RuntimeError):
+            async for frame in coalesce_tokens(failing(), 1000, 1024):
+                frames.append(frame)
+
+        assert frames == ["partial"]
@@ -0,0 +1,220 @@
+"""
+Tests for resumable SSE generations.
+
+Endpoints tested:
+- POST /api/sessions/{session_id}/messages - X-Stream-Id and sequence ids
+- GET /api/sessions/{session_id}/messages/stream/{stream_id} - Last-Event-ID replay
+"""
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.message import Message, MessageRole
+from app.models.session import Session
+from app.services.chat_service import ChatService
+from app.services.stream_registry import GenerationStream, stream_registry
+
+
+def event_ids(body: str) -> list[int]:
+    """Extract the sequence ids of SSE frames."""
+    return [int(line[4:]) for line in body.split("\n") if line.startswith("id: ")]
+
+
+def mock_chat_service(events: list[str]):
+    """Patch ChatService with a stream yielding the given frames."""
+    patcher = patch("app.services.chat_service.ChatService")
+    mock_chat_service = patcher.start()
+
+    async def mock_stream(*args):
+        for event in events:
+            yield event
+
+    mock_instance = MagicMock()
+    mock_instance.send_message_stream = mock_stream
+    mock_chat_service.return_value = mock_instance
+    return patcher
+
+
+class TestGenerationStream:
+    """Test suite for GenerationStream buffering."""
+
+    @pytest.mark.asyncio
+    async def test_subscribe_replays_after_cursor(self):
+        """Test that subscribers only get events newer than their cursor."""
+        stream = GenerationStream("session")
+        for i in range(5):
+            stream.publish(f"event: token\ndata: {i}\n\n")
+        stream.finish()
+
+        frames = [f async for f in stream.subscribe(3)]
+
+        assert [f.split(b"\n")[0] for f in frames] == [b"id: 4", b"id: 5"]
+
+    @pytest.mark.asyncio
+    async def test_subscribe_follows_live_events(self):
+        """Test that a subscriber receives events published after it joined."""
+        stream = GenerationStream("session")
+        received = []
+
+        async def consume():
+            async for frame in stream.subscribe():
+                received.append(frame)
+
+        consumer = asyncio.create_task(consume())
+        await asyncio.sleep(0)
+        stream.publish("event: token\ndata: a\n\n")
+        await asyncio.sleep(0)
+        stream.publish("event: done\ndata: b\n\n")
+        stream.finish()
+        await asyncio.wait_for(consumer, timeout=1)
+
+        assert len(received) == 2
+
+    @pytest.mark.asyncio
+    async def test_buffer_is_bounded(self):
+        """Test that the oldest events are dropped beyond the buffer size."""
+        stream = GenerationStream("session", max_events=3)
+        for i in range(10):
+            stream.publish(f"data: {i}\n\n")
+        stream.finish()
+
+        frames = [f async for f in stream.subscribe()]
+
+        assert len(frames) == 4
+        assert frames[1].startswith(b"id: 8\n")
+
+    @pytest.mark.asyncio
+    async def test_missed_events_are_reported_as_a_gap(self):
+        """Test that a cursor older than the buffer gets a gap event, not a silent skip."""
+        stream = GenerationStream("session", max_events=3)
+        for i in range(10):
+            stream.publish(f"data: {i}\n\n")
+        stream.finish()
+
+        frames = [f async for f in stream.subscribe(4)]
+
+        assert frames[0] == b'event: gap\ndata: {"missed_from": 5, "resumes_at": 8}\n\n'
+        assert [f.split(b"\n")[0] for f in frames[1:]] == [b"id: 8", b"id: 9", b"id: 10"]
+        assert [f async for f in stream.subscribe(7)][0].startswith(b"id: 8\n")
+
+
+class TestResumeStreamEndpoint:
+    """Test suite for resuming a generation over HTTP."""
+
+    @pytest.mark.asyncio
+    async def test_post_returns_stream_id_and_event_ids(
+        self, client: AsyncClient, sample_session: Session
+    ):
+        """Test that the POST stream exposes its id and numbers each event."""
+        patcher = mock_chat_service(["event: token\ndata: {}\n\n", "event: done\ndata: {}\n\n"])
+        try:
+            response = await client.post(
+                f"/api/sessions/{sample_session.id}/messages", json={"content": "Hi"}
+            )
+        finally:
+            patcher.stop()
+
+        assert response.status_code == 200
+        assert response.headers["x-stream-id"]
+        assert event_ids(response.text) == [1, 2]
+
+    @pytest.mark.asyncio
+    async def test_stream_id_is_readable_cross_origin(
+        self, client: AsyncClient, sample_session: Session
+    ):
+        """Test that CORS exposes X-Stream-Id to a frontend on another origin."""
+        patcher = mock_chat_service(["event: done\ndata: {}\n\n"])
+        try:
+            response = await client.post(
+                f"/api/sessions/{sample_session.id}/messages",
+                json={"content": "Hi"},
+                headers={"Origin": "http://localhost:5173"},
+            )
+        finally:
+            patcher.stop()
+
+        assert "x-stream-id" in response.headers["access-control-expose-headers"].lower()
+
+    @pytest.mark.asyncio
+    async def test_resume_with_last_event_id(
+        self, client: AsyncClient, sample_session: Session
+    ):
+        """Test that reconnecting replays only the missed events."""
+        patcher = mock_chat_service([f"event: token\ndata: {i}\n\n" for i in range(4)])
+        try:
+            response = await client.post(
+                f"/api/sessions/{sample_session.id}/messages", json={"content": "Hi"}
+            )
+        finally:
+            patcher.stop()
+        stream_id = response.headers["x-stream-id"]
+
+        resumed = await client.get(
+            f"/api/sessions/{sample_session.id}/messages/stream/{stream_id}",
+            headers={"Last-Event-ID": "2"},
+        )
+
+        assert resumed.status_code == 200
+        assert event_ids(resumed.text) == [3, 4]
+
+    @pytest.mark.asyncio
+    async def test_resume_unknown_stream(self, client: AsyncClient, sample_session: Session):
+        """Test that an unknown stream id returns 404."""
+        response = await client.get(
+            f"/api/sessions/{sample_session.id}/messages/stream/does-not-exist"
+        )
+
+        assert response.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_resume_rejects_other_session(self, client: AsyncClient, sample_session: Session):
+        """Test that a stream cannot be read through another session's URL."""
+        stream = stream_registry.start(sample_session.id, _empty())
+        await stream.task
+
+        response = await client.get(f"/api/sessions/other-session/messages/stream/{stream.id}")
+
+        assert response.status_code == 404
+
+
+class TestPartialPersistence:
+    """Test suite for periodic partial saves of the assistant message."""
+
+    @pytest.mark.asyncio
+    async def test_partial_saves_update_a_single_row(
+        self, db_session: AsyncSession, sample_session: Session
+    ):
+        """Test that partial persistence reuses one assistant message row."""
+        chat_service = ChatService(db_session)
+        chat_service.openai = MagicMock()
+
+        async def mock_stream(**kwargs):
+            for token in ["one ", "two ", "three"]:
+                await asyncio.sleep(0.03)
+                yield token
+
+        chat_service.openai.chat_stream = mock_stream
+
+        with patch.object(settings, "STREAM_PARTIAL_PERSIST_INTERVAL_SECONDS", 0.01):
+            with patch.object(chat_service, "_get_rag_context", return_value=None):
+                [e async for e in chat_service.send_message_stream(sample_session.id, "Count")]
+
+        result = await db_session.execute(
+            select(Message).where(
+                Message.session_id == sample_session.id,
+                Message.role == MessageRole.ASSISTANT.value,
+            )
+        )
+        assistant_messages = result.scalars().all()
+        assert len(assistant_messages) == 1
+        assert assistant_messages[0].content == "one two three"
+
+
+async def _empty():
+    return
+    yield
@@ -0,0 +1,104 @@
+"""
+Tests for the transcript cache and content-addressed voice uploads.
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.session import Session
+from app.services.audio_store import LocalAudioStore
+from app.services.audio_upload import AudioUpload
+from app.services.stt_cache import STTCache, audio_digest
+from app.services.tts_cache import TTSCache
+from app.services.voice_service import VoiceService
+
+
+class TestSTTCache:
+    """Test suite for STTCache."""
+
+    @pytest.mark.asyncio
+    async def test_hit_is_keyed_by_model_and_language(self):
+        """Test that a transcript is reused only for the same audio, model and language."""
+        cache = STTCache()
+        transcribe = AsyncMock(return_value="Hello there")
+        digest = audio_digest(b"audio")
+
+        assert await cache.transcribe(digest, "whisper-1", None, transcribe) == "Hello there"
+        assert await cache.transcribe(digest, "whisper-1", None, transcribe) == "Hello there"
+        assert transcribe.await_count == 1
+
+        await cache.transcribe(digest, "whisper-1", "de", transcribe)
+        await cache.transcribe(audio_digest(b"other audio"), "whisper-1", None, transcribe)
+        assert transcribe.await_count == 3
+
+    @pytest.mark.asyncio
+    async def test_entries_expire_and_are_bounded(self):
+        """Test the TTL and the LRU entry limit."""
+        cache = STTCache(max_entries=2, ttl_seconds=60)
+        for digest in ("a", "b", "c"):
+            cache.put(cache.key(digest, "whisper-1", None), digest)
+
+        assert len(cache) == 2
+        assert cache.get(cache.key("a", "whisper-1", None)) is None
+        with patch("app.services.stt_cache.time.monotonic", return_value=1e12):
+            assert cache.get(cache.key("c", "whisper-1", None)) is None
+
+    @pytest.mark.asyncio
+    async def test_concurrent_retry_shares_the_call_and_failures_are_not_kept(self):
+        """Test that a retry during transcription waits for it, and errors are retried."""
+        cache = STTCache()
+        release = asyncio.Event()
+        calls = 0
+
+        async def transcribe():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "shared"
+
+        first = asyncio.ensure_future(cache.transcribe("d", "whisper-1", None, transcribe))
+        second = asyncio.ensure_future(cache.transcribe("d", "whisper-1", None, transcribe))
+        await asyncio.sleep(0)
+        release.set()
+        assert await asyncio.gather(first, second) == ["shared", "shared"]
+        assert calls == 1
+
+        failing = AsyncMock(side_effect=[RuntimeError("whisper down"), "recovered"])
+        with pytest.raises(RuntimeError):
+            await cache.transcribe("e", "whisper-1", None, failing)
+        assert await cache.transcribe("e", "whisper-1", None, failing) == "recovered"
+
+
+class TestRetriedUpload:
+    """Test suite for retried voice uploads."""
+
+    @pytest.mark.asyncio
+    async def test_retry_skips_whisper_and_reuses_the_stored_upload(
+        self, db_session: AsyncSession, sample_session: Session, tmp_path
+    ):
+        """Test that the same bytes are transcribed and stored once."""
+        async def chat_stream(**kwargs):
+            yield "Hi."
+
+        mock = MagicMock(tts_voice="alloy", tts_model="tts-1", whisper_model="whisper-1", whisper_language=None)
+        mock.speech_to_text = AsyncMock(return_value="Hello")
+        mock.chat_stream = chat_stream
+        mock.text_to_speech = AsyncMock(return_value=b"mp3")
+        store = LocalAudioStore(str(tmp_path))
+        upload = AudioUpload(b"voice-bytes", "clip.webm", "audio/webm")
+
+        responses = []
+        with patch("app.services.voice_service.openai_client", mock), \
+             patch("app.services.voice_service.audio_store", store), \
+             patch("app.services.voice_service.tts_cache", TTSCache(store)):
+            for _ in range(2):
+                service = VoiceService(db_session)
+                responses.append(await service.process_voice_message(sample_session.id, upload, upload.content))
+
+        assert mock.speech_to_text.await_count == 1
+        first, retry = (response.user_message for response in responses)
+        assert retry.content == first.content == "Hello"
+        assert retry.audio_url == first.audio_url == f"/api/audio/uploads/{audio_digest(b'voice-bytes')}.webm"
+        assert [stored.name for stored in await store.list("uploads")] == [first.audio_url.rsplit("/", 1)[-1]]
@@ -0,0 +1,120 @@
+"""
+Tests for parallel transcription of long uploaded recordings.
+"""
+import asyncio
+import io
+
+import numpy as np
+import pytest
+
+from app.services import transcription
+from app.services.transcription import (
+    frame_db,
+    merge_overlapping,
+    pcm_to_wav,
+    split_at_pauses,
+    transcribe_recording,
+)
+from tests.test_voice_socket import RATE, silence, tone
+
+
+def webm_opus(pcm: bytes) -> bytes:
+    """Encode 16-bit mono PCM the way MediaRecorder does: Opus in WebM."""
+    av = pytest.importorskip("av")
+    buffer = io.BytesIO()
+    with av.open(buffer, "w", format="webm") as container:
+        stream = container.add_stream("libopus", rate=48000)
+        stream.layout = "mono"
+        resampler = av.AudioResampler(format="s16", layout="mono", rate=48000)
+        frame = av.AudioFrame.from_ndarray(
+            np.frombuffer(pcm, dtype="<i2").reshape(1, -1), format="s16", layout="mono"
+        )
+        frame.sample_rate = RATE
+        for resampled in resampler.resample(frame) + resampler.resample(None):
+            container.mux(stream.encode(resampled))
+        container.mux(stream.encode(None))
+    return buffer.getvalue()
+
+
+class RecordingSTT:
+    """Fake STT that records its calls and the peak number in flight."""
+
+    def __init__(self):
+        self.calls = []
+        self.in_flight = self.peak = 0
+
+    async def __call__(self, audio, filename):
+        self.calls.append(filename)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return f"part {filename}"
+
+
+class TestTranscribeRecording:
+    """Test suite for parallel transcription of long uploads."""
+
+    def test_cuts_land_in_pauses(self):
+        """Test that segments are cut in the silence between phrases."""
+        pcm = (tone(7.0) + silence(1.0)) * 5
+        spans = split_at_pauses(pcm, RATE, segment_seconds=10, overlap_ms=200)
+
+        assert len(spans) > 1
+        assert spans[0][0] == 0 and spans[-1][1] == len(pcm)
+        overlap = RATE * 2 // 5  # 200 ms of 16-bit samples
+        for (_, previous_end), (start, _) in zip(spans, spans[1:]):
+            assert previous_end > start  # neighbours overlap
+            cut = start + overlap
+            assert frame_db(pcm[cut:cut + 640]) == float("-inf")
+
+    def test_overlapping_words_are_merged(self):
+        """Test that words repeated across a segment boundary appear once."""
+        texts = ["Hello there, how are", "how are you doing today", "Doing today, we ship.", ""]
+
+        assert merge_overlapping(texts) == "Hello there, how are you doing today we ship."
+
+    def test_single_word_coincidence_is_kept(self):
+        """Test that one matching word across a boundary is not taken for a repeat."""
+        assert merge_overlapping(["I said no.", "No means no"]) == "I said no. No means no"
+
+    @pytest.mark.asyncio
+    async def test_long_wav_is_transcribed_concurrently(self):
+        """Test that a long WAV fans out to concurrent STT calls and a short one does not."""
+        stt = RecordingSTT()
+
+        long_wav = pcm_to_wav((tone(9.0) + silence(1.0)) * 4, RATE)
+        text = await transcribe_recording(stt, long_wav, "audio.wav")
+
+        assert len(stt.calls) > 1 and stt.peak == len(stt.calls)
+        assert text == " ".join(f"part segment-{i}.wav" for i in range(len(stt.calls)))
+
+        short_wav = pcm_to_wav(tone(5.0), RATE)
+        assert await transcribe_recording(stt, short_wav, "audio.wav") == "part audio.wav"
+        assert await transcribe_recording(stt, b"WEBM" * 10, "audio.webm") == "part audio.webm"
+
+    @pytest.mark.asyncio
+    async def test_long_webm_opus_is_decoded_and_split(self):
+        """Test that a browser's WebM/Opus recording takes the parallel path too."""
+        stt = RecordingSTT()
+        recording = webm_opus((tone(9.0) + silence(1.0)) * 4)
+
+        text = await transcribe_recording(stt, recording, "audio.webm")
+
+        assert len(stt.calls) > 1 and stt.peak == len(stt.calls)
+        assert all(name.endswith(".wav") for name in stt.calls)
+        assert text == " ".join(f"part segment-{i}.wav" for i in range(len(stt.calls)))
+
+        pcm, sample_rate = await transcription.decode_recording(recording)
+        assert sample_rate == transcription.DECODE_SAMPLE_RATE
+        assert abs(len(pcm) / (sample_rate * 2) - 40.0) < 0.1
+
+    @pytest.mark.asyncio
+    async def test_webm_is_sent_whole_without_pyav(self, monkeypatch):
+        """Test that compressed uploads fall back to one STT call when PyAV is missing."""
+        stt = RecordingSTT()
+        recording = webm_opus((tone(9.0) + silence(1.0)) * 4)
+        monkeypatch.setattr(transcription, "av", None)
+
+        assert await transcribe_recording(stt, recording, "audio.webm") == "part audio.webm"
+        assert stt.calls == ["audio.webm"]
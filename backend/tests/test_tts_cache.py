@@ -0,0 +1,160 @@
+"""
+Tests for the content-addressed TTS cache and TTS format negotiation.
+"""
+import os
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.message import Message
+from app.models.session import Session
+from app.services.audio_formats import negotiate_tts_format
+from app.services.audio_store import LocalAudioStore
+from app.services.tts_cache import TTSCache, speech_key
+from tests import conftest
+
+
+class TestTTSCache:
+    """Test suite for TTSCache."""
+
+    @pytest.fixture(autouse=True)
+    def test_db(self, db_session: AsyncSession):
+        """Evictions unlink messages through their own session; use the test DB."""
+        with patch("app.database.connection.async_session_maker", conftest.test_async_session_maker):
+            yield
+
+    def test_key_depends_on_text_voice_and_model(self):
+        """Test that each input changes the content address."""
+        base = speech_key("Hello", "alloy", "tts-1")
+
+        assert base == speech_key("Hello", "alloy", "tts-1")
+        assert base != speech_key("Hello!", "alloy", "tts-1")
+        assert base != speech_key("Hello", "nova", "tts-1")
+        assert base != speech_key("Hello", "alloy", "tts-1-hd")
+
+    @pytest.mark.asyncio
+    async def test_repeat_text_is_synthesized_once(self, tmp_path):
+        """Test that identical text hits the cache and shares one URL."""
+        cache = TTSCache(LocalAudioStore(str(tmp_path)))
+        synthesize = AsyncMock(return_value=b"audio")
+
+        first = await cache.synthesize("Hi there", "alloy", "tts-1", synthesize)
+        second = await cache.synthesize("Hi there", "alloy", "tts-1", synthesize)
+
+        assert first == second == (b"audio", first[1])
+        assert first[1] == f"/api/audio/tts/{speech_key('Hi there', 'alloy', 'tts-1')}.mp3"
+        assert synthesize.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction_respects_byte_budget(
+        self, tmp_path, db_session: AsyncSession, sample_session: Session
+    ):
+        """Test that the least recently used files are deleted past max_bytes and unlinked."""
+        store = LocalAudioStore(str(tmp_path))
+        cache = TTSCache(store, max_bytes=25)
+        keys = [speech_key(text, "v", "m") for text in ("a", "b", "c")]
+
+        await cache.put(keys[0], b"x" * 10)
+        message = Message(
+            session_id=sample_session.id,
+            role="assistant",
+            content="b",
+            tts_audio_url=await cache.put(keys[1], b"x" * 10),
+        )
+        db_session.add(message)
+        await db_session.commit()
+        message_id = message.id
+        assert await cache.lookup(keys[0])  # a is now the most recent
+        await cache.put(keys[2], b"x" * 10)
+
+        assert await cache.lookup(keys[1]) is None
+        assert store.local_path("tts", f"{keys[1]}.mp3") is None
+        assert await cache.lookup(keys[0]) and await cache.lookup(keys[2])
+        assert cache.total_bytes == 20
+
+        db_session.expire_all()
+        stored = (await db_session.execute(select(Message).where(Message.id == message_id))).scalar_one()
+        assert stored.tts_audio_url is None
+
+    @pytest.mark.asyncio
+    async def test_index_is_rebuilt_from_disk(self, tmp_path):
+        """Test that a restarted cache finds existing files, oldest first."""
+        directory = tmp_path / "tts"
+        directory.mkdir()
+        old, new = speech_key("old", "v", "m"), speech_key("new", "v", "m")
+        (directory / f"{old}.mp3").write_bytes(b"1" * 10)
+        (directory / f"{new}.mp3").write_bytes(b"2" * 10)
+        os.utime(directory / f"{old}.mp3", (1, 1))
+        (directory / "legacy-uuid.mp3").write_bytes(b"ignored")
+
+        cache = TTSCache(LocalAudioStore(str(tmp_path)), max_bytes=15)
+        await cache.load()
+
+        assert len(cache) == 1
+        assert await cache.get(new) == b"2" * 10
+        assert await cache.get(old) is None
+
+    @pytest.mark.asyncio
+    async def test_hits_renew_the_file_and_fallbacks_are_pinned(self, tmp_path):
+        """Test that a stale hit renews the file's mtime and pinned speech survives eviction."""
+        store = LocalAudioStore(str(tmp_path))
+        cache = TTSCache(store, max_bytes=25)
+        await cache.prerender(["Sorry."], "alloy", "tts-1", AsyncMock(return_value=b"f" * 10))
+        fallback = speech_key("Sorry.", "alloy", "tts-1")
+        key = speech_key("Hello", "alloy", "tts-1")
+        await cache.put(key, b"h" * 10)
+        os.utime(store.path("tts", f"{key}.mp3"), (1, 1))
+        await cache.load()
+
+        assert await cache.get(key) == b"h" * 10
+        assert os.stat(store.path("tts", f"{key}.mp3")).st_mtime > 1
+
+        for text in ("a", "b"):
+            await cache.put(speech_key(text, "alloy", "tts-1"), b"x" * 10)
+        assert await cache.lookup(fallback) is not None
+        assert await cache.lookup(key) is None
+
+    @pytest.mark.asyncio
+    async def test_prerender_skips_cached_texts(self, tmp_path):
+        """Test that pre-rendering only synthesizes what is missing."""
+        cache = TTSCache(LocalAudioStore(str(tmp_path)))
+        await cache.put(speech_key("Sorry.", "alloy", "tts-1"), b"cached")
+        synthesize = AsyncMock(return_value=b"new")
+
+        rendered = await cache.prerender(["Sorry.", "Try again."], "alloy", "tts-1", synthesize)
+
+        assert rendered == 1
+        synthesize.assert_awaited_once_with("Try again.")
+
+    @pytest.mark.asyncio
+    async def test_formats_are_cached_side_by_side(self, tmp_path):
+        """Test that each format of the same speech is its own file and URL."""
+        cache = TTSCache(LocalAudioStore(str(tmp_path)))
+        key = speech_key("Hello", "alloy", "tts-1")
+
+        mp3_url = await cache.put(key, b"mp3")
+        opus_url = await cache.put(key, b"opus", "opus")
+
+        assert mp3_url.endswith(f"{key}.mp3") and opus_url.endswith(f"{key}.opus")
+        assert await cache.get(key, "opus") == b"opus"
+        assert await cache.lookup(key, "aac") is None
+
+        restarted = TTSCache(LocalAudioStore(str(tmp_path)))
+        await restarted.load()
+        assert len(restarted) == 2
+
+
+class TestNegotiateTTSFormat:
+    """Test suite for negotiate_tts_format."""
+
+    def test_falls_back_to_mp3_only_when_audio_types_exclude_the_preferred_one(self):
+        """Test Accept headers with and without audio preferences."""
+        assert negotiate_tts_format("opus", None) == "opus"
+        assert negotiate_tts_format("opus", "text/event-stream") == "opus"
+        assert negotiate_tts_format("opus", "audio/ogg, audio/mpeg") == "opus"
+        assert negotiate_tts_format("aac", "audio/*") == "aac"
+        assert negotiate_tts_format("opus", "audio/mpeg, audio/aac") == "mp3"
+        assert negotiate_tts_format("opus", "audio/ogg;q=0, audio/mpeg") == "mp3"
+        assert negotiate_tts_format("flac", None) == "mp3"
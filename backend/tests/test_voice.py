@@ -347,6 +347,85 @@ class TestServeAudio:
             assert response.status_code == 404
 
 
+class TestServeAudioCaching:
+    """Test suite for validators, caching and ranges on GET /api/audio/..."""
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        """Serve audio from a local store in tmp_path."""
+        from app.services.audio_store import LocalAudioStore
+
+        store = LocalAudioStore(str(tmp_path))
+        with patch("app.routes.voice.audio_store", store):
+            yield store
+
+    @pytest.mark.asyncio
+    async def test_immutable_cache_headers_and_etag(self, client: AsyncClient, store):
+        """Test that audio is cacheable forever and revalidates with a 304."""
+        await store.put("tts", "0123abcd.mp3", b"MP3 content")
+
+        response = await client.get("/api/audio/tts/0123abcd.mp3")
+
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+        assert response.headers["etag"] == '"0123abcd"'
+
+        revalidated = await client.get(
+            "/api/audio/tts/0123abcd.mp3", headers={"If-None-Match": 'W/"0123abcd"'}
+        )
+        assert revalidated.status_code == 304
+        assert revalidated.content == b""
+
+    @pytest.mark.asyncio
+    async def test_range_request_returns_partial_content(self, client: AsyncClient, store):
+        """Test that a byte range is served as 206 for seeking."""
+        await store.put("uploads", "seek-test.webm", b"0123456789")
+
+        response = await client.get("/api/audio/uploads/seek-test.webm", headers={"Range": "bytes=2-5"})
+
+        assert response.status_code == 206
+        assert response.content == b"2345"
+        assert response.headers["content-range"] == "bytes 2-5/10"
+
+    @pytest.mark.asyncio
+    async def test_remote_store_fetches_only_the_range(self, client: AsyncClient):
+        """Test that stores without local files serve ranges through get_range."""
+        from app.services.audio_store import AudioStore
+
+        class RemoteStore(AudioStore):
+            requested = []
+
+            async def get(self, folder, name):
+                raise AssertionError("whole object read")
+
+            async def get_range(self, folder, name, start, end=None):
+                self.requested.append((start, end))
+                return b"0123456789"[start:], 10
+
+        store = RemoteStore()
+        with patch("app.routes.voice.audio_store", store):
+            response = await client.get("/api/audio/tts/remote-file.mp3", headers={"Range": "bytes=7-"})
+            unsatisfiable = await client.get("/api/audio/tts/remote-file.mp3", headers={"Range": "bytes=20-"})
+
+        assert response.status_code == 206
+        assert response.content == b"789"
+        assert response.headers["content-range"] == "bytes 7-9/10"
+        assert unsatisfiable.status_code == 416
+        assert store.requested == [(7, None), (20, None)]
+
+    @pytest.mark.asyncio
+    async def test_content_type_follows_extension(self, client: AsyncClient, store):
+        """Test that opus and aac speech are served with their own content types."""
+        await store.put("tts", "speech-1.opus", b"OggS")
+        await store.put("tts", "speech-2.aac", b"ADTS")
+
+        opus = await client.get("/api/audio/tts/speech-1.opus")
+        aac = await client.get("/api/audio/tts/speech-2.aac")
+
+        assert opus.headers["content-type"] == "audio/ogg"
+        assert aac.headers["content-type"] == "audio/aac"
+
+
 class TestVoiceValidation:
     """Test suite for voice input validation."""
 
@@ -385,3 +464,302 @@ class TestVoiceValidation:
             )
 
             assert response.status_code == 200
+
+    @pytest.mark.asyncio
+    async def test_too_long_audio_rejected_before_stt(
+        self, client: AsyncClient, sample_session: Session
+    ):
+        """Test that audio over MAX_AUDIO_DURATION never reaches the voice service."""
+        from app.services.transcription import pcm_to_wav
+
+        # 130 s of 4 kHz PCM: well under the size limit
+        long_wav = pcm_to_wav(b"\x00\x00" * 4000 * 130, 4000)
+
+        with patch("app.services.voice_service.VoiceService") as mock_voice_service:
+            response = await client.post(
+                f"/api/sessions/{sample_session.id}/voice",
+                files={"audio": ("long.wav", io.BytesIO(long_wav), "audio/wav")},
+            )
+
+        assert response.status_code == 400
+        assert "too long" in response.json()["detail"].lower()
+        mock_voice_service.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_oversized_stream_is_cut_off(self):
+        """Test that a body without Content-Length stops being read past the limit."""
+        from fastapi import HTTPException
+        from starlette.requests import Request
+
+        from app.services.audio_upload import receive_audio_upload
+
+        boundary = b"limit"
+        head = (
+            b"--limit\r\nContent-Disposition: form-data; name=\"audio\"; filename=\"a.webm\"\r\n"
+            b"Content-Type: audio/webm\r\n\r\n"
+        )
+        chunks = [head] + [b"\x00" * (1024 * 1024)] * 20
+        sent = []
+
+        async def receive():
+            sent.append(chunks[len(sent)])
+            return {"type": "http.request", "body": sent[-1], "more_body": len(sent) < len(chunks)}
+
+        request = Request(
+            {
+                "type": "http",
+                "method": "POST",
+                "headers": [(b"content-type", b"multipart/form-data; boundary=" + boundary)],
+            },
+            receive,
+        )
+
+        with pytest.raises(HTTPException) as exc_info:
+            await receive_audio_upload(request)
+
+        assert exc_info.value.status_code == 400
+        assert len(sent) < len(chunks)
+
+    @pytest.mark.asyncio
+    async def test_wav_upload_is_transcribed_as_wav(self, db_session, sample_session: Session, tmp_path):
+        """Test that the stored and transcribed extension follows the sniffed container."""
+        from app.services.audio_store import LocalAudioStore
+        from app.services.audio_upload import AudioUpload
+        from app.services.transcription import pcm_to_wav
+        from app.services.tts_cache import TTSCache
+        from app.services.voice_service import VoiceService
+
+        async def chat_stream(**kwargs):
+            yield "Hi."
+
+        service = VoiceService(db_session)
+        service.openai = MagicMock(tts_voice="alloy", tts_model="tts-1")
+        service.openai.speech_to_text = AsyncMock(return_value="Hello")
+        service.openai.chat_stream = chat_stream
+        service.openai.text_to_speech = AsyncMock(return_value=b"mp3")
+        wav = pcm_to_wav(b"\x00\x00" * 1600, 16000)
+        # Browsers often label WAV as webm or send no type at all
+        upload = AudioUpload(wav, "clip", "application/octet-stream")
+        save = AsyncMock(return_value="/api/audio/uploads/x.wav")
+
+        with patch.object(service, "_save_audio_file", save), \
+             patch("app.services.voice_service.tts_cache", TTSCache(LocalAudioStore(str(tmp_path)))):
+            await service.process_voice_message(sample_session.id, upload, upload.content)
+
+        assert service.openai.speech_to_text.call_args.args == (wav, "audio.wav")
+        assert save.call_args.args[1:] == ("uploads", "wav")
+
+
+def parse_sse(body: str) -> list[tuple[str, dict]]:
+    """Split an SSE body into (event, data) pairs."""
+    import json
+
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+        events.append((lines.get("event"), json.loads(lines.get("data", "{}"))))
+    return events
+
+
+class TestStreamVoiceMessage:
+    """Test suite for POST /api/sessions/{session_id}/voice/stream endpoint."""
+
+    @pytest.fixture
+    def mock_openai(self, tmp_path):
+        """Patch the OpenAI client used by VoiceService (and keep TTS files in tmp_path)."""
+        from app.services.audio_store import LocalAudioStore
+        from app.services.tts_cache import TTSCache
+        from app.services.voice_service import VoiceService
+
+        async def chat_stream(**kwargs):
+            for token in ["The answer is forty-two. ", "It always has been."]:
+                yield token
+
+        mock = MagicMock(tts_voice="alloy", tts_model="tts-1")
+        mock.speech_to_text = AsyncMock(return_value="What is the answer?")
+        mock.chat_stream = chat_stream
+        mock.text_to_speech = AsyncMock(side_effect=lambda text, **kwargs: b"MP3:" + text.encode())
+        urls = iter(f"/api/audio/tts/{i}.mp3" for i in range(10))
+
+        with patch("app.services.voice_service.openai_client", mock), \
+             patch("app.services.voice_service.tts_cache", TTSCache(LocalAudioStore(str(tmp_path)))), \
+             patch.object(VoiceService, "_save_audio_file", AsyncMock(side_effect=lambda *a, **kwargs: next(urls))):
+            yield mock
+
+    @pytest.mark.asyncio
+    async def test_stream_voice_session_not_found(self, client: AsyncClient):
+        """Test streaming a voice message to a non-existent session."""
+        audio_file, _ = create_mock_audio_file()
+
+        response = await client.post(
+            "/api/sessions/non-existent-id/voice/stream",
+            files={"audio": ("test.webm", audio_file, "audio/webm")},
+        )
+
+        assert response.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_stream_voice_event_order(
+        self, client: AsyncClient, sample_session: Session, mock_openai
+    ):
+        """Test transcript, tokens, per-sentence audio and done events."""
+        audio_file, _ = create_mock_audio_file()
+
+        response = await client.post(
+            f"/api/sessions/{sample_session.id}/voice/stream",
+            files={"audio": ("test.webm", audio_file, "audio/webm")},
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = parse_sse(response.text)
+        names = [name for name, _ in events]
+
+        assert names[0] == "transcript"
+        assert events[0][1]["content"] == "What is the answer?"
+        assert "token" in names
+        audio = [data for name, data in events if name == "audio"]
+        assert [a["text"] for a in audio] == ["The answer is forty-two.", "It always has been."]
+        assert all(a["url"].startswith("/api/audio/tts/") for a in audio)
+        assert names[-1] == "done"
+        done = events[-1][1]
+        assert done["full_content"] == "The answer is forty-two. It always has been."
+        assert done["message_id"] and done["user_message_id"]
+        assert done["tts_audio_url"]
+
+    @pytest.mark.asyncio
+    async def test_stream_voice_inline_audio(
+        self, client: AsyncClient, sample_session: Session, mock_openai
+    ):
+        """Test that inline_audio sends segments as base64 data."""
+        import base64
+
+        audio_file, _ = create_mock_audio_file()
+
+        response = await client.post(
+            f"/api/sessions/{sample_session.id}/voice/stream?inline_audio=true",
+            files={"audio": ("test.webm", audio_file, "audio/webm")},
+        )
+
+        audio = [data for name, data in parse_sse(response.text) if name == "audio"]
+        assert base64.b64decode(audio[0]["data"]) == b"MP3:The answer is forty-two."
+        assert audio[0]["content_type"] == "audio/mpeg"
+
+    @pytest.mark.asyncio
+    async def test_stream_voice_uses_agent_tts_format(
+        self, client: AsyncClient, db_session, sample_agent: Agent, sample_session: Session, mock_openai
+    ):
+        """Test that an opus agent gets opus speech unless the client only accepts mp3."""
+        import base64
+
+        sample_agent.tts_format = "opus"
+        await db_session.commit()
+
+        response = await client.post(
+            f"/api/sessions/{sample_session.id}/voice/stream?inline_audio=true",
+            files={"audio": ("test.webm", create_mock_audio_file()[0], "audio/webm")},
+        )
+        audio = [data for name, data in parse_sse(response.text) if name == "audio"]
+        done = parse_sse(response.text)[-1][1]
+
+        assert audio[0]["content_type"] == "audio/ogg"
+        assert base64.b64decode(audio[0]["data"]) == b"MP3:The answer is forty-two."
+        assert mock_openai.text_to_speech.call_args.kwargs["response_format"] == "opus"
+        assert done["tts_audio_url"].endswith(".opus")
+
+        response = await client.post(
+            f"/api/sessions/{sample_session.id}/voice/stream",
+            files={"audio": ("test.webm", create_mock_audio_file()[0], "audio/webm")},
+            headers={"Accept": "text/event-stream, audio/mpeg"},
+        )
+        assert parse_sse(response.text)[-1][1]["tts_audio_url"].endswith(".mp3")
+
+    @pytest.mark.asyncio
+    async def test_stream_voice_stt_failure(
+        self, client: AsyncClient, sample_session: Session, mock_openai
+    ):
+        """Test that a failed transcription ends the stream with the fallback."""
+        mock_openai.speech_to_text.side_effect = RuntimeError("whisper down")
+        audio_file, _ = create_mock_audio_file()
+
+        response = await client.post(
+            f"/api/sessions/{sample_session.id}/voice/stream",
+            files={"audio": ("test.webm", audio_file, "audio/webm")},
+        )
+
+        events = parse_sse(response.text)
+        assert [name for name, _ in events] == ["error"]
+        assert "understand the audio" in events[0][1]["fallback_message"]
+
+
+class TestVoicePersistence:
+    """Test suite for non-blocking audio persistence in the voice path."""
+
+    @pytest.mark.asyncio
+    async def test_audio_store_writes_off_the_event_loop(self, tmp_path):
+        """Test that LocalAudioStore writes through a worker thread and returns the URL."""
+        import threading
+
+        from app.services import audio_store as storage_module
+        from app.services.audio_store import LocalAudioStore
+
+        storage = LocalAudioStore(str(tmp_path))
+        threads = []
+        original = storage_module.write_atomic
+
+        def record_thread(path, content):
+            threads.append(threading.current_thread())
+            original(path, content)
+
+        with patch.object(storage_module, "write_atomic", record_thread):
+            url = await storage.save(b"RIFF", "uploads", "wav")
+
+        filename = url.rsplit("/", 1)[-1]
+        assert url == f"/api/audio/uploads/{filename}"
+        assert storage.path("uploads", filename).read_bytes() == b"RIFF"
+        assert threads and threads[0] is not threading.main_thread()
+
+    @pytest.mark.asyncio
+    async def test_stt_runs_from_memory_while_upload_persists(
+        self, db_session, sample_session: Session, tmp_path
+    ):
+        """Test that transcription starts before the upload is written and gets the bytes."""
+        import asyncio
+
+        from app.services.audio_store import LocalAudioStore
+        from app.services.tts_cache import TTSCache
+        from app.services.voice_service import VoiceService
+
+        order = []
+        upload_written = asyncio.Event()
+
+        async def save(content, folder, extension, digest=None):
+            order.append("save started")
+            await asyncio.sleep(0.02)
+            order.append("save finished")
+            upload_written.set()
+            return f"/api/audio/{folder}/x.{extension}"
+
+        async def speech_to_text(audio, filename):
+            order.append("stt started")
+            assert not upload_written.is_set()
+            assert (audio, filename) == (b"voice-bytes", "audio.webm")
+            return "Hello there"
+
+        async def chat_stream(**kwargs):
+            yield "Hi."
+
+        service = VoiceService(db_session)
+        service.openai = MagicMock(tts_voice="alloy", tts_model="tts-1")
+        service.openai.speech_to_text = speech_to_text
+        service.openai.chat_stream = chat_stream
+        service.openai.text_to_speech = AsyncMock(return_value=b"mp3")
+
+        with patch.object(service, "_save_audio_file", save), \
+             patch("app.services.voice_service.tts_cache", TTSCache(LocalAudioStore(str(tmp_path)))):
+            response = await service.process_voice_message(
+                sample_session.id, MagicMock(content_type="audio/webm"), b"voice-bytes"
+            )
+
+        assert order.index("stt started") < order.index("save finished")
+        assert response.user_message.audio_url == "/api/audio/uploads/x.webm"
@@ -0,0 +1,233 @@
+"""
+Tests for segmented transcription of streamed audio and the full-duplex
+voice WebSocket.
+"""
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import numpy as np
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.message import Message
+from app.models.session import Session
+from app.services.audio_store import LocalAudioStore
+from app.services.transcription import SpeechSegmenter, StreamingTranscriber
+from app.services.tts_cache import TTSCache
+from app.services.voice_socket import VoiceSocket
+from tests import conftest
+
+RATE = 16000
+
+
+def tone(seconds: float) -> bytes:
+    """Loud 16-bit PCM (a sine), which the VAD treats as speech."""
+    t = np.arange(int(RATE * seconds)) / RATE
+    return (np.sin(2 * np.pi * 220 * t) * 10000).astype("<i2").tobytes()
+
+
+def silence(seconds: float) -> bytes:
+    return b"\x00\x00" * int(RATE * seconds)
+
+
+class FakeWebSocket:
+    """Just enough of a Starlette WebSocket to drive VoiceSocket."""
+
+    def __init__(self):
+        self.incoming: asyncio.Queue = asyncio.Queue()
+        self.sent = []
+        self.received = asyncio.Condition()
+
+    async def receive(self):
+        return await self.incoming.get()
+
+    async def send_text(self, text):
+        await self._record(json.loads(text))
+
+    async def send_bytes(self, data):
+        await self._record(data)
+
+    async def _record(self, item):
+        async with self.received:
+            self.sent.append(item)
+            self.received.notify_all()
+
+    def push_audio(self, pcm):
+        self.incoming.put_nowait({"type": "websocket.receive", "bytes": pcm})
+
+    def push(self, message):
+        self.incoming.put_nowait({"type": "websocket.receive", "text": json.dumps(message)})
+
+    def disconnect(self):
+        self.incoming.put_nowait({"type": "websocket.disconnect", "code": 1000})
+
+    async def wait_for(self, kind, **fields):
+        def found():
+            return next(
+                (m for m in self.sent if isinstance(m, dict) and m.get("type") == kind
+                 and all(m.get(k) == v for k, v in fields.items())),
+                None,
+            )
+
+        async with self.received:
+            await asyncio.wait_for(self.received.wait_for(found), timeout=5)
+            return found()
+
+
+class TestSpeechSegmenter:
+    """Test suite for the energy-VAD segmenter."""
+
+    def test_segments_close_at_pauses_and_silence_is_dropped(self):
+        """Test that a pause closes a segment and silence alone never does."""
+        segmenter = SpeechSegmenter(RATE, silence_ms=300, max_seconds=10, threshold_db=-45)
+
+        assert segmenter.feed(silence(1.0)) == []
+        closed = segmenter.feed(tone(0.5) + silence(0.4) + tone(0.3))
+
+        assert len(closed) == 1
+        assert segmenter.flush() is not None
+        assert segmenter.flush() is None
+
+    def test_rates_too_low_for_a_frame_are_rejected(self):
+        """Test that a rate giving empty frames raises instead of looping forever."""
+        with pytest.raises(ValueError):
+            SpeechSegmenter(0)
+
+    @pytest.mark.asyncio
+    async def test_transcriber_starts_stt_before_the_turn_ends(self):
+        """Test that closed segments are transcribed during the turn and joined in order."""
+        calls = []
+
+        async def transcribe(wav, filename):
+            calls.append(filename)
+            await asyncio.sleep(0.02 if filename == "segment-0.wav" else 0)
+            return {"segment-0.wav": "Hello there.", "segment-1.wav": "How are you?"}[filename]
+
+        transcriber = StreamingTranscriber(transcribe, sample_rate=RATE)
+        transcriber.feed(tone(0.5) + silence(0.6))
+        await asyncio.sleep(0)
+        assert calls == ["segment-0.wav"]
+
+        transcriber.feed(tone(0.4))
+        assert await transcriber.finish() == "Hello there. How are you?"
+        assert transcriber.segment_count == 2
+
+
+class TestVoiceSocket:
+    """Test suite for the full-duplex voice WebSocket protocol."""
+
+    @pytest.fixture
+    def voice_env(self, tmp_path):
+        """Mock OpenAI and keep audio and the database in the test sandbox."""
+        async def speech_to_text(wav, filename):
+            return {"segment-0.wav": "What is the answer?", "segment-1.wav": "Tell me."}[filename]
+
+        async def chat_stream(**kwargs):
+            for token in ["The answer is forty-two. ", "It always has been."]:
+                yield token
+
+        mock = MagicMock(tts_voice="alloy", tts_model="tts-1")
+        mock.speech_to_text = AsyncMock(side_effect=speech_to_text)
+        mock.chat_stream = chat_stream
+        mock.text_to_speech = AsyncMock(side_effect=lambda text, **kwargs: b"MP3:" + text.encode())
+        store = LocalAudioStore(str(tmp_path))
+
+        with patch("app.services.voice_socket.openai_client", mock), \
+             patch("app.services.voice_service.openai_client", mock), \
+             patch("app.services.voice_socket.audio_store", store), \
+             patch("app.services.voice_service.tts_cache", TTSCache(store)), \
+             patch("app.database.connection.async_session_maker", conftest.test_async_session_maker):
+            yield mock
+
+    @pytest.mark.asyncio
+    async def test_turn_is_transcribed_while_talking_and_answered(
+        self, db_session: AsyncSession, sample_session: Session, voice_env
+    ):
+        """Test the full turn: partial transcript, tokens, audio frames and done."""
+        websocket = FakeWebSocket()
+        connection = asyncio.ensure_future(VoiceSocket(websocket, sample_session.id).run())
+
+        websocket.push({"type": "start", "sample_rate": RATE})
+        websocket.push_audio(tone(0.6) + silence(0.6))
+        partial = await websocket.wait_for("transcript", final=False)
+        assert partial["content"] == "What is the answer?"
+
+        websocket.push_audio(tone(0.4))
+        websocket.push({"type": "end"})
+        done = await websocket.wait_for("done")
+        websocket.disconnect()
+        await connection
+
+        final = await websocket.wait_for("transcript", final=True)
+        assert final["content"] == "What is the answer? Tell me."
+        audio_index = websocket.sent.index(await websocket.wait_for("audio", index=0))
+        assert websocket.sent[audio_index + 1] == b"MP3:The answer is forty-two."
+        assert done["full_content"] == "The answer is forty-two. It always has been."
+
+        user_msg = (
+            await db_session.execute(select(Message).where(Message.id == done["user_message_id"]))
+        ).scalar_one()
+        assert user_msg.content == "What is the answer? Tell me."
+        assert user_msg.audio_url.endswith(".wav")
+
+    @pytest.mark.asyncio
+    async def test_cancel_stops_the_answer(
+        self, db_session: AsyncSession, sample_session: Session, voice_env
+    ):
+        """Test that a cancel message interrupts the answer in progress."""
+        async def slow_stream(**kwargs):
+            yield "The answer is coming. "
+            await asyncio.sleep(10)
+            yield "Too late."
+
+        voice_env.chat_stream = slow_stream
+        websocket = FakeWebSocket()
+        connection = asyncio.ensure_future(VoiceSocket(websocket, sample_session.id).run())
+
+        websocket.push_audio(tone(0.6))
+        websocket.push({"type": "end"})
+        await websocket.wait_for("token")
+        websocket.push({"type": "cancel"})
+        await asyncio.sleep(0.05)
+        websocket.disconnect()
+        await connection
+
+        assert not any(isinstance(m, dict) and m.get("type") == "done" for m in websocket.sent)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("sample_rate", [0, -16000, "fast"])
+    async def test_invalid_sample_rate_is_rejected(
+        self, sample_session: Session, voice_env, sample_rate
+    ):
+        """Test that a bad sample_rate gets an error and the turn's audio is dropped."""
+        websocket = FakeWebSocket()
+        connection = asyncio.ensure_future(VoiceSocket(websocket, sample_session.id).run())
+
+        websocket.push({"type": "start", "sample_rate": sample_rate})
+        websocket.push_audio(tone(0.6) + silence(0.6))
+        websocket.push({"type": "end"})
+        error = await websocket.wait_for("error")
+        websocket.disconnect()
+        await asyncio.wait_for(connection, timeout=5)
+
+        assert "sample_rate" in error["error"]
+        voice_env.speech_to_text.assert_not_called()
+        assert not any(isinstance(m, dict) and m.get("type") == "transcript" for m in websocket.sent)
+
+    @pytest.mark.asyncio
+    async def test_malformed_messages_get_an_error(self, sample_session: Session, voice_env):
+        """Test that non-JSON and non-object frames are answered with an error, not a crash."""
+        websocket = FakeWebSocket()
+        connection = asyncio.ensure_future(VoiceSocket(websocket, sample_session.id).run())
+
+        for text in ["5", "[1]", "not json"]:
+            websocket.incoming.put_nowait({"type": "websocket.receive", "text": text})
+        websocket.push({"type": "ping"})
+        await websocket.wait_for("error", error="Unknown message type: 'ping'")
+        websocket.disconnect()
+        await asyncio.wait_for(connection, timeout=5)
+
+        errors = [m["error"] for m in websocket.sent if isinstance(m, dict) and m.get("type") == "error"]
+        assert errors[:3] == ["Messages must be JSON objects"] * 3
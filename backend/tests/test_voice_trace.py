@@ -0,0 +1,146 @@
+"""
+Tests for per-stage timing of voice requests.
+"""
+import asyncio
+import io
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from httpx import AsyncClient
+
+from app.models.session import Session
+from app.services.voice_trace import (
+    VoiceTrace,
+    voice_request_duration,
+    voice_stage_duration,
+    voice_stage_tokens,
+    voice_stages_in_flight,
+)
+from tests.test_voice import parse_sse
+
+
+class TestVoiceTrace:
+    """Test suite for VoiceTrace."""
+
+    @pytest.mark.asyncio
+    async def test_spans_feed_the_stage_metrics(self):
+        """Test that each span is observed with its outcome and leaves nothing in flight."""
+        ok = voice_stage_duration.count(stage="stt", outcome="ok")
+        failed = voice_stage_duration.count(stage="tts", outcome="error")
+        cancelled = voice_stage_duration.count(stage="chat", outcome="cancelled")
+        tokens = voice_stage_tokens.count(stage="chat")
+        trace = VoiceTrace()
+
+        async with trace.span("stt", size=2048):
+            pass
+        with pytest.raises(RuntimeError):
+            async with trace.span("tts"):
+                raise RuntimeError("tts down")
+
+        async def chat():
+            async with trace.span("chat") as span:
+                span.tokens = 3
+                await asyncio.Event().wait()
+
+        task = asyncio.ensure_future(chat())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert voice_stage_duration.count(stage="stt", outcome="ok") == ok + 1
+        assert voice_stage_duration.count(stage="tts", outcome="error") == failed + 1
+        assert voice_stage_duration.count(stage="chat", outcome="cancelled") == cancelled + 1
+        assert voice_stage_tokens.count(stage="chat") == tokens + 1
+        assert all(voice_stages_in_flight.get(stage=stage) == 0 for stage in ("stt", "tts", "chat"))
+
+    @pytest.mark.asyncio
+    async def test_breakdown_merges_repeated_stages(self):
+        """Test that repeated spans of a stage are counted and their bytes summed."""
+        trace = VoiceTrace()
+        for size in (100, 200):
+            async with trace.span("tts_store", size=size):
+                pass
+
+        breakdown = trace.breakdown()
+        assert list(breakdown) == ["tts_store"]
+        assert breakdown["tts_store"]["count"] == 2
+        assert breakdown["tts_store"]["bytes"] == 300
+        assert trace.server_timing().startswith('tts_store;dur=')
+        assert 'n=2 bytes=300"' in trace.server_timing()
+        assert ", total;dur=" in trace.server_timing()
+
+    def test_finish_records_the_request_once(self):
+        """Test that the request histogram is observed once, with an error outcome on exceptions."""
+        errors = voice_request_duration.count(outcome="error")
+
+        with pytest.raises(ValueError):
+            with VoiceTrace() as trace:
+                raise ValueError("boom")
+        trace.finish()
+
+        assert trace.outcome == "error"
+        assert voice_request_duration.count(outcome="error") == errors + 1
+
+
+class TestVoiceDebugTimings:
+    """Test suite for the per-stage timings returned to clients."""
+
+    @pytest.fixture
+    def mock_openai(self, tmp_path):
+        """Patch the OpenAI client and keep every stored file in tmp_path."""
+        from app.services.audio_store import LocalAudioStore
+        from app.services.tts_cache import TTSCache
+
+        async def chat_stream(**kwargs):
+            for token in ["Forty-two. ", "Always."]:
+                yield token
+
+        store = LocalAudioStore(str(tmp_path))
+        mock = MagicMock(tts_voice="alloy", tts_model="tts-1", whisper_model="whisper-1", whisper_language=None)
+        mock.speech_to_text = AsyncMock(return_value="What is the answer?")
+        mock.chat_stream = chat_stream
+        mock.text_to_speech = AsyncMock(side_effect=lambda text, **kwargs: b"MP3:" + text.encode())
+
+        with patch("app.services.voice_service.openai_client", mock), \
+             patch("app.services.voice_service.audio_store", store), \
+             patch("app.services.voice_service.tts_cache", TTSCache(store)):
+            yield mock
+
+    @pytest.mark.asyncio
+    async def test_server_timing_only_when_requested(
+        self, client: AsyncClient, sample_session: Session, mock_openai
+    ):
+        """Test the Server-Timing header on the voice endpoint."""
+        url = f"/api/sessions/{sample_session.id}/voice"
+
+        plain = await client.post(url, files={"audio": ("a.webm", io.BytesIO(b"WEBM-one"), "audio/webm")})
+        debug = await client.post(
+            url,
+            files={"audio": ("b.webm", io.BytesIO(b"WEBM-two"), "audio/webm")},
+            headers={"X-Voice-Debug": "1"},
+        )
+
+        assert plain.status_code == debug.status_code == 200
+        assert "server-timing" not in plain.headers
+        stages = {entry.split(";")[0] for entry in debug.headers["server-timing"].split(", ")}
+        assert stages == {"upload_write", "stt", "history", "chat", "tts", "tts_store", "db_write", "total"}
+        assert "tokens=2" in debug.headers["server-timing"]
+
+    @pytest.mark.asyncio
+    async def test_stream_done_event_carries_timings(
+        self, client: AsyncClient, sample_session: Session, mock_openai
+    ):
+        """Test that the SSE done event includes the stage breakdown when requested."""
+        response = await client.post(
+            f"/api/sessions/{sample_session.id}/voice/stream",
+            files={"audio": ("c.webm", io.BytesIO(b"WEBM-three"), "audio/webm")},
+            headers={"X-Voice-Debug": "true"},
+        )
+
+        name, done = parse_sse(response.text)[-1]
+        assert name == "done"
+        assert done["timings"]["stt"]["count"] == 1
+        assert done["timings"]["chat"]["tokens"] == 2
+        assert done["timings"]["tts"]["bytes"] > 0
+        assert set(done["timings"]) >= {"upload_write", "stt", "history", "chat", "tts", "db_write"}